@@ -1,5 +1,5 @@
 import React, { createContext, useContext, useState, useEffect, ReactNode } from 'react';
-import { authAPI, onboardingAPI, dashboardAPI, universityAPI, todoAPI } from '@/lib/api';
+import { authAPI, dashboardAPI, universityAPI, todoAPI } from '@/lib/api';
 import { countryImages } from '@/lib/constants';
 
 export interface UserProfile {
@@ -105,12 +105,12 @@ export function AppProvider({ children }: { children: ReactNode }) {
 
     const loadUserData = async () => {
         try {
-            await authAPI.getMe();
-            // If getMe succeeds, user is authenticated
+            // One call for profile, stage and todos; fails with 401 if the token is invalid
+            const dashboardRes = await dashboardAPI.get();
+            const dashboard = dashboardRes.data;
 
             // 1. Check onboarding status
-            try {
-                const onboardingRes = await onboardingAPI.get();
+            if (dashboard.onboarding) {
                 setOnboardingCompleted(true);
 
                 const normalizeCountryName = (c: string) => {
@@ -125,33 +125,28 @@ export function AppProvider({ children }: { children: ReactNode }) {
 
                 // Map onboarding data to UserProfile
                 const profile: UserProfile = {
-                    degree: onboardingRes.data.current_education_level || '',
-                    gpa: onboardingRes.data.gpa?.toString() || '',
-                    targetIntake: onboardingRes.data.target_intake_year?.toString() || '',
-                    countries: (onboardingRes.data.preferred_countries?.split(',') || [])
+                    degree: dashboard.onboarding.current_education_level || '',
+                    gpa: dashboard.onboarding.gpa?.toString() || '',
+                    targetIntake: dashboard.onboarding.target_intake_year?.toString() || '',
+                    countries: (dashboard.onboarding.preferred_countries?.split(',') || [])
                         .map((c: string) => normalizeCountryName(c))
                         .filter((c: string) => c !== ''),
-                    budgetRange: onboardingRes.data.budget_per_year ? `$${onboardingRes.data.budget_per_year}/yr` : '',
+                    budgetRange: dashboard.onboarding.budget_per_year ? `$${dashboard.onboarding.budget_per_year}/yr` : '',
                     examsCompleted: [],
-                    sopStatus: (onboardingRes.data.sop_status as any) || 'not-started',
+                    sopStatus: (dashboard.onboarding.sop_status as any) || 'not-started',
                     academicStrength: 'average',
-                    examStatus: (onboardingRes.data.ielts_toefl_status === 'Completed' || onboardingRes.data.gre_gmat_status === 'Completed') ? 'done' :
-                        (onboardingRes.data.ielts_toefl_status === 'In progress' || onboardingRes.data.gre_gmat_status === 'In progress') ? 'in-progress' : 'not-started',
-                    ieltsScore: onboardingRes.data.ielts_toefl_score?.toString() || '',
-                    greScore: onboardingRes.data.gre_gmat_score?.toString() || '',
+                    examStatus: (dashboard.onboarding.ielts_toefl_status === 'Completed' || dashboard.onboarding.gre_gmat_status === 'Completed') ? 'done' :
+                        (dashboard.onboarding.ielts_toefl_status === 'In progress' || dashboard.onboarding.gre_gmat_status === 'In progress') ? 'in-progress' : 'not-started',
+                    ieltsScore: dashboard.onboarding.ielts_toefl_score?.toString() || '',
+                    greScore: dashboard.onboarding.gre_gmat_score?.toString() || '',
                 };
                 setUserProfile(profile);
-            } catch (err: any) {
-                if (err.response?.status === 404) {
-                    setOnboardingCompleted(false);
-                } else {
-                    console.error("Onboarding fetch failed", err);
-                }
+            } else {
+                setOnboardingCompleted(false);
             }
 
-            // 2. Fetch Stage & Universities & Todos (Always run if Auth)
+            // 2. Stage & Universities & Todos (Always run if Auth)
             try {
-                const stageRes = await dashboardAPI.getStage();
                 const stageMap: Record<number, AppStage> = {
                     0: 'profile-building',
                     1: 'profile-building',
@@ -159,12 +154,11 @@ export function AppProvider({ children }: { children: ReactNode }) {
                     3: 'finalize-universities',
                     4: 'prepare-applications'
                 };
-                setCurrentStage(stageMap[stageRes.data.stage] || 'profile-building');
+                setCurrentStage(stageMap[dashboard.stage] || 'profile-building');
 
                 await loadUniversities();
 
-                const todoRes = await todoAPI.getAll();
-                setTodoItems(todoRes.data.map((t: any) => ({
+                setTodoItems(dashboard.todos.map((t: any) => ({
                     id: t.id.toString(),
                     text: t.title,
                     status: t.completed ? 'done' : 'pending'
@@ -9,18 +9,31 @@ const api = axios.create({
     },
 });
 
+// Returned after our own writes; sending it back keeps the next reads off a lagging replica
+const READ_YOUR_WRITES_HEADER = 'X-Read-Your-Writes';
+let readYourWrites: string | null = null;
+
 // Add token to requests
 api.interceptors.request.use((config) => {
     const token = localStorage.getItem('token');
     if (token) {
         config.headers.Authorization = `Bearer ${token}`;
     }
+    if (readYourWrites) {
+        config.headers[READ_YOUR_WRITES_HEADER] = readYourWrites;
+    }
     return config;
 });
 
 // Handle 401 errors
 api.interceptors.response.use(
-    (response) => response,
+    (response) => {
+        const marker = response.headers[READ_YOUR_WRITES_HEADER.toLowerCase()];
+        if (marker) {
+            readYourWrites = marker;
+        }
+        return response;
+    },
     (error) => {
         if (error.response?.status === 401) {
             localStorage.removeItem('token');
@@ -53,6 +66,7 @@ export const onboardingAPI = {
 // Dashboard APIs
 export const dashboardAPI = {
     getStage: () => api.get('/api/dashboard/stage'),
+    get: () => api.get('/api/dashboard'),
 };
 
 // University APIs
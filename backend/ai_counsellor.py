@@ -1,12 +1,18 @@
-import requests
 import json
 import os
 import re
 from dotenv import load_dotenv
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Onboarding, University, ShortlistedUniversity, LockedUniversity, Todo, User
 from schemas import AIAction, AICounsellorResponse
+from catalog_snapshot import catalog_records, get_catalog
+from recommendations import stored_recommendations
+from requirement_templates import materialize_requirements
+from services import task_kind
+import outbound_http
 
 load_dotenv()
 
@@ -36,17 +42,20 @@ class AICounsellorService:
         user_profile: Onboarding,
         shortlisted_universities: List[int],
         locked_universities: List[int],
-        db: Session,
-        current_user: User
+        db: AsyncSession,
+        current_user: User,
+        read_db: Optional[AsyncSession] = None
     ) -> Dict[str, Any]:
         
         # 1. Determine Current Stage
-        current_stage = self._determine_stage(shortlisted_universities, locked_universities)
+        current_stage = self._determine_stage(current_user.stage)
         
         # 2. Build Context
         profile_context = self._build_profile_context(user_profile)
-        university_context = self._build_university_context(shortlisted_universities, locked_universities, db)
-        available_universities = self._build_available_universities(db, user_profile)
+        # Context is read-only, so it may come from the replica (actions below always use the primary)
+        read_db = read_db or db
+        university_context = await self._build_university_context(shortlisted_universities, locked_universities, read_db)
+        available_universities = await self._build_available_universities(read_db, user_profile)
         
         # 3. Construct System Prompt (Strict JSON)
         system_prompt = f"""You are an expert AI Study Abroad Counsellor. Your goal is to guide the student towards admission by taking CONCRETE ACTIONS.
@@ -107,7 +116,7 @@ Context-aware guidance:
 
         # 3. Call AI
         try:
-            response_text = self._call_llm(system_prompt)
+            response_text = await self._call_llm(system_prompt)
             print(f"DEBUG: Raw LLM Response: {response_text}") # Debug log
             
             # 4. Parse JSON
@@ -122,10 +131,10 @@ Context-aware guidance:
             }
             
         # 5. Execute Action
-        self._execute_actions(parsed_response.get("actions", []), current_stage, db, current_user)
+        await self._execute_actions(parsed_response.get("actions", []), current_stage, db, current_user)
         
         # 6. Fetch Updated State
-        updated_state = self._get_updated_state(db, current_user)
+        updated_state = await self._get_updated_state(db, current_user)
         
         # 7. Construct Final Response
         return {
@@ -135,7 +144,7 @@ Context-aware guidance:
             **updated_state # Merges updated lists
         }
 
-    def _call_llm(self, prompt: str) -> str:
+    async def _call_llm(self, prompt: str) -> str:
         """Handles API call to Groq or Gemini"""
         try:
             if self.provider == "groq":
@@ -149,7 +158,7 @@ Context-aware guidance:
                     "temperature": 0.3, # Lower temperature for valid JSON
                     "response_format": {"type": "json_object"} 
                 }
-                response = requests.post(self.base_url, headers=headers, json=payload, timeout=30)
+                response = await outbound_http.request("POST", self.base_url, headers=headers, json=payload, retries=1, timeout=30.0)
                 
                 if response.status_code != 200:
                     raise Exception(f"Groq Error: {response.text}")
@@ -162,7 +171,7 @@ Context-aware guidance:
                     "contents": [{"parts": [{"text": prompt}]}],
                     "generationConfig": {"response_mime_type": "application/json"}
                 }
-                response = requests.post(f"{self.base_url}?key={self.api_key}", headers=headers, json=payload, timeout=30)
+                response = await outbound_http.request("POST", f"{self.base_url}?key={self.api_key}", headers=headers, json=payload, retries=1, timeout=30.0)
                 
                 if response.status_code != 200:
                     raise Exception(f"Gemini Error: {response.text}")
@@ -186,7 +195,7 @@ Context-aware guidance:
                 "reasoning": "Failed to parse structured response"
             }
 
-    def _execute_actions(self, actions: List[Dict[str, Any]], stage: str, db: Session, user: User):
+    async def _execute_actions(self, actions: List[Dict[str, Any]], stage: str, db: AsyncSession, user: User):
         """Executes a list of actions on the database"""
         if not actions:
             return
@@ -206,44 +215,41 @@ Context-aware guidance:
             if action_type == "shortlist_university":
                 # Allowed in DISCOVERY
                 # Logic: Add to shortlist
-                uni_id = payload.get("university_id")
+                uni_id = self._coerce_university_id(payload.get("university_id"))
                 if uni_id:
-                    existing = db.query(ShortlistedUniversity).filter_by(user_id=user.id, university_id=uni_id).first()
-                    if not existing:
-                        db.add(ShortlistedUniversity(user_id=user.id, university_id=uni_id))
-                        db.commit()
+                    await self._shortlist(db, user.id, uni_id)
+                    await db.commit()
 
             elif action_type == "lock_university":
                 # Allowed in FINALIZATION
-                uni_id = payload.get("university_id")
+                uni_id = self._coerce_university_id(payload.get("university_id"))
                 if uni_id:
-                     # Check if ALREADY locked (this specific one)
-                    existing_lock = db.query(LockedUniversity).filter_by(user_id=user.id, university_id=uni_id).first()
+                    # Add new lock (Multiple Auto-lock allowed now); nothing comes back if ALREADY locked
+                    locked_id = await db.scalar(
+                        pg_insert(LockedUniversity)
+                        .values(user_id=user.id, university_id=uni_id)
+                        .on_conflict_do_nothing(index_elements=["user_id", "university_id"])
+                        .returning(LockedUniversity.id)
+                    )
                     
-                    if existing_lock:
+                    if locked_id is None:
                          # Already locked, do nothing
                         continue
                     
-                    # Add new lock (Multiple Auto-lock allowed now)
-                    db.add(LockedUniversity(user_id=user.id, university_id=uni_id))
-                    
                     # Also ensure it is shortlisted
-                    short = db.query(ShortlistedUniversity).filter_by(user_id=user.id, university_id=uni_id).first()
-                    if not short:
-                        db.add(ShortlistedUniversity(user_id=user.id, university_id=uni_id))
+                    await self._shortlist(db, user.id, uni_id)
                     
-                    # Trigger auto-tasks
-                    from services import generate_application_todos
-                    generate_application_todos(user.id, uni_id, db)
-                    db.commit()
+                    # The university's todos and documents, committed with the lock
+                    await materialize_requirements(db, user.id, uni_id)
+                    await db.commit()
 
             elif action_type == "create_task":
                  # Allowed in PREPARATION
                  title = payload.get("title")
                  desc = payload.get("description", "")
                  if title:
-                     db.add(Todo(user_id=user.id, title=title, description=desc))
-                     db.commit()
+                     db.add(Todo(user_id=user.id, kind=task_kind(title), source_ref="ai_counsellor", title=title, description=desc))
+                     await db.commit()
 
     async def generate_sop(self, user_profile: Onboarding, university: University) -> str:
         """Generates a tailored Statement of Purpose"""
@@ -279,7 +285,7 @@ Context-aware guidance:
             
             json_prompt = prompt + '\n\nRESPONSE FORMAT: JSON with a single field "sop_content" containing the full text.'
             
-            response_json = self._call_llm(json_prompt)
+            response_json = await self._call_llm(json_prompt)
             parsed = self._parse_json_response(response_json)
             return parsed.get("sop_content", "Failed to generate SOP content.")
             
@@ -312,7 +318,7 @@ Context-aware guidance:
         """
         
         try:
-            response_json = self._call_llm(prompt)
+            response_json = await self._call_llm(prompt)
             parsed = self._parse_json_response(response_json)
             points = parsed.get("strategy_points", [])
             # Fallback if list is empty or wrong format
@@ -377,7 +383,7 @@ Context-aware guidance:
         """
         
         try:
-            response_json = self._call_llm(prompt)
+            response_json = await self._call_llm(prompt)
             data = self._parse_json_response(response_json)
             # Ensure basic fields are present to prevent frontend crashes
             defaults = {
@@ -425,18 +431,35 @@ Context-aware guidance:
                 "acceptance_rate_display": f"{university.acceptance_rate}%"
             }
     
-    def _determine_stage(self, shortlisted: List[int], locked: List[int]) -> str:
-        if locked: return "APPLICATION_PREPARATION"
-        if shortlisted: return "UNIVERSITY_FINALIZATION"
+    async def _shortlist(self, db: AsyncSession, user_id: int, uni_id: int):
+        await db.execute(
+            pg_insert(ShortlistedUniversity)
+            .values(user_id=user_id, university_id=uni_id)
+            .on_conflict_do_nothing(index_elements=["user_id", "university_id"])
+        )
+
+    def _coerce_university_id(self, uni_id: Any) -> Optional[int]:
+        # LLM payloads sometimes quote ids; integer columns need real ints under asyncpg
+        try:
+            return int(uni_id) if uni_id else None
+        except (TypeError, ValueError):
+            return None
+
+    def _determine_stage(self, stage: int) -> str:
+        # users.stage: 4 = something locked, 3 = something shortlisted
+        if stage == 4: return "APPLICATION_PREPARATION"
+        if stage == 3: return "UNIVERSITY_FINALIZATION"
         return "UNIVERSITY_DISCOVERY"
 
-    def _get_updated_state(self, db: Session, user: User) -> Dict[str, Any]:
-        shortlisted = db.query(ShortlistedUniversity).filter_by(user_id=user.id).all()
-        locked = db.query(LockedUniversity).filter_by(user_id=user.id).all()
-        tasks = db.query(Todo).filter_by(user_id=user.id).all()
+    async def _get_updated_state(self, db: AsyncSession, user: User) -> Dict[str, Any]:
+        # The actions' triggers have moved the stored stage; re-read it by primary key
+        stage = await db.scalar(select(User.stage).where(User.id == user.id))
+        shortlisted = (await db.scalars(select(ShortlistedUniversity).filter_by(user_id=user.id))).all()
+        locked = (await db.scalars(select(LockedUniversity).filter_by(user_id=user.id))).all()
+        tasks = (await db.scalars(select(Todo).filter_by(user_id=user.id))).all()
         
         return {
-            "updated_stage": self._determine_stage([s.university_id for s in shortlisted], [l.university_id for l in locked]),
+            "updated_stage": self._determine_stage(stage),
             "shortlisted_universities": [s.university_id for s in shortlisted],
             "locked_universities": [l.university_id for l in locked],
             "tasks": [{"id": t.id, "title": t.title, "status": "done" if t.completed else "pending"} for t in tasks]
@@ -447,31 +470,36 @@ Context-aware guidance:
         return f"""GPA: {profile.gpa}, Degree: {profile.intended_degree}, Field: {profile.field_of_study}, 
         Budget: ${profile.budget_per_year}, Exams: {profile.ielts_toefl_status}"""
         
-    def _build_university_context(self, short: List[int], locked: List[int], db: Session) -> str:
-        s_objs = db.query(University).filter(University.id.in_(short)).all() if short else []
-        l_objs = db.query(University).filter(University.id.in_(locked)).all() if locked else []
+    async def _build_university_context(self, short: List[int], locked: List[int], db: AsyncSession) -> str:
+        s_objs = await catalog_records(db, short)
+        l_objs = await catalog_records(db, locked)
         
         return f"""Shortlisted: {', '.join([u.name for u in s_objs])}
         Locked: {', '.join([u.name for u in l_objs])}"""
 
-    def _build_available_universities(self, db: Session, profile: Onboarding) -> str:
-        # Fetch universities that match user's preferred countries
-        query = db.query(University)
+    async def _build_available_universities(self, db: AsyncSession, profile: Onboarding) -> str:
+        # The user's precomputed ranking, unless their profile changed since it was computed
+        ranked = await stored_recommendations(db, profile.user_id, 20) if profile.recommendations_version is not None else []
+        if ranked:
+            matches = await catalog_records(db, [r.university_id for r in ranked])
+            return self._format_universities(matches)
         
-        pref_countries = []
-        if profile.preferred_countries:
-            pref_countries = [c.strip() for c in profile.preferred_countries.split(",")]
-            # Filter specifically for these countries
-            query = query.filter(University.country.in_(pref_countries))
+        catalog = await get_catalog(db)
         
-        # Get matching unis
-        matches = query.limit(20).all()
+        # Universities in the user's preferred countries, straight from the snapshot's country index
+        if profile.preferred_country_codes:
+            matches = catalog.in_countries(profile.preferred_country_codes)[:20]
+        else:
+            matches = list(catalog.records[:20])
         
         # If we don't have enough matches, add some generic top ones
         if len(matches) < 10:
-            others = db.query(University).filter(~University.id.in_([u.id for u in matches])).limit(10).all()
-            matches.extend(others)
+            seen = {u.id for u in matches}
+            matches.extend([u for u in catalog.records[:len(matches) + 10] if u.id not in seen][:10])
             
+        return self._format_universities(matches)
+
+    def _format_universities(self, matches) -> str:
         return "\n".join([
             f"ID: {u.id} | {u.name} | {u.country} | Cost: ${u.tuition_fee}/yr | Acceptance: {u.acceptance_rate}% | Ranking: #{u.ranking}" 
             for u in matches
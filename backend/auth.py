@@ -1,14 +1,20 @@
+import re
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import NamedTuple, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from dotenv import load_dotenv
+from google.oauth2 import id_token
 
-from database import SessionLocal
+import outbound_http
+
+from database import READ_YOUR_WRITES_SECONDS, get_db, read_replica_enabled, replica_session, track_request_writes
 from models import User
 
 # This will be overridden in main.py, but we define it here for the dependency
@@ -19,6 +25,16 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Google's ID token signing certificates, and how long to keep them when the response doesn't say
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+GOOGLE_CERTS_DEFAULT_MAX_AGE = 3600
+
+# Read-your-writes marker: returned after a user's committed write and sent back on later reads.
+# Signed with its own key so a marker can never pass as an access token.
+READ_YOUR_WRITES_HEADER = "X-Read-Your-Writes"
+READ_YOUR_WRITES_COOKIE = "read_your_writes"
+_WRITE_MARKER_KEY = f"{SECRET_KEY}:read-your-writes"
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
@@ -42,12 +58,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_subject(token: str) -> str:
     print(f"DEBUG: get_current_user received token: {token[:10]}...")
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -55,16 +73,94 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         print(f"DEBUG: Decoded email from token: {email}")
         if email is None:
             print("DEBUG: Email is None in token payload")
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    # Create a database session
-    db = SessionLocal()
+        raise _credentials_exception()
+    return email
+
+async def _load_user(email: str, db: AsyncSession) -> User:
+    user = await db.scalar(select(User).where(User.email == email))
+    if user is None:
+        raise _credentials_exception()
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    email = _token_subject(token)
+    # Commits on this session count as the user's own writes for read-your-writes routing
+    db.info["subject"] = email
+    # Load the user through the request's session so endpoints can modify it directly
+    return await _load_user(email, db)
+
+def _write_marker(subject: str) -> str:
+    expire = datetime.utcnow() + timedelta(seconds=READ_YOUR_WRITES_SECONDS)
+    return jwt.encode({"sub": subject, "exp": expire}, _WRITE_MARKER_KEY, algorithm=ALGORITHM)
+
+def _marker_subject(marker: Optional[str]) -> Optional[str]:
+    """Subject of a valid, unexpired marker"""
+    if not marker:
+        return None
     try:
-        user = db.query(User).filter(User.email == email).first()
-        if user is None:
-            raise credentials_exception
-        return user
-    finally:
-        db.close()
+        return jwt.decode(marker, _WRITE_MARKER_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+async def issue_write_markers(request: Request, call_next):
+    """HTTP middleware: a request that committed the caller's write hands them a marker
+    (header and cookie) that keeps their reads on the primary on any worker"""
+    writes = track_request_writes()
+    response = await call_next(request)
+    subject = writes.get("subject")
+    if subject and read_replica_enabled():
+        marker = _write_marker(subject)
+        response.headers[READ_YOUR_WRITES_HEADER] = marker
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, marker, max_age=max(1, round(READ_YOUR_WRITES_SECONDS)), httponly=True, samesite="lax")
+    return response
+
+async def get_read_db(request: Request, token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """Session for read-only endpoints: the replica, unless the caller's marker says they wrote moments ago.
+
+    Without DATABASE_READ_URL this is simply the request's primary session.
+    """
+    if not read_replica_enabled():
+        yield db
+        return
+    try:
+        subject = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        subject = None
+    marker = request.headers.get(READ_YOUR_WRITES_HEADER) or request.cookies.get(READ_YOUR_WRITES_COOKIE)
+    if subject and _marker_subject(marker) == subject:
+        yield db
+        return
+    async with replica_session() as read_db:
+        yield read_db
+
+async def get_current_reader(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> User:
+    """get_current_user for read-only endpoints, loaded through the routed read session"""
+    return await _load_user(_token_subject(token), db)
+
+class _CertsResponse(NamedTuple):
+    status: int
+    headers: dict
+    data: bytes
+
+_google_certs: Optional[bytes] = None
+_google_certs_expire_at = 0.0
+
+async def _fetch_google_certs() -> bytes:
+    """Google's signing certificates, cached for as long as its Cache-Control allows"""
+    global _google_certs, _google_certs_expire_at
+    if _google_certs is None or time.monotonic() >= _google_certs_expire_at:
+        response = await outbound_http.request("GET", GOOGLE_CERTS_URL, retries=2, timeout=5.0)
+        response.raise_for_status()
+        max_age = re.search(r"max-age=(\d+)", response.headers.get("cache-control", ""))
+        _google_certs = response.content
+        _google_certs_expire_at = time.monotonic() + (int(max_age.group(1)) if max_age else GOOGLE_CERTS_DEFAULT_MAX_AGE)
+    return _google_certs
+
+async def verify_google_token(credential: str, client_id: str) -> dict:
+    """Claims of a Google ID token, checked by google-auth against the cached certificates"""
+    certs = await _fetch_google_certs()
+    # google-auth fetches the certificates through this callable; hand it the cached ones
+    serve_certs = lambda url, method="GET", **kwargs: _CertsResponse(200, {}, certs)
+    return id_token.verify_oauth2_token(credential, serve_certs, client_id)
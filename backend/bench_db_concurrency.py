@@ -0,0 +1,63 @@
+"""
+Benchmark the sync (psycopg2) session path against the async (asyncpg) one.
+Simulates concurrent request handlers on a single event loop, each running one
+query that spends time inside Postgres, the way a real worker serves traffic.
+Usage: python bench_db_concurrency.py --concurrency 50 --query-ms 20
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from database import DATABASE_URL, SessionLocal, SyncSessionAdapter, to_async_url
+
+async def handler(db, query_ms: int):
+    await db.execute(text("SELECT pg_sleep(:s)"), {"s": query_ms / 1000})
+
+async def run_sync_path(concurrency: int, query_ms: int) -> float:
+    async def one():
+        db = SyncSessionAdapter(SessionLocal())
+        try:
+            await handler(db, query_ms)
+        finally:
+            await db.close()
+
+    await one()
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(concurrency)])
+    return time.perf_counter() - start
+
+async def run_async_path(concurrency: int, query_ms: int) -> float:
+    engine = create_async_engine(to_async_url(DATABASE_URL), pool_size=concurrency, max_overflow=0)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def one():
+        async with session_factory() as db:
+            await handler(db, query_ms)
+
+    # Warm the pool so connection setup isn't part of the measurement
+    await asyncio.gather(*[one() for _ in range(concurrency)])
+    start = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--query-ms", type=int, default=20)
+    args = parser.parse_args()
+
+    sync_elapsed = asyncio.run(run_sync_path(args.concurrency, args.query_ms))
+    async_elapsed = asyncio.run(run_async_path(args.concurrency, args.query_ms))
+
+    print(f"{args.concurrency} concurrent handlers, {args.query_ms}ms per query")
+    print(f"sync  (psycopg2, blocks loop): {sync_elapsed * 1000:8.1f} ms  ({args.concurrency / sync_elapsed:7.1f} req/s)")
+    print(f"async (asyncpg):               {async_elapsed * 1000:8.1f} ms  ({args.concurrency / async_elapsed:7.1f} req/s)")
+    print(f"speedup: {sync_elapsed / async_elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
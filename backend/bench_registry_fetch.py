@@ -0,0 +1,113 @@
+"""
+Benchmark the registry API fetch: streaming parse with early exit against buffering
+and parsing the whole response.
+Serves a synthetic Hipolabs-style response of --entries universities from a local
+stand-in server (optionally throttled to --mbps), then times both paths and reports
+their peak Python allocations (tracemalloc).
+Usage: python bench_registry_fetch.py --entries 10000 --runs 20 --mbps 20
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import external_universities
+import outbound_http
+from external_universities import REGISTRY_RESULT_LIMIT, fetch_external_universities
+
+CHUNK_BYTES = 16 * 1024
+
+def registry_body(entries: int) -> bytes:
+    return json.dumps([
+        {
+            "web_pages": [f"https://www.university-{i}.edu/"],
+            "name": f"Synthetic University {i}",
+            "alpha_two_code": "US",
+            "state-province": None,
+            "domains": [f"university-{i}.edu"],
+            "country": "United States",
+        }
+        for i in range(entries)
+    ]).encode()
+
+def serve(body: bytes, mbps: float) -> ThreadingHTTPServer:
+    delay = CHUNK_BYTES * 8 / (mbps * 1_000_000) if mbps else 0
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                for start in range(0, len(body), CHUNK_BYTES):
+                    self.wfile.write(body[start:start + CHUNK_BYTES])
+                    if delay:
+                        time.sleep(delay)
+            except (BrokenPipeError, ConnectionResetError):
+                # The streaming reader hung up early
+                pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+async def fetch_buffered(url: str):
+    """The previous path: read the whole body, parse it, keep the first results"""
+    response = await outbound_http.request("GET", url, params={"country": "United States"}, timeout=60.0)
+    seen = set()
+    results = []
+    for entry in response.json():
+        if entry.get("name") not in seen:
+            seen.add(entry.get("name"))
+            results.append(entry)
+    return results[:REGISTRY_RESULT_LIMIT]
+
+async def fetch_streamed(url: str):
+    return await fetch_external_universities(country="United States")
+
+async def bench(fetch, url: str, runs: int):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        results = await fetch(url)
+        timings.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    await fetch(url)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(results), timings, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000, help="Universities in the synthetic response")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--mbps", type=float, default=0, help="Throttle the stand-in server (0 = unthrottled)")
+    args = parser.parse_args()
+
+    body = registry_body(args.entries)
+    server = serve(body, args.mbps)
+    url = f"http://127.0.0.1:{server.server_address[1]}/search"
+    external_universities.HIPOLABS_URL = url
+    print(f"Response: {args.entries} entries, {len(body) / 1024:.0f} KiB" + (f", {args.mbps:g} Mbit/s" if args.mbps else ""))
+
+    async def run():
+        for label, fetch in (("buffered", fetch_buffered), ("streamed", fetch_streamed)):
+            count, timings, peak = await bench(fetch, url, args.runs)
+            print(
+                f"{label:>9}: {count} results, median {statistics.median(timings):.1f} ms, "
+                f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:.1f} ms, peak allocations {peak / 1024:.0f} KiB"
+            )
+
+    asyncio.run(run())
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark local catalog search at scale.
+Creates a scratch database next to DATABASE_URL (<name>_search_bench), applies the
+migrations, loads --rows synthetic universities, then times the same search
+GET /api/universities?search= runs and reports which indexes served it.
+Usage: python bench_search.py --rows 100000 --runs 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from catalog_search import fuzzy_name_query, search_universities, text_search_query
+from check_query_plans import plan_nodes
+from database import DATABASE_URL, SyncSessionAdapter
+from manage import ALEMBIC_INI
+
+QUERIES = ["stanford", "stanfrd", "computer science", "machine learning robotics", "business school london", "busines schol", "university"]
+
+def load_catalog(conn, rows: int):
+    print(f"Loading {rows} universities...")
+    conn.execute(text("""
+        INSERT INTO universities (name, country, degree_type, field_of_study, tuition_fee, acceptance_rate, ranking, description)
+        SELECT
+            (ARRAY['University of', 'Institute of Technology', 'College of', 'School of Business', 'Academy of'])[1 + g % 5]
+                || ' ' || (ARRAY['Springfield', 'Riverside', 'Fairview', 'Kingston', 'Oakridge', 'Lakewood', 'Westbrook', 'Hillcrest'])[1 + (g / 5) % 8]
+                || ' ' || g,
+            (ARRAY['USA', 'UK', 'Canada', 'Germany', 'Australia', 'France'])[1 + g % 6],
+            (ARRAY['Bachelor''s', 'Master''s', 'MBA', 'PhD'])[1 + g % 4],
+            (ARRAY['Computer Science', 'Business', 'Mechanical Engineering', 'Medicine', 'Law', 'Data Science', 'Robotics', 'Philosophy'])[1 + (g / 3) % 8],
+            (g * 37) % 90000,
+            ((g * 13) % 100) / 100.0,
+            1 + g % 1000,
+            'Known for ' || (ARRAY['machine learning', 'finance', 'clinical research', 'public policy', 'renewable energy', 'literature'])[1 + (g / 7) % 6]
+                || ' with campuses near ' || (ARRAY['London', 'Boston', 'Toronto', 'Berlin', 'Sydney', 'Paris'])[1 + (g / 11) % 6] || '.'
+        FROM generate_series(1, :rows) g
+    """), {"rows": rows})
+    conn.execute(text("""
+        INSERT INTO universities (name, country, degree_type, field_of_study, description)
+        VALUES ('Stanford University', 'USA', 'Master''s', 'Computer Science', 'Research university in Silicon Valley.')
+    """))
+    conn.execute(text("ANALYZE universities"))
+
+def used_indexes(conn, statement) -> set:
+    compiled = statement.compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return {n["Index Name"] for n in plan_nodes(plan[0]["Plan"]) if "Index Name" in n}
+
+def bench(conn, runs: int):
+    db = SyncSessionAdapter(Session(bind=conn))
+    loop = asyncio.new_event_loop()
+    for search in QUERIES:
+        indexes = used_indexes(conn, text_search_query(search)) | used_indexes(conn, fuzzy_name_query(search))
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            results = loop.run_until_complete(search_universities(db, search))
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        top = results[0].name if results else "-"
+        print(f"{search!r:28} {len(results):3} results  p50 {statistics.median(timings):6.2f} ms  p95 {p95:6.2f} ms  top: {top}  [{', '.join(sorted(indexes)) or 'no index'}]")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database afterwards")
+    args = parser.parse_args()
+
+    url = make_url(DATABASE_URL)
+    scratch_name = f"{url.database}_search_bench"
+    scratch_url = url.set(database=scratch_name).render_as_string(hide_password=False)
+    admin = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch_name}"'))
+        conn.execute(text(f'CREATE DATABASE "{scratch_name}"'))
+    scratch = create_engine(scratch_url)
+    try:
+        config = Config(ALEMBIC_INI)
+        config.set_main_option("sqlalchemy.url", scratch_url.replace("%", "%%"))
+        command.upgrade(config, "head")
+
+        with scratch.begin() as conn:
+            load_catalog(conn, args.rows)
+        with scratch.connect() as conn:
+            bench(conn, args.runs)
+    finally:
+        scratch.dispose()
+        if not args.keep:
+            with admin.connect() as conn:
+                conn.execute(text(f'DROP DATABASE IF EXISTS "{scratch_name}"'))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Faceted browsing of the local university catalog.
+
+Filters are plain SQL predicates grouped by facet, pages are fetched with keyset
+(cursor) pagination over an indexed sort key, and facet counts are computed in
+one SQL statement. Nothing here loads more than a page of rows into Python.
+"""
+import base64
+import json
+from typing import Dict, Optional
+
+from sqlalchemy import Select, String, and_, case, func, literal, select, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from countries import country_code_of
+from models import University
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Sort name -> (column, descending). Each column has an index serving both directions: the
+# (column, id) indexes from migration 0004, scanned backward for descending sorts, and for
+# name its unique index (the id tiebreak never reorders unique names). NULLs always sort
+# last so programs with unknown fees or rates don't crowd the first page.
+SORTS = {
+    "ranking": (University.ranking, False),
+    "tuition": (University.tuition_fee, False),
+    "-tuition": (University.tuition_fee, True),
+    "acceptance": (University.acceptance_rate, False),
+    "-acceptance": (University.acceptance_rate, True),
+    "name": (University.name, False),
+}
+DEFAULT_SORT = "ranking"
+
+TUITION_BANDS = [(0, 10000, "Under $10k"), (10000, 30000, "$10k-30k"), (30000, 50000, "$30k-50k"), (50000, None, "$50k+")]
+ACCEPTANCE_BANDS = [(0, 0.2, "Highly selective (<20%)"), (0.2, 0.5, "Selective (20-50%)"), (0.5, None, "Accessible (50%+)")]
+
+def catalog_filters(
+    country: Optional[str] = None,
+    degree: Optional[str] = None,
+    field: Optional[str] = None,
+    min_tuition: Optional[float] = None,
+    max_tuition: Optional[float] = None,
+    min_acceptance: Optional[float] = None,
+    max_acceptance: Optional[float] = None,
+    max_ranking: Optional[int] = None,
+) -> Dict[str, list]:
+    """SQL predicates for the requested filters, keyed by the facet they narrow"""
+    filters = {"country": [], "degree_type": [], "field": [], "tuition": [], "acceptance": [], "ranking": []}
+    if country:
+        # Any spelling of the country; an indexed equality on its code
+        filters["country"].append(University.country_code == country_code_of(country))
+    if degree:
+        filters["degree_type"].append(University.degree_type == degree)
+    if field:
+        # field_of_study holds comma-separated lists; served by the trigram index. A % or _
+        # in the input is matched literally
+        filters["field"].append(University.field_of_study.icontains(field, autoescape=True))
+    if min_tuition is not None:
+        filters["tuition"].append(University.tuition_fee >= min_tuition)
+    if max_tuition is not None:
+        filters["tuition"].append(University.tuition_fee <= max_tuition)
+    if min_acceptance is not None:
+        filters["acceptance"].append(University.acceptance_rate >= min_acceptance)
+    if max_acceptance is not None:
+        filters["acceptance"].append(University.acceptance_rate <= max_acceptance)
+    if max_ranking is not None:
+        filters["ranking"].append(University.ranking <= max_ranking)
+    return filters
+
+def all_filters(filters: Dict[str, list], except_facet: Optional[str] = None) -> list:
+    return [clause for facet, clauses in filters.items() if facet != except_facet for clause in clauses]
+
+def encode_cursor(sort: str, uni: University) -> str:
+    column, _ = SORTS[sort]
+    payload = json.dumps([sort, getattr(uni, column.key), uni.id])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str, sort: str):
+    """(value, id) of the last row on the previous page; ValueError if unusable"""
+    try:
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if cursor_sort != sort:
+        raise ValueError("Cursor was issued for a different sort")
+    return value, int(last_id)
+
+def _values_query(filters: list, sort: str, after) -> Select:
+    # Rows with a sort value, walked as a (value, id) row comparison so the index serves it
+    column, descending = SORTS[sort]
+    statement = select(University).where(*filters, column.is_not(None))
+    if after is not None:
+        key, bound = tuple_(column, University.id), tuple_(*after)
+        statement = statement.where(key < bound if descending else key > bound)
+    order = [column.desc(), University.id.desc()] if descending else [column.asc(), University.id.asc()]
+    return statement.order_by(*order)
+
+def _nulls_query(filters: list, sort: str, after_id: Optional[int]) -> Select:
+    # The NULLS LAST tail, only reached once every row with a value has been paged through
+    column, descending = SORTS[sort]
+    statement = select(University).where(*filters, column.is_(None))
+    if after_id is not None:
+        statement = statement.where(University.id < after_id if descending else University.id > after_id)
+    return statement.order_by(University.id.desc() if descending else University.id.asc())
+
+async def browse_universities(db: AsyncSession, filters: list, sort: str = DEFAULT_SORT, cursor: Optional[str] = None, limit: int = PAGE_SIZE):
+    """One page of universities matching `filters` in `sort` order: (page, next cursor or None)"""
+    after = decode_cursor(cursor, sort) if cursor else None
+    # One extra row tells us whether there is a next page
+    wanted = limit + 1
+    rows = []
+    if after is None or after[0] is not None:
+        rows = list((await db.scalars(_values_query(filters, sort, after).limit(wanted))).all())
+    if len(rows) < wanted:
+        after_id = after[1] if after is not None and after[0] is None else None
+        rows += (await db.scalars(_nulls_query(filters, sort, after_id).limit(wanted - len(rows)))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(sort, rows[-1])
+    return rows, None
+
+def _band(column, bands):
+    return case(
+        *[((column >= low) if high is None else and_(column >= low, column < high), label) for low, high, label in bands],
+        else_=None,
+    )
+
+# Facet name -> (grouping expression, the filter group it ignores)
+FACETS = {
+    "country": (University.country_code, "country"),
+    "degree_type": (University.degree_type, "degree_type"),
+    "tuition": (_band(University.tuition_fee, TUITION_BANDS), "tuition"),
+    "acceptance": (_band(University.acceptance_rate, ACCEPTANCE_BANDS), "acceptance"),
+}
+
+async def facet_counts(db: AsyncSession, filters: Dict[str, list]) -> dict:
+    """Counts per facet value in one statement.
+
+    Each facet is counted with every filter except its own, so the client can show
+    how many results picking a different value would give.
+    """
+    parts = [
+        select(literal("total").label("facet"), literal(None, String).label("value"), func.count().label("n"))
+        .select_from(University).where(*all_filters(filters))
+    ]
+    for name, (expression, own_filter) in FACETS.items():
+        parts.append(
+            select(literal(name).label("facet"), expression.label("value"), func.count().label("n"))
+            .where(*all_filters(filters, except_facet=own_filter))
+            .group_by(expression)
+        )
+    counts = {"total": 0, **{name: {} for name in FACETS}}
+    for facet, value, n in (await db.execute(union_all(*parts))).all():
+        if facet == "total":
+            counts["total"] = n
+        elif value is not None:
+            counts[facet][value] = n
+    return counts
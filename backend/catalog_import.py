@@ -0,0 +1,144 @@
+"""
+Streaming university catalog import.
+
+Reads CSV or NDJSON a chunk at a time, validates each row against UniversityImport
+and bulk-upserts the chunk keyed on the unique university name, so
+memory stays flat however large the file is:
+    python manage.py import-catalog universities.csv
+    python manage.py import-catalog programs.ndjson --chunk-size 5000 --copy
+"""
+import csv
+import io
+import json
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from database import engine
+from models import University
+from schemas import UniversityImport
+
+COLUMNS = list(UniversityImport.model_fields)
+DEFAULT_CHUNK_SIZE = 1000
+# Validation failures printed per import; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+def detect_format(path: str) -> str:
+    return "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+
+def read_rows(path: str, fmt: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw row) pairs without loading the file"""
+    fmt = fmt or detect_format(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                # Empty CSV cells mean "unknown", not an empty string
+                yield reader.line_num, {k: (v if v != "" else None) for k, v in row.items() if k}
+        else:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_num, json.loads(line)
+                except json.JSONDecodeError:
+                    # Reported by validation like any other malformed row
+                    yield line_num, None
+
+def validate_rows(rows: Iterable[Tuple[int, dict]], stats: dict) -> Iterator[dict]:
+    """Yield rows that pass the schema, counting and reporting the ones that don't"""
+    for line_num, raw in rows:
+        try:
+            yield UniversityImport.model_validate(raw).model_dump()
+        except ValidationError as e:
+            stats["invalid"] += 1
+            if stats["invalid"] <= MAX_REPORTED_ERRORS:
+                problems = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'row'}: {err['msg']}" for err in e.errors())
+                print(f"Line {line_num}: skipped invalid row ({problems})")
+
+def chunked(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+def _dedupe_by_name(chunk: List[dict]) -> List[dict]:
+    # ON CONFLICT DO UPDATE can't touch the same row twice in one statement; the last row wins
+    return list({row["name"]: row for row in chunk}.values())
+
+def upsert_universities(conn, rows: List[dict], update: bool = True) -> int:
+    """Bulk insert `rows`, updating (or skipping) names that already exist.
+
+    Returns how many rows were written.
+    """
+    if not rows:
+        return 0
+    # Executemany with RETURNING lets SQLAlchemy batch the rows into a few
+    # multi-row INSERTs from one cached statement instead of compiling a giant VALUES
+    rows = [{column: row.get(column) for column in COLUMNS} for row in _dedupe_by_name(rows)]
+    stmt = pg_insert(University.__table__)
+    if update:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[University.name],
+            # An imported row replaces a placeholder created for an external pick
+            set_={**{column: stmt.excluded[column] for column in COLUMNS if column != "name"}, "placeholder": False},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=[University.name])
+    return len(conn.execute(stmt.returning(University.id), rows).all())
+
+def _copy_upsert(conn, rows: List[dict]) -> int:
+    """COPY the chunk into a temp staging table, then merge it with one INSERT ... SELECT"""
+    rows = _dedupe_by_name(rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if row[c] is None else row[c] for c in COLUMNS])
+    buffer.seek(0)
+
+    column_list = ", ".join(COLUMNS)
+    updates = ", ".join([f"{c} = EXCLUDED.{c}" for c in COLUMNS if c != "name"] + ["placeholder = false"])
+    # psycopg2's COPY support; the staging table copies column types only, no id sequence
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS university_staging ON COMMIT DELETE ROWS "
+            f"AS SELECT {column_list} FROM universities WITH NO DATA"
+        )
+        cursor.copy_expert(f"COPY university_staging ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        cursor.execute(
+            f"INSERT INTO universities ({column_list}) SELECT {column_list} FROM university_staging "
+            f"ON CONFLICT (name) DO UPDATE SET {updates}"
+        )
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def import_catalog(path: str, fmt: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, use_copy: bool = False) -> Dict[str, int]:
+    """Stream `path` into the universities table, committing once per chunk"""
+    stats = {"read": 0, "invalid": 0, "written": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    def counted(rows):
+        for row in rows:
+            stats["read"] += 1
+            yield row
+
+    valid_rows = validate_rows(counted(read_rows(path, fmt)), stats)
+    for chunk in chunked(valid_rows, chunk_size):
+        chunk_started = time.perf_counter()
+        with engine.begin() as conn:
+            written = _copy_upsert(conn, chunk) if use_copy else upsert_universities(conn, chunk)
+        elapsed = time.perf_counter() - chunk_started
+        stats["chunks"] += 1
+        stats["written"] += written
+        print(f"Chunk {stats['chunks']}: wrote {len(chunk)} rows in {elapsed * 1000:.0f} ms ({len(chunk) / elapsed:,.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Imported {stats['written']} universities from {stats['read']} rows "
+        f"({stats['invalid']} invalid) in {elapsed:.1f}s ({stats['read'] / elapsed if elapsed else 0:,.0f} rows/s)"
+    )
+    return stats
@@ -0,0 +1,53 @@
+"""
+Local catalog search over the universities table.
+
+Full-text matches on the stored, weighted search_vector are ranked first (name
+outranks field of study, which outranks description). When that finds little,
+trigram word similarity on names adds typo-tolerant matches, so "stanfrd" still
+finds Stanford. Both stages are served by GIN indexes (see migration 0003).
+"""
+from typing import List
+
+from sqlalchemy import Select, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from models import University
+
+SEARCH_CONFIG = "english"
+SEARCH_LIMIT = 50
+# Matches ranked per stage; very broad terms ("university") are ranked over the first
+# index hits rather than the whole catalog, which keeps every query a bounded amount of work
+SEARCH_CANDIDATES = 500
+# Fewer full-text hits than this and the query is probably a misspelt name
+FUZZY_MIN_RESULTS = 5
+# Fuzzy matches only top up a short result list, so they need a smaller slice
+FUZZY_CANDIDATES = 100
+
+def _candidates(condition, filters, cap: int = SEARCH_CANDIDATES):
+    # Capped before ranking; the outer query ranks only this slice, with no join back
+    subquery = select(*University.__table__.c).where(condition, *filters).limit(cap).subquery()
+    return subquery, aliased(University, subquery)
+
+def text_search_query(search: str, limit: int = SEARCH_LIMIT, *filters) -> Select:
+    """Full-text matches for `search`, best ranked first"""
+    ts_query = func.websearch_to_tsquery(SEARCH_CONFIG, search)
+    candidates, uni = _candidates(University.search_vector.bool_op("@@")(ts_query), filters)
+    # Normalization 32 scales the rank into [0, 1); the A/B/C weights put name hits first
+    rank = func.ts_rank_cd(candidates.c.search_vector, ts_query, 32)
+    return select(uni).order_by(rank.desc(), uni.id).limit(limit)
+
+def fuzzy_name_query(search: str, limit: int = SEARCH_LIMIT, *filters) -> Select:
+    """Universities whose name contains a word close to `search`, closest first"""
+    candidates, uni = _candidates(literal(search).bool_op("<%")(University.name), filters, FUZZY_CANDIDATES)
+    return select(uni).order_by(func.word_similarity(search, candidates.c.name).desc(), uni.id).limit(limit)
+
+async def search_universities(db: AsyncSession, search: str, limit: int = SEARCH_LIMIT, *filters) -> List[University]:
+    """Ranked local search, topped up with fuzzy name matches when full-text finds little"""
+    results = list((await db.scalars(text_search_query(search, limit, *filters))).all())
+    if len(results) < FUZZY_MIN_RESULTS:
+        seen = {u.id for u in results}
+        for uni in (await db.scalars(fuzzy_name_query(search, limit, *filters))).all():
+            if uni.id not in seen and len(results) < limit:
+                results.append(uni)
+    return results
@@ -0,0 +1,145 @@
+"""
+"More like this" similarity over the local university catalog.
+
+Each program is a TF-IDF vector of hashed word unigrams and bigrams from its name,
+field of study, description and country, stored as one row of a sparse matrix.
+Hashing keeps the vocabulary fixed, so when the catalog snapshot changes only new
+or edited rows are vectorized and deleted rows dropped; document frequencies are
+adjusted for just those rows. Queries (a program's own row, or a student's profile)
+are scored by cosine similarity against every row with one sparse product.
+"""
+import asyncio
+import math
+import re
+import time
+import zlib
+from collections import Counter
+from typing import List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from catalog_snapshot import CatalogSnapshot
+from models import Onboarding
+
+# 2^18 hashed features keeps collisions rare for catalog-sized vocabularies
+N_FEATURES = 1 << 18
+# Field of study says most about what a program is; country least
+FIELD_WEIGHTS = (("name", 1.0), ("field_of_study", 2.0), ("description", 1.0), ("country", 0.5))
+STOP_WORDS = frozenset("a an and at for from in of on or the to with".split())
+TOKEN = re.compile(r"[a-z0-9]+")
+
+def _features(field: str, text: Optional[str]) -> List[str]:
+    if not text:
+        return []
+    if field == "country":
+        # Profiles list several countries, comma-separated
+        return [f"country={c.strip().lower()}" for c in text.split(",") if c.strip()]
+    words = [w for w in TOKEN.findall(text.lower()) if w not in STOP_WORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+def vectorize(docs: List[dict]) -> sparse.csr_matrix:
+    """Hashed, sublinear term-frequency rows (IDF is applied at query time)"""
+    indptr, indices, data = [0], [], []
+    for doc in docs:
+        weights = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            for feature in _features(field, doc.get(field)):
+                weights[zlib.crc32(feature.encode()) & (N_FEATURES - 1)] += weight
+        indices.extend(weights)
+        data.extend(1 + math.log(w) if w >= 1 else w for w in weights.values())
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(docs), N_FEATURES),
+    )
+
+def _record_doc(record) -> dict:
+    # Countries compare by ISO code, so "USA" and "United States" are one feature
+    return {field: record.country_code if field == "country" else getattr(record, field) for field, _ in FIELD_WEIGHTS}
+
+def _fingerprint(record) -> int:
+    return hash((record.name, record.field_of_study, record.description, record.country_code))
+
+def _document_frequency(rows: sparse.csr_matrix) -> np.ndarray:
+    return np.bincount(rows.indices, minlength=N_FEATURES).astype(np.int32)
+
+class _IndexState(NamedTuple):
+    version: Optional[int]
+    ids: np.ndarray
+    row_of: dict
+    fingerprints: dict
+    rows: sparse.csr_matrix     # term frequencies, for incremental updates
+    columns: sparse.csc_matrix  # the same with IDF^2 applied, for scoring
+    idf: np.ndarray
+    norms: np.ndarray
+    df: np.ndarray
+
+def _finish(version, ids, fingerprints, rows, df) -> _IndexState:
+    idf = (np.log((1 + len(ids)) / (1 + df)) + 1).astype(np.float32)
+    weighted = rows @ sparse.diags(idf * idf)
+    # Row norms of the TF-IDF vectors: sqrt(sum((tf * idf)^2))
+    norms = np.sqrt(np.asarray(rows.multiply(rows) @ (idf * idf))).ravel()
+    norms[norms == 0] = 1.0
+    return _IndexState(version, ids, {int(i): p for p, i in enumerate(ids)}, fingerprints, rows, weighted.tocsc(), idf, norms, df)
+
+EMPTY = _finish(None, np.empty(0, dtype=np.int64), {}, sparse.csr_matrix((0, N_FEATURES), dtype=np.float32), np.zeros(N_FEATURES, dtype=np.int32))
+
+class SimilarityIndex:
+    def __init__(self):
+        self.state = EMPTY
+        self._lock = asyncio.Lock()
+
+    def _sync(self, catalog: CatalogSnapshot) -> _IndexState:
+        state = self.state
+        started = time.perf_counter()
+        fingerprints = {r.id: _fingerprint(r) for r in catalog.records}
+        keep = np.fromiter((fingerprints.get(int(i)) == state.fingerprints[int(i)] for i in state.ids), dtype=bool, count=len(state.ids))
+        kept_ids = set(state.ids[keep].tolist())
+        added = [r for r in catalog.records if r.id not in kept_ids]
+
+        dropped = state.rows[~keep]
+        new_rows = vectorize([_record_doc(r) for r in added])
+        df = state.df - _document_frequency(dropped) + _document_frequency(new_rows)
+        rows = sparse.vstack([state.rows[keep], new_rows], format="csr")
+        ids = np.concatenate([state.ids[keep], np.fromiter((r.id for r in added), dtype=np.int64, count=len(added))])
+        print(f"Similarity index v{catalog.version}: {len(added)} rows vectorized, {int((~keep).sum())} dropped, {len(ids)} total in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return _finish(catalog.version, ids, fingerprints, rows, df)
+
+    async def sync(self, catalog: CatalogSnapshot) -> _IndexState:
+        """Bring the index up to the snapshot's version, vectorizing only what changed"""
+        if self.state.version == catalog.version:
+            return self.state
+        async with self._lock:
+            if self.state.version != catalog.version:
+                # Vectorizing a large catalog takes a while; keep the event loop serving meanwhile
+                self.state = await asyncio.to_thread(self._sync, catalog)
+        return self.state
+
+    @staticmethod
+    def _top(state: _IndexState, query: sparse.csr_matrix, k: int, exclude: Optional[int] = None) -> List[Tuple[int, float]]:
+        if not len(state.ids) or not query.nnz:
+            return []
+        tfidf = query.data * state.idf[query.indices]
+        # Cosine: (rows * idf) . (query * idf) / (|row| |query|), touching only the query's columns
+        scores = (state.columns[:, query.indices] @ query.data) / (state.norms * np.linalg.norm(tfidf))
+        if exclude is not None:
+            scores[exclude] = -1.0
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        best = best[np.lexsort((best, -scores[best]))]
+        return [(int(state.ids[p]), float(scores[p])) for p in best if scores[p] > 0]
+
+    def similar(self, state: _IndexState, university_id: int, k: int) -> List[Tuple[int, float]]:
+        """(id, cosine) of the k programs most like `university_id`"""
+        position = state.row_of.get(university_id)
+        if position is None:
+            return []
+        return self._top(state, state.rows[position], k, exclude=position)
+
+    def match_profile(self, state: _IndexState, profile: Onboarding, k: int) -> List[Tuple[int, float]]:
+        """(id, cosine) of the k programs whose text best matches the student's goals"""
+        doc = {"field_of_study": profile.field_of_study, "description": profile.degree_major, "country": ",".join(profile.preferred_country_codes or [])}
+        return self._top(state, vectorize([doc]), k)
+
+similarity_index = SimilarityIndex()
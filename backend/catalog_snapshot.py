@@ -0,0 +1,173 @@
+"""
+In-process snapshot of the university catalog.
+
+The universities table is read-mostly, so each worker keeps a compact copy in
+memory: one __slots__ record per university plus lookup indexes by id, name,
+country code and degree, and the name and country aliases (university_names.py,
+countries.py). It's loaded on first use and reloaded in the background when the
+catalog_version counter (bumped by triggers, migration 0005) moves, so catalog
+reads on the request path are dictionary lookups. Ids the snapshot doesn't know
+yet (rows created since the last reload) fall back to the database.
+"""
+import asyncio
+import os
+import time
+from array import array
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import background_read_session
+from countries import CountryIndex
+from models import CatalogVersion, Country, CountryAlias, University, UniversityAlias
+from query_budget import uncounted
+from university_names import NameIndex
+
+# How often a worker asks the database whether the catalog changed
+CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CATALOG_VERSION_CHECK_SECONDS", "5"))
+
+class CatalogRecord:
+    """Read-only university row, attribute-compatible with University"""
+
+    __slots__ = ("id", "name", "country", "degree_type", "field_of_study", "tuition_fee", "acceptance_rate", "ranking", "description", "country_code")
+
+    def __init__(self, id, name, country, degree_type, field_of_study, tuition_fee, acceptance_rate, ranking, description, country_code=None):
+        self.id = id
+        self.name = name
+        self.country = country
+        self.country_code = country_code
+        self.degree_type = degree_type
+        self.field_of_study = field_of_study
+        self.tuition_fee = tuition_fee
+        self.acceptance_rate = acceptance_rate
+        self.ranking = ranking
+        self.description = description
+
+RECORD_COLUMNS = [getattr(University, field) for field in CatalogRecord.__slots__]
+
+class CatalogSnapshot:
+    """Immutable catalog copy; secondary indexes hold positions into `records`"""
+
+    __slots__ = ("version", "records", "by_id", "by_name", "names", "countries", "_by_country", "_by_degree")
+
+    def __init__(
+        self,
+        version: int,
+        rows: Iterable[Sequence],
+        aliases: Iterable[Sequence] = (),
+        countries: Optional[CountryIndex] = None,
+    ):
+        self.version = version
+        self.records = tuple(CatalogRecord(*row) for row in rows)
+        self.by_id: Dict[int, CatalogRecord] = {}
+        self.by_name: Dict[str, CatalogRecord] = {}
+        self._by_country: Dict[str, array] = {}
+        self._by_degree: Dict[str, array] = {}
+        for position, record in enumerate(self.records):
+            self.by_id[record.id] = record
+            self.by_name[record.name] = record
+            if record.country_code:
+                self._by_country.setdefault(record.country_code, array("L")).append(position)
+            if record.degree_type:
+                self._by_degree.setdefault(record.degree_type, array("L")).append(position)
+        # Keys for merging spellings of one university (university_names.py)
+        self.names = NameIndex(aliases, self.by_name)
+        self.countries = countries or CountryIndex()
+
+    def __len__(self):
+        return len(self.records)
+
+    def in_countries(self, codes: Iterable[str]) -> List[CatalogRecord]:
+        positions = sorted(p for code in codes for p in self._by_country.get(code, ()))
+        return [self.records[p] for p in positions]
+
+    def with_degree(self, degree: str) -> List[CatalogRecord]:
+        return [self.records[p] for p in self._by_degree.get(degree, ())]
+
+_snapshot: Optional[CatalogSnapshot] = None
+_checked_at = 0.0
+_refresh_task: Optional[asyncio.Task] = None
+# Coroutine functions run (as tasks) whenever this worker loads a new catalog version
+_listeners: List[Callable[[], Awaitable]] = []
+_listener_tasks = set()
+
+def on_catalog_change(listener: Callable[[], Awaitable]):
+    _listeners.append(listener)
+
+def _publish(snapshot: CatalogSnapshot):
+    global _snapshot
+    _snapshot = snapshot
+    for listener in _listeners:
+        task = asyncio.create_task(listener())
+        _listener_tasks.add(task)
+        task.add_done_callback(_listener_tasks.discard)
+
+async def _load(db: AsyncSession) -> CatalogSnapshot:
+    started = time.perf_counter()
+    # Version first: rows read afterwards are at least that new, so a concurrent write is never lost
+    version = await db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1)) or 0
+    # Placeholders for external picks are read on demand (find_university, catalog_records)
+    rows = (await db.execute(select(*RECORD_COLUMNS).where(University.placeholder.is_(False)).order_by(University.id))).all()
+    aliases = (await db.execute(select(UniversityAlias.alias_key, UniversityAlias.canonical_key, UniversityAlias.display_only))).all()
+    countries = CountryIndex(
+        (await db.execute(select(Country.code, Country.name))).all(),
+        (await db.execute(select(CountryAlias.alias, CountryAlias.code))).all(),
+    )
+    snapshot = CatalogSnapshot(version, rows, aliases, countries)
+    print(f"Loaded catalog snapshot v{version}: {len(snapshot)} universities in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return snapshot
+
+async def _refresh_if_changed():
+    try:
+        async with background_read_session() as db:
+            version = await db.scalar(select(CatalogVersion.version).where(CatalogVersion.id == 1)) or 0
+            if _snapshot is None or version != _snapshot.version:
+                _publish(await _load(db))
+    except Exception as e:
+        print(f"Catalog snapshot refresh failed, keeping v{_snapshot.version if _snapshot else '-'}: {e}")
+
+async def get_catalog(db: AsyncSession) -> CatalogSnapshot:
+    """The current snapshot; the first call loads it through `db`, later changes reload in the background"""
+    global _checked_at, _refresh_task
+    # A cold worker's load and the reloads it triggers aren't the request's own queries
+    if _snapshot is None:
+        with uncounted():
+            _publish(await _load(db))
+        _checked_at = time.monotonic()
+    elif time.monotonic() - _checked_at >= CATALOG_VERSION_CHECK_SECONDS and (_refresh_task is None or _refresh_task.done()):
+        _checked_at = time.monotonic()
+        with uncounted():
+            _refresh_task = asyncio.create_task(_refresh_if_changed())
+    return _snapshot
+
+def invalidate_catalog():
+    """Re-check the version on the next read (after this worker changed the catalog itself)"""
+    global _checked_at
+    _checked_at = 0.0
+
+async def catalog_records(db: AsyncSession, ids: Iterable[int]) -> List[CatalogRecord]:
+    """Records for `ids` in the given order, reading only ids the snapshot doesn't have yet"""
+    catalog = await get_catalog(db)
+    ids = list(ids)
+    missing = [i for i in ids if i not in catalog.by_id]
+    fetched = {}
+    if missing:
+        rows = (await db.execute(select(*RECORD_COLUMNS).where(University.id.in_(missing)))).all()
+        fetched = {row.id: CatalogRecord(*row) for row in rows}
+    records = (catalog.by_id.get(i) or fetched.get(i) for i in ids)
+    return [r for r in records if r is not None]
+
+def record_query(university_id=None, name: Optional[str] = None):
+    """The record of one university by id or exact name (served by the primary key or ix_universities_name)"""
+    condition = University.name == name if name is not None else University.id == university_id
+    return select(*RECORD_COLUMNS).where(condition)
+
+async def find_university(db: AsyncSession, university_id=None, name: Optional[str] = None) -> Optional[CatalogRecord]:
+    """Look a university up by id or exact name, snapshot first"""
+    catalog = await get_catalog(db)
+    record = catalog.by_name.get(name) if name is not None else catalog.by_id.get(university_id)
+    if record is None:
+        row = (await db.execute(record_query(university_id, name))).first()
+        record = CatalogRecord(*row) if row else None
+    return record
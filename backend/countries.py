@@ -0,0 +1,73 @@
+"""
+Canonical countries: ISO 3166-1 alpha-2 codes, and the spellings that mean each one.
+
+Country names are free text everywhere they come from: the catalog says "USA" and
+"UK", the registry "United States" and "United Kingdom", and users type anything.
+The countries table holds one row per code, and country_aliases maps every known
+spelling's key (country_key) to its code. Triggers from migration 0014 set
+universities.country_code and onboarding.preferred_country_codes from those
+aliases whenever a row is written, so every country filter compares codes: in SQL
+through country_code_of(), and in the catalog snapshot through a CountryIndex.
+The registry mirror carries its own alpha_two_code, and registry_sync.py adds the
+registry's spellings as aliases.
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import func, select, text
+
+from models import CountryAlias
+
+_COMBINING = re.compile("[\u0300-\u036f]")
+_SEPARATORS = re.compile("[^a-z0-9]+")
+
+class CountryRef(NamedTuple):
+    code: str
+    name: str
+
+def country_key(value: Optional[str]) -> str:
+    """Accent-, case- and punctuation-insensitive form of a country name; same as the SQL country_key()"""
+    value = _COMBINING.sub("", unicodedata.normalize("NFKD", value or "").lower())
+    return _SEPARATORS.sub(" ", value).strip()
+
+def country_code_of(value: str):
+    """SQL expression for the code `value` names (NULL when none), for equality filters on code columns"""
+    return select(CountryAlias.code).where(CountryAlias.alias_key == func.country_key(value)).scalar_subquery()
+
+class CountryIndex:
+    """Code lookup for any spelling, held by the catalog snapshot"""
+
+    __slots__ = ("by_code", "_codes")
+
+    def __init__(self, countries: Iterable[Tuple[str, str]] = (), aliases: Iterable[Tuple[str, str]] = ()):
+        self.by_code: Dict[str, CountryRef] = {code: CountryRef(code, name) for code, name in countries}
+        self._codes: Dict[str, str] = {country_key(alias): code for alias, code in aliases}
+
+    def lookup(self, value: Optional[str]) -> Optional[CountryRef]:
+        code = self._codes.get(country_key(value))
+        return self.by_code.get(code) if code else None
+
+    def codes(self, values: Iterable[str]) -> List[str]:
+        """Codes of the recognised `values`, first occurrence first"""
+        found = (self.lookup(value) for value in values)
+        return list(dict.fromkeys(country.code for country in found if country))
+
+# Re-derive the codes of rows using spellings whose alias was just added or changed; the triggers do the work
+RECODE_UNIVERSITIES = text("""
+    UPDATE universities SET country = country
+    WHERE country_key(country) = ANY(:keys)
+""")
+RECODE_ONBOARDING = text("""
+    UPDATE onboarding SET preferred_countries = preferred_countries, recommendations_version = NULL
+    WHERE EXISTS (
+        SELECT 1 FROM unnest(string_to_array(preferred_countries, ',')) AS p(value)
+        WHERE country_key(p.value) = ANY(:keys)
+    )
+""")
+
+def recode(conn, alias_keys: List[str]):
+    """Apply new aliases to existing universities and profiles (sync connection)"""
+    if alias_keys:
+        conn.execute(RECODE_UNIVERSITIES, {"keys": alias_keys})
+        conn.execute(RECODE_ONBOARDING, {"keys": alias_keys})
@@ -0,0 +1,311 @@
+"""
+Lookups in the Hipolabs university registry (universities.hipolabs.com).
+
+Listings search the local external_universities mirror, which registry_sync.py
+keeps in sync with the full registry dataset, so once it has been synced no request
+waits on the network. Until the first sync, searches go to the registry's API.
+
+API responses are parsed as they stream in, and reading stops once a listing's
+worth of results has arrived. Those results are cached per normalized (country,
+name) query in two tiers: a bounded in-process dict per worker, and the
+external_university_cache table shared by all workers and kept across restarts. A
+fresh entry is served as is. A stale one (past its TTL but inside the stale
+window) is served immediately while one background task per key refreshes it.
+Only a missing or fully expired entry makes the request wait for the registry,
+and concurrent requests for the same key share that fetch. Empty results are
+cached for a shorter time, and upstream failures for a short time, keeping any
+previous results, so an outage costs one timeout per key rather than one per
+request.
+"""
+import asyncio
+import codecs
+import json
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from itertools import chain, zip_longest
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import delete, exists, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import outbound_http
+from countries import CountryRef
+from database import background_session
+from models import ExternalUniversity, ExternalUniversityCache, RegistrySync
+
+HIPOLABS_URL = "http://universities.hipolabs.com/search"
+EXTERNAL_CACHE_TTL_SECONDS = int(os.getenv("EXTERNAL_CACHE_TTL_SECONDS", "86400"))
+# How long past its TTL an entry is still served while it is refreshed
+EXTERNAL_CACHE_STALE_SECONDS = int(os.getenv("EXTERNAL_CACHE_STALE_SECONDS", "604800"))
+EXTERNAL_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("EXTERNAL_CACHE_NEGATIVE_TTL_SECONDS", "3600"))
+EXTERNAL_CACHE_ERROR_TTL_SECONDS = int(os.getenv("EXTERNAL_CACHE_ERROR_TTL_SECONDS", "60"))
+EXTERNAL_CACHE_MAX_ENTRIES = int(os.getenv("EXTERNAL_CACHE_MAX_ENTRIES", "512"))
+# Registry results one lookup returns; listings show at most 100 results
+REGISTRY_RESULT_LIMIT = 100
+# Registry API responses are read up to this size (a country search can run to megabytes)
+EXTERNAL_MAX_RESPONSE_BYTES = int(os.getenv("EXTERNAL_MAX_RESPONSE_BYTES", str(2 * 1024 * 1024)))
+# Longest single registry entry accepted while streaming
+MAX_ENTRY_CHARS = 64 * 1024
+# How often a worker whose mirror was empty checks whether it has been synced since
+REGISTRY_CHECK_SECONDS = 60
+# Registry lookups one listing runs at once, and how long it waits for any one of them
+EXTERNAL_FANOUT_CONCURRENCY = int(os.getenv("EXTERNAL_FANOUT_CONCURRENCY", "4"))
+EXTERNAL_BRANCH_TIMEOUT_SECONDS = float(os.getenv("EXTERNAL_BRANCH_TIMEOUT_SECONDS", "4"))
+# Rows this far past their stale window are deleted, at most once per interval per worker
+PURGE_INTERVAL_SECONDS = 3600
+
+class CacheEntry(NamedTuple):
+    results: List[dict]
+    status: str  # ok, empty or error
+    fresh_until: datetime
+    stale_until: datetime
+
+def cache_key(country: Optional[str], name: Optional[str]) -> str:
+    """Case- and whitespace-insensitive key for a registry query"""
+    return "|".join(" ".join((part or "").lower().split()) for part in (country, name))
+
+def normalize_text(value: Optional[str]) -> str:
+    """Accent-, case- and punctuation-insensitive form of a name or country"""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c if c.isalnum() else " " for c in value if not unicodedata.combining(c))
+    return " ".join(value.casefold().split())
+
+def normalize_domain(domain: str) -> str:
+    domain = domain.strip().lower().rstrip(".")
+    return domain[4:] if domain.startswith("www.") else domain
+
+_memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+_inflight: Dict[str, asyncio.Task] = {}
+_purged_at = 0.0
+# Whether the mirror has been synced, and when this worker last found it hadn't
+_mirror_synced = False
+_mirror_checked_at = float("-inf")
+
+def _remember(key: str, entry: CacheEntry):
+    _memory[key] = entry
+    _memory.move_to_end(key)
+    while len(_memory) > EXTERNAL_CACHE_MAX_ENTRIES:
+        _memory.popitem(last=False)
+
+async def read_registry_entries(chunks: AsyncIterator[bytes], limit: int = REGISTRY_RESULT_LIMIT) -> List[dict]:
+    """Entries of a registry JSON array, parsed as the bytes arrive.
+
+    Stops as soon as `limit` entries with distinct names are in, so only that much
+    of a large response is read and parsed. Memory stays bounded: past
+    EXTERNAL_MAX_RESPONSE_BYTES the read stops with what it has, and an entry
+    longer than MAX_ENTRY_CHARS is treated as malformed.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buffer, position, opened = "", 0, False
+    received = 0
+    seen = set()
+    entries = []
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > EXTERNAL_MAX_RESPONSE_BYTES:
+            print(f"Registry response over {EXTERNAL_MAX_RESPONSE_BYTES} bytes, keeping the first {len(entries)} entries")
+            break
+        # Only the unparsed tail is kept between chunks
+        buffer, position = buffer[position:] + text.decode(chunk), 0
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not opened:
+                if buffer[position] != "[":
+                    raise ValueError("Registry response is not a JSON array")
+                opened, position = True, position + 1
+                continue
+            if buffer[position] == "]":
+                return entries
+            try:
+                entry, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The entry continues in the next chunk
+                if len(buffer) - position > MAX_ENTRY_CHARS:
+                    raise ValueError("Registry response entry too large")
+                break
+            name = entry.get("name") if isinstance(entry, dict) else None
+            if name and name not in seen:
+                seen.add(name)
+                entries.append(entry)
+                if len(entries) >= limit:
+                    return entries
+    return entries
+
+async def fetch_external_universities(country: Optional[str] = None, name: Optional[str] = None) -> Optional[List[dict]]:
+    """Query the registry directly, reading only as much as a listing shows; None when it fails"""
+    params = {}
+    if country:
+        params["country"] = country
+    if name:
+        params["name"] = name
+
+    try:
+        # Searches are safe to repeat; a dead registry fails fast once its breaker opens
+        response = await outbound_http.request("GET", HIPOLABS_URL, params=params, retries=2, timeout=10.0, stream=True)
+        try:
+            if response.status_code == 200:
+                return await read_registry_entries(response.aiter_bytes())
+            print(f"Error fetching external universities: HTTP {response.status_code}")
+        finally:
+            # Closing before the end drops the connection instead of downloading the rest
+            await response.aclose()
+    except Exception as e:
+        print(f"Error fetching external universities: {e}")
+    return None
+
+def _entry(results: Optional[List[dict]], previous: Optional[CacheEntry]) -> CacheEntry:
+    now = datetime.utcnow()
+    if results is None:
+        # Keep serving what we had, and retry after the short error TTL
+        until = now + timedelta(seconds=EXTERNAL_CACHE_ERROR_TTL_SECONDS)
+        if previous:
+            return CacheEntry(previous.results, "error", until, max(until, previous.stale_until))
+        return CacheEntry([], "error", until, until)
+    if not results:
+        until = now + timedelta(seconds=EXTERNAL_CACHE_NEGATIVE_TTL_SECONDS)
+        return CacheEntry([], "empty", until, until)
+    fresh_until = now + timedelta(seconds=EXTERNAL_CACHE_TTL_SECONDS)
+    # Only the fields listings use
+    results = [{"name": r.get("name"), "country": r.get("country"), "web_pages": r.get("web_pages") or []} for r in results if r.get("name")]
+    return CacheEntry(results, "ok", fresh_until, fresh_until + timedelta(seconds=EXTERNAL_CACHE_STALE_SECONDS))
+
+async def _store(key: str, country: Optional[str], name: Optional[str], entry: CacheEntry):
+    global _purged_at
+    try:
+        async with background_session() as db:
+            values = {
+                "key": key, "country": country, "name": name, "results": entry.results, "status": entry.status,
+                "fetched_at": datetime.utcnow(), "fresh_until": entry.fresh_until, "stale_until": entry.stale_until,
+            }
+            statement = pg_insert(ExternalUniversityCache).values(**values)
+            await db.execute(statement.on_conflict_do_update(
+                index_elements=["key"], set_={column: statement.excluded[column] for column in values if column != "key"}
+            ))
+            if time.monotonic() - _purged_at > PURGE_INTERVAL_SECONDS:
+                _purged_at = time.monotonic()
+                await db.execute(delete(ExternalUniversityCache).where(
+                    ExternalUniversityCache.stale_until < datetime.utcnow() - timedelta(days=1)
+                ))
+            await db.commit()
+    except Exception as e:
+        print(f"Could not store external university cache entry {key!r}: {e}")
+
+async def _refresh(key: str, country: Optional[str], name: Optional[str], previous: Optional[CacheEntry]) -> CacheEntry:
+    try:
+        entry = _entry(await fetch_external_universities(country=country, name=name), previous)
+        _remember(key, entry)
+        await _store(key, country, name, entry)
+        return entry
+    finally:
+        _inflight.pop(key, None)
+
+def _start_refresh(key: str, country: Optional[str], name: Optional[str], previous: Optional[CacheEntry]) -> asyncio.Task:
+    task = _inflight.get(key)
+    if task is None:
+        task = _inflight[key] = asyncio.create_task(_refresh(key, country, name, previous))
+    return task
+
+async def _load(db: AsyncSession, keys: List[str]):
+    """Pull entries this worker has no fresh copy of from the shared tier (another worker may have refreshed them)"""
+    now = datetime.utcnow()
+    keys = [key for key in keys if key not in _inflight and (key not in _memory or _memory[key].fresh_until <= now)]
+    if not keys:
+        return
+    for row in await db.scalars(select(ExternalUniversityCache).where(ExternalUniversityCache.key.in_(keys))):
+        _remember(row.key, CacheEntry(row.results, row.status, row.fresh_until, row.stale_until))
+
+async def _serve(key: str, country: Optional[str], name: Optional[str]) -> List[dict]:
+    entry = _memory.get(key)
+    now = datetime.utcnow()
+    if entry is not None and entry.fresh_until > now:
+        return entry.results
+    if entry is not None and entry.stale_until > now:
+        _start_refresh(key, country, name, entry)
+        return entry.results
+    # Shielded so a cancelled request doesn't cancel the fetch others are waiting on
+    return (await asyncio.shield(_start_refresh(key, country, name, entry))).results
+
+async def search_registry_api(db: AsyncSession, countries: List[Optional[str]], name: Optional[str] = None) -> List[List[dict]]:
+    """Registry API results per country, from the cache whenever it has anything usable.
+
+    Countries that need the network are fetched concurrently, at most
+    EXTERNAL_FANOUT_CONCURRENCY at a time. A country that takes longer than
+    EXTERNAL_BRANCH_TIMEOUT_SECONDS gives no results this time (its fetch carries on
+    and fills the cache), so the wait is bounded by the timeout and not the sum.
+    """
+    keys = [cache_key(country, name) for country in countries]
+    # One query for every country, before the branches run concurrently without the session
+    await _load(db, keys)
+    limit = asyncio.Semaphore(EXTERNAL_FANOUT_CONCURRENCY)
+
+    async def branch(key: str, country: Optional[str]) -> List[dict]:
+        async with limit:
+            try:
+                return await asyncio.wait_for(_serve(key, country, name), EXTERNAL_BRANCH_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                print(f"Registry lookup for {country!r} timed out, continuing without it")
+                return []
+
+    return list(await asyncio.gather(*(branch(key, country) for key, country in zip(keys, countries))))
+
+def _mirror_query(code: Optional[str], name: Optional[str]):
+    query = select(ExternalUniversity.name, ExternalUniversity.country, ExternalUniversity.web_pages)
+    if code:
+        # Served by the (alpha_two_code, normalized_name) index, already in order
+        query = query.where(ExternalUniversity.alpha_two_code == code)
+    if normalize_text(name):
+        # Substring match, like the registry's API; served by the trigram index
+        query = query.where(ExternalUniversity.normalized_name.contains(normalize_text(name)))
+    return query.order_by(ExternalUniversity.normalized_name).limit(REGISTRY_RESULT_LIMIT)
+
+async def search_registry_mirror(db: AsyncSession, codes: List[Optional[str]], name: Optional[str] = None) -> List[List[dict]]:
+    """Registry entries per country code whose name contains `name`, from the local mirror in one query"""
+    if len(codes) == 1:
+        return [[row._asdict() for row in await db.execute(_mirror_query(codes[0], name))]]
+    # Each country's own index range scan and limit, tagged with its position
+    branches = [select(_mirror_query(code, name).subquery(), literal(i).label("branch")) for i, code in enumerate(codes)]
+    results = [[] for _ in codes]
+    for row in await db.execute(union_all(*branches)):
+        results[row.branch].append({"name": row.name, "country": row.country, "web_pages": row.web_pages})
+    return results
+
+async def _mirror_has_synced(db: AsyncSession) -> bool:
+    global _mirror_synced, _mirror_checked_at
+    # Only the first sync creates a registry_sync row, and nothing deletes it
+    _mirror_synced = bool(await db.scalar(select(exists().where(RegistrySync.source.isnot(None)))))
+    _mirror_checked_at = time.monotonic()
+    return _mirror_synced
+
+def merge_results(results: List[List[dict]]) -> List[dict]:
+    """One list from several, taking from each in turn so every country is represented; first of each name wins"""
+    seen = set()
+    merged = []
+    for university in chain.from_iterable(zip_longest(*results)):
+        if university is not None and university["name"] not in seen:
+            seen.add(university["name"])
+            merged.append(university)
+    return merged
+
+async def search_external_universities(db: AsyncSession, countries: List[Optional[CountryRef]], name: Optional[str] = None) -> List[dict]:
+    """Registry results for each of `countries` (None: any country), merged.
+
+    From the local mirror by country code, or from the cached API (which only knows
+    country names) until the mirror's first sync.
+    """
+    global _mirror_synced
+    countries = list(dict.fromkeys(countries))
+    if _mirror_synced or time.monotonic() - _mirror_checked_at >= REGISTRY_CHECK_SECONDS:
+        results = await search_registry_mirror(db, [country.code if country else None for country in countries], name)
+        if any(results):
+            _mirror_synced = True
+        if _mirror_synced or await _mirror_has_synced(db):
+            return merge_results(results)
+    return merge_results(await search_registry_api(db, [country.name if country else None for country in countries], name))
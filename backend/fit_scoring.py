@@ -0,0 +1,144 @@
+"""
+Vectorized fit scoring of the university catalog against a student profile.
+
+The catalog's numeric features (tuition, acceptance rate, ranking, country and
+degree codes) are held in NumPy arrays built once per catalog snapshot version.
+Scoring a profile is then one pass of array arithmetic over every program:
+acceptance chance, budget fit, a Dream/Target/Safe category and an overall fit
+score, with the best k picked by argpartition instead of a full sort.
+"""
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from catalog_snapshot import CatalogSnapshot
+from models import Onboarding
+
+CHANCE_LABELS = np.array(["Low", "Medium", "High"])
+CATEGORY_LABELS = np.array(["Dream", "Target", "Safe"])
+DREAM, TARGET, SAFE = 0, 1, 2
+
+# Tuition up to the budget fits fully; the fit falls to 0 at BUDGET_STRETCH x budget
+BUDGET_STRETCH = 1.5
+# Rankings past this add nothing to the fit score
+RANKING_HORIZON = 500
+
+# Weights of the overall fit score (sum to 1)
+CHANCE_WEIGHT = 0.4
+BUDGET_WEIGHT = 0.3
+COUNTRY_WEIGHT = 0.15
+DEGREE_WEIGHT = 0.1
+RANKING_WEIGHT = 0.05
+
+class CatalogFeatures:
+    """Column arrays of the catalog, aligned by position with the records they came from"""
+
+    __slots__ = ("records", "ids", "tuition", "acceptance", "ranking", "country", "degree", "country_codes", "degree_codes")
+
+    def __init__(self, records: Iterable):
+        self.records = tuple(records)
+        n = len(self.records)
+        self.ids = np.fromiter((r.id for r in self.records), dtype=np.int64, count=n)
+        # None becomes NaN, which every comparison below treats as "unknown"
+        self.tuition = np.array([r.tuition_fee for r in self.records], dtype=np.float64)
+        self.acceptance = np.array([r.acceptance_rate for r in self.records], dtype=np.float64)
+        self.ranking = np.array([r.ranking for r in self.records], dtype=np.float64)
+        # Ordinals of the ISO country codes and degree names, for integer comparisons
+        self.country_codes = {}
+        self.degree_codes = {}
+        self.country = np.fromiter((self.country_codes.setdefault(r.country_code, len(self.country_codes)) for r in self.records), dtype=np.int32, count=n)
+        self.degree = np.fromiter((self.degree_codes.setdefault(r.degree_type, len(self.degree_codes)) for r in self.records), dtype=np.int32, count=n)
+
+    def __len__(self):
+        return len(self.records)
+
+    def in_countries(self, codes: Iterable[str]) -> np.ndarray:
+        ordinals = [self.country_codes[c] for c in codes if c in self.country_codes]
+        return np.isin(self.country, ordinals)
+
+    def with_degree(self, degree: Optional[str]) -> np.ndarray:
+        return self.degree == self.degree_codes.get(degree, -1)
+
+_features: Optional[CatalogFeatures] = None
+_features_version = None
+
+def catalog_features(catalog: CatalogSnapshot) -> CatalogFeatures:
+    """Feature arrays for a snapshot, rebuilt only when its version changes"""
+    global _features, _features_version
+    if _features is None or _features_version != catalog.version:
+        _features, _features_version = CatalogFeatures(catalog.records), catalog.version
+    return _features
+
+class FitScores(NamedTuple):
+    chance: np.ndarray       # 0 Low, 1 Medium, 2 High (indexes CHANCE_LABELS)
+    budget_fit: np.ndarray   # 0..1
+    category: np.ndarray     # 0 Dream, 1 Target, 2 Safe (indexes CATEGORY_LABELS)
+    score: np.ndarray        # overall fit, 0..1
+
+def preferred_countries(profile: Onboarding) -> list:
+    """ISO codes of the profile's recognised preferred countries (set on write, countries.py)"""
+    return list(profile.preferred_country_codes or [])
+
+def _gpa_points(gpa: Optional[float]) -> int:
+    if not gpa:
+        return 0
+    return 3 if gpa >= 3.8 else 2 if gpa >= 3.5 else 1 if gpa >= 3.0 else 0
+
+def score_catalog(features: CatalogFeatures, profile: Onboarding) -> FitScores:
+    """Score every program in `features` against `profile` in one vectorized pass"""
+    acceptance = features.acceptance
+    # Same points as the per-row reference in bench_fit_scoring.py: GPA band plus selectivity band
+    selectivity = np.select([acceptance > 0.7, acceptance > 0.4, acceptance < 0.2], [2, 1, -2], 0)
+    points = _gpa_points(profile.gpa) + selectivity
+    chance = np.select([points >= 4, points >= 2], [2, 1], 0)
+
+    budget = profile.budget_per_year
+    if budget and budget > 0:
+        budget_fit = np.clip((BUDGET_STRETCH * budget - features.tuition) / ((BUDGET_STRETCH - 1) * budget), 0.0, 1.0)
+        # Unknown tuition is neither a good nor a bad fit
+        budget_fit = np.where(np.isnan(budget_fit), 0.5, budget_fit)
+        over_budget = features.tuition > budget
+    else:
+        budget_fit = np.full(len(features), 0.5)
+        over_budget = np.zeros(len(features), dtype=bool)
+
+    # A high chance only makes a program Safe when its fee is within the budget
+    category = np.where(chance == 2, np.where(over_budget, TARGET, SAFE), np.where(chance == 1, TARGET, DREAM))
+
+    ranking_fit = np.nan_to_num(np.clip(1 - (features.ranking - 1) / RANKING_HORIZON, 0.0, 1.0))
+    country_fit = features.in_countries(preferred_countries(profile)) if profile.preferred_country_codes else np.zeros(len(features), dtype=bool)
+    degree_fit = features.with_degree(profile.intended_degree)
+    score = (
+        CHANCE_WEIGHT * np.clip((points + 2) / 7, 0.0, 1.0)
+        + BUDGET_WEIGHT * budget_fit
+        + COUNTRY_WEIGHT * country_fit
+        + DEGREE_WEIGHT * degree_fit
+        + RANKING_WEIGHT * ranking_fit
+    )
+    return FitScores(chance, budget_fit, category, score)
+
+def top_k(scores: FitScores, k: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Positions of the k best-scoring programs (optionally only where `mask`), best first"""
+    score = scores.score if mask is None else np.where(mask, scores.score, -np.inf)
+    candidates = len(score) if mask is None else int(np.count_nonzero(mask))
+    k = min(k, candidates)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    # argpartition finds the k best in linear time; only those k are sorted
+    best = np.argpartition(-score, k - 1)[:k] if k < len(score) else np.arange(len(score))
+    return best[np.lexsort((best, -score[best]))]
+
+WHY_FITS = {
+    "Dream": "A reach school in {country}: admission is competitive for your profile.",
+    "Target": "A solid target school in {country}.",
+    "Safe": "A safe choice in {country}: strong admission odds and within your budget.",
+}
+
+def fit_labels(features: CatalogFeatures, scores: FitScores, position: int) -> dict:
+    """Response fields for one scored program"""
+    category = str(CATEGORY_LABELS[scores.category[position]])
+    return {
+        "category": category,
+        "acceptance_chance": str(CHANCE_LABELS[scores.chance[position]]),
+        "why_fits": WHY_FITS[category].format(country=features.records[position].country),
+    }
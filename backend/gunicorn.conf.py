@@ -0,0 +1,18 @@
+# Gunicorn picks this file up automatically when started from backend/.
+# The worker count is capped so that every worker's full connection pool fits
+# within DB_MAX_CONNECTIONS (the Postgres/PgBouncer connections available to this app).
+import os
+
+from database import DB_MAX_CONNECTIONS, connections_per_worker, max_workers_for_connection_limit
+
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+requested_workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+workers = max_workers_for_connection_limit(requested_workers)
+
+if workers < requested_workers:
+    print(
+        f"Running {workers} workers instead of {requested_workers}: each can open "
+        f"{connections_per_worker()} connections and DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS}"
+    )
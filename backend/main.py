@@ -1,48 +1,45 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Body
+from fastapi import FastAPI, BackgroundTasks, Depends, Header, HTTPException, status, Body, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import Optional, List, Union, Any
-import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+import hashlib
 import os
 import traceback
 from datetime import datetime
 from dotenv import load_dotenv
 
-from database import SessionLocal, engine, Base
-from models import User, Onboarding, University, ShortlistedUniversity, LockedUniversity, Todo, ApplicationDocument
+from database import get_db, pool_status
+from outbound_http import http_status
+from models import User, Onboarding, ShortlistedUniversity, LockedUniversity, Todo, ApplicationDocument
 from schemas import (
     UserCreate, UserResponse, Token, OnboardingCreate, OnboardingResponse, GoogleAuthRequest,
     UniversityResponse, UniversityDetailResponse, ShortlistRequest, LockRequest, TodoCreate, TodoResponse, TodoUpdate,
-    AICounsellorMessage, AICounsellorResponse, ApplicationDocumentResponse, ApplicationDocumentUpdate
+    AICounsellorMessage, AICounsellorResponse, ApplicationDocumentResponse, ApplicationDocumentUpdate, DashboardResponse
+)
+from auth import (
+    READ_YOUR_WRITES_HEADER, get_password_hash, verify_password, create_access_token, get_current_user, get_current_reader,
+    get_read_db, issue_write_markers, verify_google_token
 )
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
 from ai_counsellor import AICounsellorService
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+from catalog_search import FUZZY_MIN_RESULTS, SEARCH_LIMIT, search_universities
+from catalog_snapshot import catalog_records, find_university, get_catalog
+from catalog_similarity import similarity_index
+from external_universities import search_external_universities
+from fit_scoring import CatalogFeatures, catalog_features, fit_labels, score_catalog
+from query_budget import enforce_query_budgets, query_budget
+from recommendations import RECOMMENDATIONS_PER_USER, rank_for_profile, refresh_recommendations, stored_recommendations
+from requirement_templates import materialize_requirements
+from services import SHORTLIST, SOP, TEST_SCORES, complete_tasks, task_kind
+from university_identity import resolve_university_id
+from user_queries import add_pick, find_pick, locked_documents, picked_ids, picked_universities, remove_pick, user_picks, user_todos
+from catalog_browse import DEFAULT_SORT, MAX_PAGE_SIZE, PAGE_SIZE, SORTS, all_filters, browse_universities, catalog_filters, facet_counts
 
 load_dotenv()
 
-Base.metadata.create_all(bind=engine)
-
-# Ensure google_id column exists (Simple Migration)
-try:
-    with engine.connect() as conn:
-        # Check if google_id column exists
-        from sqlalchemy import text
-        conn.execute(text("ALTER TABLE users ADD COLUMN IF NOT EXISTS google_id VARCHAR UNIQUE"))
-        # Ensure hashed_password is nullable
-        conn.execute(text("ALTER TABLE users ALTER COLUMN hashed_password DROP NOT NULL"))
-        conn.commit()
-except Exception as e:
-    print(f"Migration note: {e}")
-
-# Seed database if empty
-from seed_db import seed_universities
-try:
-    seed_universities()
-except Exception as e:
-    print(f"Seed note: {e}")
+# Schema and seed data are managed out of band (python manage.py migrate / seed)
+# so that worker startup does no DDL and no seeding queries.
 
 app = FastAPI(title="AI Counsellor API", version="1.0.0")
 
@@ -65,37 +62,44 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", READ_YOUR_WRITES_HEADER],
 )
+app.middleware("http")(enforce_query_budgets)
+app.middleware("http")(issue_write_markers)
 
 print(f"DEBUG: CORS Final Allowed List: {allowed_origins}")
 
 # OAuth2 scheme is defined in auth.py
 from auth import oauth2_scheme
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Health check
 @app.get("/")
 async def root():
     return {"message": "AI Counsellor API is running"}
 
+@app.get("/api/health/db")
+async def database_health():
+    """Connection pool telemetry for the worker serving this request"""
+    return pool_status()
+
+@app.get("/api/health/http")
+async def http_health():
+    """Outbound HTTP telemetry (circuit state, retries, latency) per upstream host for this worker"""
+    return http_status()
+
 # Authentication endpoints
 @app.post("/api/auth/signup", response_model=UserResponse)
-async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
+async def signup(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
-    # Create new user
+    # Create new user; the commit counts as this user's write for read-your-writes routing
+    db.info["subject"] = user_data.email
     hashed_password = get_password_hash(user_data.password)
     db_user = User(
         email=user_data.email,
@@ -103,14 +107,14 @@ async def signup(user_data: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -122,25 +126,23 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/api/auth/google", response_model=Token)
-async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db)):
+async def google_auth(auth_data: GoogleAuthRequest, db: AsyncSession = Depends(get_db)):
     try:
         # Verify the Google token
         client_id = os.getenv("GOOGLE_CLIENT_ID")
         if not client_id:
             raise HTTPException(status_code=500, detail="GOOGLE_CLIENT_ID not configured")
             
-        idinfo = id_token.verify_oauth2_token(
-            auth_data.credential, 
-            google_requests.Request(), 
-            client_id
-        )
+        idinfo = await verify_google_token(auth_data.credential, client_id)
 
         email = idinfo['email']
         name = idinfo.get('name', email.split('@')[0])
         google_id = idinfo['sub']
 
+        db.info["subject"] = email
+
         # Check if user exists
-        user = db.query(User).filter((User.email == email) | (User.google_id == google_id)).first()
+        user = (await db.scalars(select(User).where((User.email == email) | (User.google_id == google_id)).limit(1))).first()
 
         if not user:
             # Create new user for social login
@@ -151,12 +153,12 @@ async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db
                 hashed_password=None # No password for Google users
             )
             db.add(user)
-            db.commit()
-            db.refresh(user)
+            await db.commit()
+            await db.refresh(user)
         elif not user.google_id:
             # Link existing email account to Google ID
             user.google_id = google_id
-            db.commit()
+            await db.commit()
 
         access_token = create_access_token(data={"sub": user.email})
         return {"access_token": access_token, "token_type": "bearer"}
@@ -172,83 +174,76 @@ async def google_auth(auth_data: GoogleAuthRequest, db: Session = Depends(get_db
         )
 
 @app.get("/api/auth/me", response_model=UserResponse)
+@query_budget(2)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 @app.delete("/api/auth/me")
 async def delete_account(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Permanently delete user account and all associated data"""
-    db.delete(current_user)
-    db.commit()
+    await db.delete(current_user)
+    await db.commit()
     return {"message": "Account deleted successfully"}
 
 # Onboarding endpoints
 @app.post("/api/onboarding", response_model=OnboardingResponse)
+@query_budget(8)
 async def create_onboarding(
     onboarding_data: OnboardingCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Check if onboarding already exists
-    existing = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
+    existing = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
     
     if existing:
         # Update existing onboarding
         for key, value in onboarding_data.dict().items():
             setattr(existing, key, value)
         existing.updated_at = datetime.utcnow()
+        existing.recommendations_version = None
     else:
         # Create new onboarding
         existing = Onboarding(user_id=current_user.id, **onboarding_data.dict())
         db.add(existing)
     
-    db.commit()
-    db.refresh(existing)
+    await db.commit()
+    await db.refresh(existing)
     
     # NEW: Sync tasks with the updated profile
-    sync_tasks_with_onboarding(current_user.id, existing, db)
+    await sync_tasks_with_onboarding(current_user.id, existing, db)
     
     # Mark user profile as complete
     current_user.profile_complete = True
-    db.commit()
+    await db.commit()
+    
+    # Re-rank the user's recommendations once the response is sent
+    background_tasks.add_task(refresh_recommendations, current_user.id)
     
     return existing
 
-def sync_tasks_with_onboarding(user_id: int, onboarding: Onboarding, db: Session):
+async def sync_tasks_with_onboarding(user_id: int, onboarding: Onboarding, db: AsyncSession):
     """Automatically mark tasks as completed based on profile status updates"""
-    # 1. Test Scores Task
+    kinds = []
     if onboarding.ielts_toefl_status == "Completed":
-        test_task = db.query(Todo).filter(
-            Todo.user_id == user_id, 
-            Todo.title.ilike("%test score%")
-        ).first()
-        if test_task and not test_task.completed:
-            test_task.completed = True
-            test_task.completed_at = datetime.utcnow()
-            db.add(test_task)
-            
-    # 2. SOP Task
+        kinds.append(TEST_SCORES)
     if onboarding.sop_status == "Ready":
-        sop_task = db.query(Todo).filter(
-            Todo.user_id == user_id, 
-            Todo.title.ilike("%SOP%")
-        ).first()
-        if sop_task and not sop_task.completed:
-            sop_task.completed = True
-            sop_task.completed_at = datetime.utcnow()
-            db.add(sop_task)
-            
-    db.commit()
+        kinds.append(SOP)
+    if kinds:
+        await complete_tasks(db, user_id, *kinds)
+        await db.commit()
 
 @app.get("/api/onboarding", response_model=OnboardingResponse)
+@query_budget(3)
 async def get_onboarding(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
     if not onboarding:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -258,106 +253,154 @@ async def get_onboarding(
 
 # Dashboard endpoints
 @app.get("/api/dashboard/stage")
+@query_budget(2)
 async def get_current_stage(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader)
 ):
-    """Determine current stage based on user progress"""
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
-    if not onboarding:
-        return {"stage": 0, "stage_name": "Onboarding"}
-    
-    locked = db.query(LockedUniversity).filter(LockedUniversity.user_id == current_user.id).first()
-    if locked:
-        return {"stage": 4, "stage_name": "Preparing Applications"}
-    
-    shortlisted = db.query(ShortlistedUniversity).filter(ShortlistedUniversity.user_id == current_user.id).first()
-    if shortlisted:
-        return {"stage": 3, "stage_name": "Finalizing Universities"}
-    
-    return {"stage": 2, "stage_name": "Discovering Universities"}
-
-async def fetch_external_universities(country: Optional[str] = None, name: Optional[str] = None) -> List[dict]:
-    """Fetch universities from Hipolabs API"""
-    url = "http://universities.hipolabs.com/search"
-    params = {}
-    if country:
-        params["country"] = country
-    if name:
-        params["name"] = name
-        
-    headers = {"User-Agent": "AI-Counsellor-App/1.0"}
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, headers=headers, timeout=10.0)
-            if response.status_code == 200:
-                data = response.json()
-                return data
-    except Exception as e:
-        print(f"Error fetching external universities: {e}")
-    return []
+    """Current stage, kept on the user row as onboarding, shortlist and locks change"""
+    return stage_info(current_user.stage)
 
-def get_or_create_university(name: str, country: str, db: Session) -> University:
-    """Helper to sync external university to local DB"""
-    uni = db.query(University).filter(University.name == name).first()
-    if not uni:
-        uni = University(
-            name=name,
-            country=country,
-            degree_type="Master's", # Default
-            field_of_study="General", # Default
-            tuition_fee=30000, # Placeholder
-            acceptance_rate=0.5, # Placeholder
-            ranking=100, # Placeholder
-            description=f"Automated entry for {name}"
-        )
-        db.add(uni)
-        db.commit()
-        db.refresh(uni)
-    return uni
+STAGE_NAMES = {0: "Onboarding", 2: "Discovering Universities", 3: "Finalizing Universities", 4: "Preparing Applications"}
+
+def stage_info(stage: int) -> dict:
+    return {"stage": stage, "stage_name": STAGE_NAMES[stage]}
+
+def university_listing(uni, category: str) -> dict:
+    """A shortlisted/locked university as listed to its user"""
+    return {
+        "id": uni.id,
+        "name": uni.name,
+        "country": uni.country,
+        "degree_type": uni.degree_type,
+        "field_of_study": uni.field_of_study,
+        "tuition_fee": uni.tuition_fee,
+        "acceptance_rate": uni.acceptance_rate,
+        "ranking": uni.ranking,
+        "description": uni.description,
+        "category": category,
+        "acceptance_chance": "Medium"
+    }
+
+@app.get("/api/dashboard", response_model=DashboardResponse)
+@query_budget(5)
+async def get_dashboard(
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Stage, profile, shortlist, locked universities and todos in one response.
+
+    Three queries whatever the list sizes (university data comes from the catalog
+    snapshot). The ETag is a hash of the body, so an unchanged dashboard is a 304.
+    """
+    # Stage 0 means no onboarding row yet
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id)) if current_user.stage else None
+    # Shortlisted and locked ids in one round trip
+    picks = (await db.execute(user_picks(current_user.id))).all()
+    todos = (await db.scalars(user_todos(current_user.id))).all()
+    
+    unis = {uni.id: uni for uni in await catalog_records(db, {pick.university_id for pick in picks})}
+    shortlisted = [university_listing(unis[p.university_id], "Shortlisted") for p in picks if p.kind == "shortlisted" and p.university_id in unis]
+    locked = [university_listing(unis[p.university_id], "Locked") for p in picks if p.kind == "locked" and p.university_id in unis]
+    
+    dashboard = DashboardResponse(
+        user=UserResponse.model_validate(current_user),
+        **stage_info(current_user.stage),
+        onboarding=OnboardingResponse.model_validate(onboarding) if onboarding else None,
+        shortlisted=shortlisted,
+        locked=locked,
+        todos=[TodoResponse.model_validate(todo) for todo in todos],
+    )
+    body = dashboard.model_dump_json().encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    # no-cache: the browser keeps the body but revalidates it on every load
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 # University endpoints
 @app.get("/api/universities", response_model=list[UniversityResponse])
+@query_budget(5)
 async def get_universities(
+    response: Response,
     country: Optional[str] = None,
     degree: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    field: Optional[str] = None,
+    min_tuition: Optional[float] = Query(None, ge=0),
+    max_tuition: Optional[float] = Query(None, ge=0),
+    min_acceptance: Optional[float] = Query(None, ge=0, le=1),
+    max_acceptance: Optional[float] = Query(None, ge=0, le=1),
+    max_ranking: Optional[int] = Query(None, ge=1),
+    sort: str = DEFAULT_SORT,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
+    """Catalog listing with filters and keyset pagination; the next page's cursor is in X-Next-Cursor"""
+    if sort not in SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"sort must be one of: {', '.join(SORTS)}")
+    
     # Get user onboarding for filtering and personalized defaults
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
     
     # 1. Fetch from local DB
-    local_query = db.query(University)
-    if country:
-        local_query = local_query.filter(University.country == country)
-    
-    local_unis = local_query.all()
-    
-    # 2. Fetch from external API
+    filters = catalog_filters(country, degree, field, min_tuition, max_tuition, min_acceptance, max_acceptance, max_ranking)
+    if search:
+        # Ranked, index-backed search over name, field of study and description (one page, by relevance)
+        local_unis = await search_universities(db, search, SEARCH_LIMIT, *all_filters(filters))
+    else:
+        try:
+            local_unis, next_cursor = await browse_universities(db, all_filters(filters), sort, cursor, limit)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    
+    # 2. Registry results, from the local mirror once it has been synced
+    # Registry entries carry no degree, fee or ranking data, so they only join unfiltered first pages
+    catalog = await get_catalog(db)
+    country_ref = catalog.countries.lookup(country) if country else None
     external_unis = []
-    if country or search:
-        # User specified a filter, fetch only that
-        external_unis = await fetch_external_universities(country=country, name=search)
-    elif len(local_unis) < 5:
-        # DB has few results and no search! Fetch some defaults so it doesn't look empty.
-        default_search_country = "United States"
-        if onboarding and onboarding.preferred_countries:
-            # Take the first country from comma separated list
-            default_search_country = onboarding.preferred_countries.split(",")[0].strip()
+    # A country nobody recognises matches nothing locally (the filter compares codes), nor in the registry
+    catalog_only = bool(cursor) or (country and country_ref is None) or any(clauses for facet, clauses in filters.items() if facet != "country")
+    if not catalog_only:
+        if search:
+            # Only search the registry when the local catalog has next to nothing
+            if len(local_unis) < FUZZY_MIN_RESULTS:
+                external_unis = await search_external_universities(db, [country_ref], name=search)
+        elif country:
+            # User specified a filter, fetch only that
+            external_unis = await search_external_universities(db, [country_ref])
+        elif len(local_unis) < 5:
+            # DB has few results and no search! Fetch some defaults so it doesn't look empty.
+            # Every preferred country (coded when the profile was saved), looked up concurrently
+            default_codes = (onboarding.preferred_country_codes if onboarding else None) or ["US"]
+            default_countries = [catalog.countries.by_code[c] for c in default_codes if c in catalog.countries.by_code] or [None]
             
-        print(f"DEBUG: Local DB empty, fetching default universities for {default_search_country}")
-        external_unis = await fetch_external_universities(country=default_search_country)
+            print(f"DEBUG: Local DB empty, fetching default universities for {', '.join(c.name if c else 'any country' for c in default_countries)}")
+            external_unis = await search_external_universities(db, default_countries)
     
-    # Merge and deduplicate by name
+    # Merge and deduplicate by name key, so spellings and aliases of one university collapse
     # We prioritize local unis for metadata
-    seen_names = {u.name for u in local_unis}
+    names = catalog.names
+    seen_keys = set()
     
     result = []
     
+    # Score the whole page against the profile in one vectorized pass
+    if onboarding:
+        page_features = CatalogFeatures(local_unis)
+        page_scores = score_catalog(page_features, onboarding)
+    
     # Add local unis
-    for uni in local_unis:
+    for position, uni in enumerate(local_unis):
+        key = names.key(uni.name)
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
         uni_dict = {
             "id": uni.id,
             "name": uni.name,
@@ -371,9 +414,7 @@ async def get_universities(
         }
         
         if onboarding:
-            uni_dict["category"] = "Target"
-            uni_dict["acceptance_chance"] = calculate_acceptance_chance(uni, onboarding)
-            uni_dict["why_fits"] = f"A solid target school in {uni.country}." # Simple version for merged list
+            uni_dict.update(fit_labels(page_features, page_scores, position))
         else:
             uni_dict["category"] = "Target"
             uni_dict["acceptance_chance"] = "Medium"
@@ -383,7 +424,8 @@ async def get_universities(
         
     # Add external unis with 'ext:' prefix
     for ext_uni in external_unis:
-        if ext_uni["name"] in seen_names:
+        key = names.key(ext_uni["name"])
+        if key in seen_keys:
             continue
             
         result.append({
@@ -400,7 +442,7 @@ async def get_universities(
             "acceptance_chance": "Medium",
             "why_fits": f"Discovered from global university registry."
         })
-        seen_names.add(ext_uni["name"])
+        seen_keys.add(key)
         
         # Limit to 100 results for performance
         if len(result) >= 100:
@@ -408,135 +450,159 @@ async def get_universities(
             
     return result
 
-def calculate_acceptance_chance(university: University, onboarding: Onboarding) -> str:
-    """Logic to calculate acceptance chance based on GPA and Acceptance Rate"""
-    score = 0
-    
-    # GPA Factor
-    if onboarding.gpa:
-        if onboarding.gpa >= 3.8:
-            score += 3
-        elif onboarding.gpa >= 3.5:
-            score += 2
-        elif onboarding.gpa >= 3.0:
-            score += 1
-            
-    # University Selectivity Factor
-    if university.acceptance_rate > 0.7:
-        score += 2
-    elif university.acceptance_rate > 0.4:
-        score += 1
-    elif university.acceptance_rate < 0.2:
-        score -= 2
-        
-    # Determine chance
-    if score >= 4:
-        return "High"
-    elif score >= 2:
-        return "Medium"
+@app.get("/api/universities/facets")
+@query_budget(3)
+async def get_university_facets(
+    country: Optional[str] = None,
+    degree: Optional[str] = None,
+    field: Optional[str] = None,
+    min_tuition: Optional[float] = Query(None, ge=0),
+    max_tuition: Optional[float] = Query(None, ge=0),
+    min_acceptance: Optional[float] = Query(None, ge=0, le=1),
+    max_acceptance: Optional[float] = Query(None, ge=0, le=1),
+    max_ranking: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Result counts per country, degree, tuition band and acceptance band for the given filters"""
+    filters = catalog_filters(country, degree, field, min_tuition, max_tuition, min_acceptance, max_acceptance, max_ranking)
+    return await facet_counts(db, filters)
+
+@app.get("/api/universities/recommended", response_model=list[UniversityResponse])
+@query_budget(4)
+async def get_recommended_universities(
+    country: Optional[str] = None,
+    degree: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The best-fitting programs in the whole catalog for the user's profile"""
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
+    if not onboarding:
+        raise HTTPException(status_code=400, detail="Please complete onboarding first")
+    
+    catalog = await get_catalog(db)
+    if not country and not degree and onboarding.recommendations_version is not None and limit <= RECOMMENDATIONS_PER_USER:
+        # Precomputed in the background (recommendations.py): one index range scan
+        ranked = [
+            {"university_id": r.university_id, "category": r.category, "acceptance_chance": r.acceptance_chance, "why_fits": r.why_fits}
+            for r in await stored_recommendations(db, current_user.id, limit)
+        ]
     else:
-        return "Low"
+        # Filtered views, and profiles not ranked yet, are scored live
+        features = catalog_features(catalog)
+        mask = None
+        if country:
+            mask = features.in_countries(catalog.countries.codes([country]))
+        if degree:
+            mask = features.with_degree(degree) if mask is None else mask & features.with_degree(degree)
+        ranked = rank_for_profile(catalog, onboarding, limit, mask)
+    
+    unis = {uni.id: uni for uni in await catalog_records(db, [row["university_id"] for row in ranked])}
+    result = []
+    for row in ranked:
+        uni = unis.get(row["university_id"])
+        if not uni:
+            continue
+        result.append({
+            "id": uni.id,
+            "name": uni.name,
+            "country": uni.country,
+            "degree_type": uni.degree_type,
+            "field_of_study": uni.field_of_study,
+            "tuition_fee": uni.tuition_fee,
+            "acceptance_rate": uni.acceptance_rate,
+            "ranking": uni.ranking,
+            "description": uni.description,
+            "category": row["category"],
+            "acceptance_chance": row["acceptance_chance"],
+            "why_fits": row["why_fits"]
+        })
+    return result
+
+@app.get("/api/universities/matches", response_model=list[UniversityResponse])
+@query_budget(3)
+async def get_matching_universities(
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Programs whose field, description and country best match the user's study goals"""
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
+    if not onboarding:
+        raise HTTPException(status_code=400, detail="Please complete onboarding first")
+    
+    catalog = await get_catalog(db)
+    index = await similarity_index.sync(catalog)
+    result = []
+    for uni_id, score in similarity_index.match_profile(index, onboarding, limit):
+        uni = catalog.by_id[uni_id]
+        result.append({
+            "id": uni.id,
+            "name": uni.name,
+            "country": uni.country,
+            "degree_type": uni.degree_type,
+            "field_of_study": uni.field_of_study,
+            "tuition_fee": uni.tuition_fee,
+            "acceptance_rate": uni.acceptance_rate,
+            "ranking": uni.ranking,
+            "description": uni.description,
+            "why_fits": f"Matches your interest in {onboarding.field_of_study or onboarding.degree_major}."
+        })
+    return result
 
 @app.post("/api/universities/shortlist")
+@query_budget(5)
 async def shortlist_university(
     request: ShortlistRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    uni_id = request.university_id
-    
-    # Handle external university
-    if isinstance(uni_id, str) and uni_id.startswith("ext:"):
-        uni_name = uni_id.replace("ext:", "")
-        # For external, we need to know the country. 
-        # But wait, ShortlistRequest only has university_id.
-        # This is a bit problematic if we don't have country.
-        # We can try to find it in the external API again or just placeholder.
-        # Actually, let's just use placeholder 'Unknown' if we can't find it.
-        uni = get_or_create_university(uni_name, "Unknown", db)
-        uni_id = uni.id
-
-    # Check if already shortlisted
-    existing = db.query(ShortlistedUniversity).filter(
-        ShortlistedUniversity.user_id == current_user.id,
-        ShortlistedUniversity.university_id == uni_id
-    ).first()
-    
-    if existing:
-        # Toggle behavior: if exists, remove it (Un-shortlist)
-        db.delete(existing)
-        db.commit()
+    # An external university gets a placeholder row on first use, with its country from the registry mirror
+    uni_id = await resolve_university_id(request.university_id, db, create=True)
+
+    # Toggle behavior: if already shortlisted, remove it (Un-shortlist)
+    removed = await db.scalar(remove_pick(ShortlistedUniversity, current_user.id, uni_id))
+    if removed:
+        await db.commit()
         return {"message": "University removed from shortlist", "id": None, "toggled": True}
     
-    shortlisted = ShortlistedUniversity(
-        user_id=current_user.id,
-        university_id=uni_id
-    )
-    db.add(shortlisted)
+    shortlisted_id = await db.scalar(add_pick(ShortlistedUniversity, current_user.id, uni_id))
     
-    # Auto-complete "Shortlist Universities" todo if it exists
-    todo = db.query(Todo).filter(
-        Todo.user_id == current_user.id,
-        Todo.title.ilike("%shortlist%")
-    ).first()
+    # Auto-complete "Shortlist Universities" todos if any
+    await complete_tasks(db, current_user.id, SHORTLIST)
+    await db.commit()
     
-    if todo and not todo.completed:
-        todo.completed = True
-        db.add(todo)
-        
-    db.commit()
-    db.refresh(shortlisted)
-    
-    return {"message": "University shortlisted successfully", "id": shortlisted.id, "toggled": False}
+    return {"message": "University shortlisted successfully", "id": shortlisted_id, "toggled": False}
 
 @app.get("/api/universities/shortlisted", response_model=list[UniversityResponse])
+@query_budget(3)
 async def get_shortlisted_universities(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    shortlisted = db.query(ShortlistedUniversity).filter(
-        ShortlistedUniversity.user_id == current_user.id
-    ).all()
+    # One joined query, however long the list
+    universities = (await db.scalars(picked_universities(ShortlistedUniversity, current_user.id))).all()
     
     result = []
-    for item in shortlisted:
-        uni = db.query(University).filter(University.id == item.university_id).first()
-        if uni:
-            result.append({
-                "id": uni.id,
-                "name": uni.name,
-                "country": uni.country,
-                "degree_type": uni.degree_type,
-                "field_of_study": uni.field_of_study,
-                "tuition_fee": uni.tuition_fee,
-                "acceptance_rate": uni.acceptance_rate,
-                "ranking": uni.ranking,
-                "description": uni.description,
-                "category": "Shortlisted",
-                "acceptance_chance": "Medium"
-            })
+    for uni in universities:
+        result.append(university_listing(uni, "Shortlisted"))
     
     return result
 
 @app.post("/api/universities/lock")
+@query_budget(5)
 async def lock_university(
     request: LockRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    uni_id = request.university_id
-    
     # Handle external university
-    if isinstance(uni_id, str) and uni_id.startswith("ext:"):
-        uni_name = uni_id.replace("ext:", "")
-        uni = get_or_create_university(uni_name, "Unknown", db)
-        uni_id = uni.id
+    uni_id = await resolve_university_id(request.university_id, db, create=True)
 
     # Check if university is shortlisted
-    shortlisted = db.query(ShortlistedUniversity).filter(
-        ShortlistedUniversity.user_id == current_user.id,
-        ShortlistedUniversity.university_id == uni_id
-    ).first()
+    shortlisted = await db.scalar(find_pick(ShortlistedUniversity, current_user.id, uni_id))
     
     if not shortlisted:
         raise HTTPException(
@@ -544,88 +610,56 @@ async def lock_university(
             detail="University must be shortlisted before locking"
         )
     
-    # Check if already locked
-    existing = db.query(LockedUniversity).filter(
-        LockedUniversity.user_id == current_user.id,
-        LockedUniversity.university_id == uni_id
-    ).first()
+    # Lock unless already locked; the unique (user_id, university_id) constraint arbitrates
+    locked_id = await db.scalar(add_pick(LockedUniversity, current_user.id, uni_id))
     
-    if existing:
+    if locked_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="University already locked"
         )
     
-    locked = LockedUniversity(
-        user_id=current_user.id,
-        university_id=uni_id
-    )
-    db.add(locked)
-    db.commit()
-    db.refresh(locked)
-    
-    # Auto-generate to-dos for locked university
-    from services import generate_application_todos
-    generate_application_todos(current_user.id, locked.university_id, db)
+    # The university's todos and documents, in the same transaction as the lock
+    await materialize_requirements(db, current_user.id, uni_id)
+    await db.commit()
     
-    return {"message": "University locked successfully", "id": locked.id}
+    return {"message": "University locked successfully", "id": locked_id}
 
 @app.delete("/api/universities/lock/{university_id}")
+@query_budget(3)
 async def unlock_university(
     university_id: Union[int, str],
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    actual_id = university_id
-    if isinstance(university_id, str) and university_id.startswith("ext:"):
-        uni_name = university_id.replace("ext:", "")
-        uni = db.query(University).filter(University.name == uni_name).first()
-        if not uni:
-             raise HTTPException(status_code=404, detail="External university not found in local DB")
-        actual_id = uni.id
+    actual_id = await resolve_university_id(university_id, db)
+    if actual_id is None:
+        raise HTTPException(status_code=404, detail="External university not found in local DB")
 
-    locked = db.query(LockedUniversity).filter(
-        LockedUniversity.user_id == current_user.id,
-        LockedUniversity.university_id == actual_id
-    ).first()
+    unlocked = await db.scalar(remove_pick(LockedUniversity, current_user.id, actual_id))
     
-    if not locked:
+    if not unlocked:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="University not found or not locked"
         )
     
-    db.delete(locked)
-    db.commit()
+    await db.commit()
     
     return {"message": "University unlocked successfully"}
 
 @app.get("/api/universities/locked", response_model=list[UniversityResponse])
+@query_budget(3)
 async def get_locked_universities(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    locked = db.query(LockedUniversity).filter(
-        LockedUniversity.user_id == current_user.id
-    ).all()
+    # One joined query, however long the list
+    universities = (await db.scalars(picked_universities(LockedUniversity, current_user.id))).all()
     
     result = []
-    for item in locked:
-        uni = db.query(University).filter(University.id == item.university_id).first()
-        if uni:
-            result.append({
-                "id": uni.id,
-                "name": uni.name,
-                "country": uni.country,
-                "degree_type": uni.degree_type,
-                "field_of_study": uni.field_of_study,
-                "tuition_fee": uni.tuition_fee,
-                "acceptance_rate": uni.acceptance_rate,
-                "ranking": uni.ranking,
-                "description": uni.description,
-                "category": "Locked",
-                "acceptance_chance": "Medium"
-            })
+    for uni in universities:
+        result.append(university_listing(uni, "Locked"))
     
     return result
 
@@ -633,26 +667,17 @@ async def get_locked_universities(
 async def get_university_details(
     university_id: Union[int, str],
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    # 1. Fetch University
-    actual_id = university_id
-    if isinstance(university_id, str) and university_id.startswith("ext:"):
-        uni_name = university_id.replace("ext:", "")
-        uni = db.query(University).filter(University.name == uni_name).first()
-        if not uni:
-             # If external and not in DB, we create a placeholder entry
-             from main_utils import get_or_create_university
-             uni = get_or_create_university(uni_name, "Unknown", db)
-        actual_id = uni.id
-    else:
-        uni = db.query(University).filter(University.id == actual_id).first()
+    # 1. Fetch University (an external one gets a placeholder entry on first use)
+    actual_id = await resolve_university_id(university_id, db, create=True)
+    uni = await find_university(db, actual_id) if actual_id is not None else None
         
     if not uni:
         raise HTTPException(status_code=404, detail="University not found")
         
     # 2. Fetch User Profile
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
     if not onboarding:
         raise HTTPException(status_code=400, detail="Please complete onboarding first")
         
@@ -675,49 +700,82 @@ async def get_university_details(
     }
 
 
+@app.get("/api/universities/{university_id}/similar", response_model=list[UniversityResponse])
+@query_budget(2)
+async def get_similar_universities(
+    university_id: Union[int, str],
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Programs most like this one by name, field of study, description and country"""
+    actual_id = await resolve_university_id(university_id, db)
+    uni = await find_university(db, actual_id) if actual_id is not None else None
+    if not uni:
+        raise HTTPException(status_code=404, detail="University not found")
+    
+    catalog = await get_catalog(db)
+    index = await similarity_index.sync(catalog)
+    result = []
+    for uni_id, score in similarity_index.similar(index, uni.id, limit):
+        similar = catalog.by_id[uni_id]
+        result.append({
+            "id": similar.id,
+            "name": similar.name,
+            "country": similar.country,
+            "degree_type": similar.degree_type,
+            "field_of_study": similar.field_of_study,
+            "tuition_fee": similar.tuition_fee,
+            "acceptance_rate": similar.acceptance_rate,
+            "ranking": similar.ranking,
+            "description": similar.description,
+            "why_fits": f"Similar to {uni.name}."
+        })
+    return result
+
 # Todo endpoints
 @app.get("/api/todos", response_model=list[TodoResponse])
+@query_budget(3)
 async def get_todos(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    todos = db.query(Todo).filter(Todo.user_id == current_user.id).order_by(Todo.created_at.desc()).all()
+    todos = (await db.scalars(user_todos(current_user.id))).all()
     return todos
 
 @app.post("/api/todos", response_model=TodoResponse)
+@query_budget(4)
 async def create_todo(
     todo_data: TodoCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    uni_id = todo_data.university_id
-    if isinstance(uni_id, str) and uni_id.startswith("ext:"):
-        uni_name = uni_id.replace("ext:", "")
-        uni = db.query(University).filter(University.name == uni_name).first()
-        uni_id = uni.id if uni else None
+    uni_id = await resolve_university_id(todo_data.university_id, db)
 
     todo = Todo(
         user_id=current_user.id,
         university_id=uni_id,
+        kind=task_kind(todo_data.title),
         title=todo_data.title,
         description=todo_data.description
     )
     db.add(todo)
-    db.commit()
-    db.refresh(todo)
+    await db.commit()
+    await db.refresh(todo)
     return todo
 
 @app.patch("/api/todos/{todo_id}", response_model=TodoResponse)
+@query_budget(2)
 async def update_todo(
     todo_id: int,
     completed: bool = Body(...),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    todo = db.query(Todo).filter(
+    todo = await db.scalar(select(Todo).where(
         Todo.id == todo_id,
         Todo.user_id == current_user.id
-    ).first()
+    ))
     
     if not todo:
         raise HTTPException(
@@ -730,108 +788,45 @@ async def update_todo(
         todo.completed_at = datetime.utcnow()
     else:
         todo.completed_at = None
-    db.commit()
-    db.refresh(todo)
+    await db.commit()
+    await db.refresh(todo)
     
     return todo
 
 # Application Document Endpoints
 @app.get("/api/applications/{university_id}/documents", response_model=list[ApplicationDocumentResponse])
+@query_budget(3)
 async def get_application_documents(
     university_id: Union[int, str],
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_reader),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    actual_id = university_id
-    if isinstance(university_id, str) and university_id.startswith("ext:"):
-        uni_name = university_id.replace("ext:", "")
-        uni = db.query(University).filter(University.name == uni_name).first()
-        if not uni:
-             return [] # Or raise error
-        actual_id = uni.id
-
-    # Check if user has locked this university
-    locked = db.query(LockedUniversity).filter(
-        LockedUniversity.user_id == current_user.id,
-        LockedUniversity.university_id == actual_id
-    ).first()
-    
-    if not locked:
+    actual_id = await resolve_university_id(university_id, db)
+    if actual_id is None:
+        return [] # Unknown external university
+
+    # Materialized when the university was locked; this only reads. The lock and its
+    # documents come in one statement: no row means not locked (unlocking keeps documents)
+    rows = (await db.execute(locked_documents(current_user.id, actual_id))).all()
+    if not rows:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="University not locked by user"
         )
-        
-    # Fetch existing documents
-    documents = db.query(ApplicationDocument).filter(
-        ApplicationDocument.user_id == current_user.id,
-        ApplicationDocument.university_id == university_id
-    ).all()
-    
-    # If no documents exist, generate them based on university country
-    if not documents:
-        university = db.query(University).filter(University.id == university_id).first()
-        if not university:
-            raise HTTPException(status_code=404, detail="University not found")
-            
-        default_docs = [
-            "Statement of Purpose (SOP)",
-            "Academic Transcripts",
-            "Resume/CV"
-        ]
-        
-        country_docs = []
-        if university.country == "USA":
-            country_docs = [
-                "GRE/GMAT Scores",
-                "Letters of Recommendation (3)",
-                "Financial Proof (I-20)"
-            ]
-        elif university.country == "UK":
-            country_docs = [
-                "IELTS/TOEFL Scores",
-                "Letters of Recommendation (2)",
-                "CAS Letter Request"
-            ]
-        else:
-            country_docs = [
-                "Language Proficiency Score",
-                "Letters of Recommendation (2)"
-            ]
-            
-        all_docs = default_docs + country_docs
-        
-        new_documents = []
-        for doc_name in all_docs:
-            new_doc = ApplicationDocument(
-                user_id=current_user.id,
-                university_id=university_id,
-                name=doc_name,
-                is_completed=False
-            )
-            db.add(new_doc)
-            new_documents.append(new_doc)
-            
-        db.commit()
-        # Refresh to get IDs
-        for doc in new_documents:
-            db.refresh(doc)
-            
-        documents = new_documents
-        
-    return documents
+
+    return [document for _, document in rows if document is not None]
 
 @app.patch("/api/applications/documents/{document_id}", response_model=ApplicationDocumentResponse)
 async def update_application_document(
     document_id: int,
     update_data: ApplicationDocumentUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    document = db.query(ApplicationDocument).filter(
+    document = await db.scalar(select(ApplicationDocument).where(
         ApplicationDocument.id == document_id,
         ApplicationDocument.user_id == current_user.id
-    ).first()
+    ))
     
     if not document:
         raise HTTPException(
@@ -840,8 +835,8 @@ async def update_application_document(
         )
         
     document.is_completed = update_data.is_completed
-    db.commit()
-    db.refresh(document)
+    await db.commit()
+    await db.refresh(document)
     
     return document
 
@@ -850,10 +845,11 @@ async def update_application_document(
 async def ai_counsellor_chat(
     message_data: AICounsellorMessage,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    read_db: AsyncSession = Depends(get_read_db)
 ):
     # Get user's onboarding profile
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
     
     if not onboarding:
         raise HTTPException(
@@ -861,16 +857,10 @@ async def ai_counsellor_chat(
             detail="Please complete onboarding first"
         )
     
-    # Get shortlisted and locked universities
-    shortlisted = db.query(ShortlistedUniversity).filter(
-        ShortlistedUniversity.user_id == current_user.id
-    ).all()
-    shortlisted_ids = [s.university_id for s in shortlisted]
+    # Get shortlisted and locked universities (the counts on the user row skip empty lists)
+    shortlisted_ids = (await db.scalars(picked_ids(ShortlistedUniversity, current_user.id))).all() if current_user.shortlisted_count else []
     
-    locked = db.query(LockedUniversity).filter(
-        LockedUniversity.user_id == current_user.id
-    ).all()
-    locked_ids = [l.university_id for l in locked]
+    locked_ids = (await db.scalars(picked_ids(LockedUniversity, current_user.id))).all() if current_user.locked_count else []
     
     # Initialize AI service and get response
     ai_service = AICounsellorService()
@@ -880,7 +870,8 @@ async def ai_counsellor_chat(
         shortlisted_universities=shortlisted_ids,
         locked_universities=locked_ids,
         db=db,
-        current_user=current_user
+        current_user=current_user,
+        read_db=read_db
     )
     
     return result
@@ -891,16 +882,12 @@ from schemas import SOPRequest
 async def generate_sop(
     request: SOPRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Fetch resources
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
-    uni_id = request.university_id
-    if isinstance(uni_id, str) and uni_id.startswith("ext:"):
-        uni_name = uni_id.replace("ext:", "")
-        university = db.query(University).filter(University.name == uni_name).first()
-    else:
-        university = db.query(University).filter(University.id == uni_id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
+    uni_id = await resolve_university_id(request.university_id, db)
+    university = await find_university(db, uni_id) if uni_id is not None else None
     
     if not onboarding or not university:
         raise HTTPException(status_code=400, detail="Profile or University not found")
@@ -916,16 +903,12 @@ from schemas import StrategyRequest
 async def generate_strategy(
     request: StrategyRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     # Fetch resources
-    onboarding = db.query(Onboarding).filter(Onboarding.user_id == current_user.id).first()
-    uni_id = request.university_id
-    if isinstance(uni_id, str) and uni_id.startswith("ext:"):
-        uni_name = uni_id.replace("ext:", "")
-        university = db.query(University).filter(University.name == uni_name).first()
-    else:
-        university = db.query(University).filter(University.id == uni_id).first()
+    onboarding = await db.scalar(select(Onboarding).where(Onboarding.user_id == current_user.id))
+    uni_id = await resolve_university_id(request.university_id, db)
+    university = await find_university(db, uni_id) if uni_id is not None else None
     
     if not onboarding or not university:
         raise HTTPException(status_code=400, detail="Profile or University not found")
@@ -935,9 +918,6 @@ async def generate_strategy(
     
     return {"strategy_points": strategy_points}
 
-# Helper function moved to services.py
-from services import generate_application_todos
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,129 @@
+"""
+One-shot maintenance commands. Run them once per deploy, before the web workers start:
+    python manage.py migrate   # apply pending schema migrations
+    python manage.py seed      # insert missing catalog universities
+    python manage.py import-catalog FILE [--format csv|ndjson] [--chunk-size N] [--copy]
+    python manage.py check-user-progress [--fix]   # verify (or rebuild) users' stored stage and counts
+    python manage.py sync-registry [--source URL_OR_FILE] [--every SECONDS] [--force]   # mirror the university registry
+    python manage.py add-alias ALIAS NAME [--display-only]   # e.g. add-alias "UC Berkeley" "University of California, Berkeley"
+    python manage.py add-country-alias ALIAS CODE   # e.g. add-country-alias "Bharat" IN
+"""
+import argparse
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from database import engine
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+# Schema that create_all() used to build on import; existing databases are adopted at this revision
+BASELINE_REVISION = "0001"
+
+def migrate(revision: str = "head"):
+    config = Config(ALEMBIC_INI)
+    tables = inspect(engine).get_table_names()
+    if "users" in tables and "alembic_version" not in tables:
+        print(f"Existing schema without migration history, stamping baseline {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+def seed():
+    from seed_db import seed_universities
+    seed_universities()
+
+def import_catalog(path: str, fmt: str = None, chunk_size: int = 1000, use_copy: bool = False):
+    from catalog_import import import_catalog as run_import
+    run_import(path, fmt=fmt, chunk_size=chunk_size, use_copy=use_copy)
+
+def check_user_progress(fix: bool = False) -> int:
+    from user_progress import check_user_progress as run_check
+    return run_check(fix=fix)
+
+def sync_registry(source: str = None, every: int = None, force: bool = False):
+    from registry_sync import sync_registry as run_sync, sync_registry_every
+    if every:
+        sync_registry_every(every, source)
+    else:
+        run_sync(source, force)
+
+def add_alias(alias: str, name: str, display_only: bool = False):
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from models import UniversityAlias
+    from university_names import name_key
+    values = {"alias_key": name_key(alias), "alias": alias, "canonical_key": name_key(name), "canonical_name": name, "display_only": display_only}
+    if values["alias_key"] == values["canonical_key"]:
+        print(f"{alias!r} and {name!r} already match")
+        return
+    with engine.begin() as conn:
+        conn.execute(pg_insert(UniversityAlias).values(**values).on_conflict_do_update(index_elements=["alias_key"], set_=values))
+    print(f"{alias!r} is now {'a display-only' if display_only else 'an'} alias of {name!r}")
+
+def add_country_alias(alias: str, code: str):
+    from sqlalchemy import func, select
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+    from countries import recode
+    from models import Country, CountryAlias
+    code = code.upper()
+    # Keyed by the SQL country_key(), which the triggers use
+    values = {"alias_key": func.country_key(alias), "alias": alias, "code": code}
+    with engine.begin() as conn:
+        if not conn.execute(select(Country.code).where(Country.code == code)).first():
+            raise SystemExit(f"Unknown country code {code!r}")
+        alias_key = conn.execute(
+            pg_insert(CountryAlias).values(**values)
+            .on_conflict_do_update(index_elements=["alias_key"], set_={"alias": alias, "code": code})
+            .returning(CountryAlias.alias_key)
+        ).scalar()
+        # Rows that spell the country this way take its code now
+        recode(conn, [alias_key])
+    print(f"{alias!r} now means {code}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subparsers.add_parser("migrate", help="Apply schema migrations")
+    migrate_parser.add_argument("revision", nargs="?", default="head")
+    subparsers.add_parser("seed", help="Seed the university catalog")
+    import_parser = subparsers.add_parser("import-catalog", help="Stream a CSV/NDJSON catalog into the universities table")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension")
+    import_parser.add_argument("--chunk-size", type=int, default=1000)
+    import_parser.add_argument("--copy", action="store_true", help="COPY each chunk into a staging table before merging")
+    progress_parser = subparsers.add_parser("check-user-progress", help="Check users' denormalized stage and counts")
+    progress_parser.add_argument("--fix", action="store_true", help="Rebuild the users that drifted")
+    sync_parser = subparsers.add_parser("sync-registry", help="Sync the local mirror of the university registry")
+    sync_parser.add_argument("--source", help="Dataset URL or local JSON file (default REGISTRY_DATASET_URL)")
+    sync_parser.add_argument("--every", type=int, metavar="SECONDS", help="Keep running, syncing at this interval")
+    sync_parser.add_argument("--force", action="store_true", help="Apply a download even if it has far fewer universities than the last sync")
+    alias_parser = subparsers.add_parser("add-alias", help="Make ALIAS another name of the university NAME in listings")
+    alias_parser.add_argument("alias")
+    alias_parser.add_argument("name")
+    alias_parser.add_argument("--display-only", action="store_true", help="An ambiguous short form: a name only, never a merge key")
+    country_alias_parser = subparsers.add_parser("add-country-alias", help="Make ALIAS another spelling of the country with ISO code CODE")
+    country_alias_parser.add_argument("alias")
+    country_alias_parser.add_argument("code")
+
+    args = parser.parse_args()
+    if args.command == "migrate":
+        migrate(args.revision)
+    elif args.command == "seed":
+        seed()
+    elif args.command == "import-catalog":
+        import_catalog(args.path, args.format, args.chunk_size, args.copy)
+    elif args.command == "check-user-progress":
+        # Non-zero exit when a check-only run finds drift, so it can gate a deploy or cron alert
+        if check_user_progress(args.fix) and not args.fix:
+            raise SystemExit(1)
+    elif args.command == "sync-registry":
+        sync_registry(args.source, args.every, args.force)
+    elif args.command == "add-alias":
+        add_alias(args.alias, args.name, args.display_only)
+    elif args.command == "add-country-alias":
+        add_country_alias(args.alias, args.code)
+
+if __name__ == "__main__":
+    main()
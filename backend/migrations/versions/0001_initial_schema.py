@@ -0,0 +1,147 @@
+"""initial schema
+
+Tables as they existed when the app still ran create_all() on import.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-19 07:41:23.861874
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('universities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('country', sa.String(), nullable=False),
+    sa.Column('degree_type', sa.String(), nullable=True),
+    sa.Column('field_of_study', sa.String(), nullable=True),
+    sa.Column('tuition_fee', sa.Float(), nullable=True),
+    sa.Column('acceptance_rate', sa.Float(), nullable=True),
+    sa.Column('ranking', sa.Integer(), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_universities_country'), 'universities', ['country'], unique=False)
+    op.create_index(op.f('ix_universities_id'), 'universities', ['id'], unique=False)
+    op.create_index(op.f('ix_universities_name'), 'universities', ['name'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=False),
+    sa.Column('full_name', sa.String(), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('google_id', sa.String(), nullable=True),
+    sa.Column('profile_complete', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_google_id'), 'users', ['google_id'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_table('application_documents',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('is_completed', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_application_documents_id'), 'application_documents', ['id'], unique=False)
+    op.create_table('locked_universities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_locked_universities_id'), 'locked_universities', ['id'], unique=False)
+    op.create_table('onboarding',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('current_education_level', sa.String(), nullable=True),
+    sa.Column('degree_major', sa.String(), nullable=True),
+    sa.Column('graduation_year', sa.Integer(), nullable=True),
+    sa.Column('gpa', sa.Float(), nullable=True),
+    sa.Column('intended_degree', sa.String(), nullable=True),
+    sa.Column('field_of_study', sa.String(), nullable=True),
+    sa.Column('target_intake_year', sa.Integer(), nullable=True),
+    sa.Column('preferred_countries', sa.String(), nullable=True),
+    sa.Column('budget_per_year', sa.Float(), nullable=True),
+    sa.Column('funding_plan', sa.String(), nullable=True),
+    sa.Column('ielts_toefl_status', sa.String(), nullable=True),
+    sa.Column('ielts_toefl_score', sa.Float(), nullable=True),
+    sa.Column('gre_gmat_status', sa.String(), nullable=True),
+    sa.Column('gre_gmat_score', sa.Float(), nullable=True),
+    sa.Column('sop_status', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    op.create_index(op.f('ix_onboarding_id'), 'onboarding', ['id'], unique=False)
+    op.create_table('shortlisted_universities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_shortlisted_universities_id'), 'shortlisted_universities', ['id'], unique=False)
+    op.create_table('todos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('completed', sa.Boolean(), nullable=True),
+    sa.Column('completed_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_todos_id'), 'todos', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_todos_id'), table_name='todos')
+    op.drop_table('todos')
+    op.drop_index(op.f('ix_shortlisted_universities_id'), table_name='shortlisted_universities')
+    op.drop_table('shortlisted_universities')
+    op.drop_index(op.f('ix_onboarding_id'), table_name='onboarding')
+    op.drop_table('onboarding')
+    op.drop_index(op.f('ix_locked_universities_id'), table_name='locked_universities')
+    op.drop_table('locked_universities')
+    op.drop_index(op.f('ix_application_documents_id'), table_name='application_documents')
+    op.drop_table('application_documents')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_google_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_universities_name'), table_name='universities')
+    op.drop_index(op.f('ix_universities_id'), table_name='universities')
+    op.drop_index(op.f('ix_universities_country'), table_name='universities')
+    op.drop_table('universities')
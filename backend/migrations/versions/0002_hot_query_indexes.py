@@ -0,0 +1,66 @@
+"""hot query indexes
+
+Composite unique constraints on the per-user (user_id, university_id) tables so
+existence checks can become ON CONFLICT upserts, a (user_id, created_at) index
+for the todo listing and a unique index on university names.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 08:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UNIVERSITY_REFERENCES = ["shortlisted_universities", "locked_universities", "todos", "application_documents"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The old check-then-insert paths could race into duplicates; collapse them first.
+    # Point every reference at the lowest id carrying a university name, then drop the rest.
+    for table in UNIVERSITY_REFERENCES:
+        op.execute(f"""
+            UPDATE {table} t SET university_id = d.keep_id
+            FROM (SELECT id, MIN(id) OVER (PARTITION BY name) AS keep_id FROM universities) d
+            WHERE t.university_id = d.id AND d.id <> d.keep_id
+        """)
+    op.execute("""
+        DELETE FROM universities u USING universities keep
+        WHERE u.name = keep.name AND u.id > keep.id
+    """)
+    for table in ["shortlisted_universities", "locked_universities"]:
+        op.execute(f"""
+            DELETE FROM {table} a USING {table} b
+            WHERE a.user_id = b.user_id AND a.university_id = b.university_id AND a.id > b.id
+        """)
+    op.execute("""
+        DELETE FROM application_documents a USING application_documents b
+        WHERE a.user_id = b.user_id AND a.university_id = b.university_id
+          AND a.name = b.name AND a.id > b.id
+    """)
+
+    op.drop_index('ix_universities_name', table_name='universities')
+    op.create_index('ix_universities_name', 'universities', ['name'], unique=True)
+    op.create_unique_constraint('uq_shortlisted_universities_user_university', 'shortlisted_universities', ['user_id', 'university_id'])
+    op.create_unique_constraint('uq_locked_universities_user_university', 'locked_universities', ['user_id', 'university_id'])
+    op.create_unique_constraint('uq_application_documents_user_university_name', 'application_documents', ['user_id', 'university_id', 'name'])
+    op.create_index('ix_todos_user_id_created_at', 'todos', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_user_id_created_at', table_name='todos')
+    op.drop_constraint('uq_application_documents_user_university_name', 'application_documents', type_='unique')
+    op.drop_constraint('uq_locked_universities_user_university', 'locked_universities', type_='unique')
+    op.drop_constraint('uq_shortlisted_universities_user_university', 'shortlisted_universities', type_='unique')
+    op.drop_index('ix_universities_name', table_name='universities')
+    op.create_index('ix_universities_name', 'universities', ['name'], unique=False)
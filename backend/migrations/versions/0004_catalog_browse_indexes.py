@@ -0,0 +1,44 @@
+"""catalog browse indexes
+
+(sort column, id) indexes backing keyset pagination for every sort order offered by
+GET /api/universities, a degree_type index for the degree filter and a trigram
+index so the field-of-study substring filter doesn't scan the catalog.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_universities_ranking_id', 'universities', ['ranking', 'id'], unique=False)
+    op.create_index('ix_universities_tuition_fee_id', 'universities', ['tuition_fee', 'id'], unique=False)
+    op.create_index('ix_universities_tuition_fee_desc_id', 'universities', [sa.text('tuition_fee DESC NULLS LAST'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_universities_acceptance_rate_id', 'universities', ['acceptance_rate', 'id'], unique=False)
+    op.create_index('ix_universities_acceptance_rate_desc_id', 'universities', [sa.text('acceptance_rate DESC NULLS LAST'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_universities_degree_type', 'universities', ['degree_type'], unique=False)
+    op.create_index('ix_universities_field_of_study_trgm', 'universities', ['field_of_study'], unique=False, postgresql_using='gin', postgresql_ops={'field_of_study': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_universities_field_of_study_trgm', table_name='universities')
+    op.drop_index('ix_universities_degree_type', table_name='universities')
+    op.drop_index('ix_universities_acceptance_rate_desc_id', table_name='universities')
+    op.drop_index('ix_universities_acceptance_rate_id', table_name='universities')
+    op.drop_index('ix_universities_tuition_fee_desc_id', table_name='universities')
+    op.drop_index('ix_universities_tuition_fee_id', table_name='universities')
+    op.drop_index('ix_universities_ranking_id', table_name='universities')
@@ -0,0 +1,73 @@
+"""catalog version
+
+Single-row counter bumped by triggers whenever a statement actually changes the
+universities table, so workers holding an in-memory catalog snapshot know when
+to reload it. Statements that touch no rows (e.g. a seed run that inserts
+nothing new) leave the version alone.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO catalog_version (id, version) VALUES (1, 1)")
+    op.execute("""
+        CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            -- TRUNCATE has no transition table; the other events skip empty statements
+            IF TG_OP <> 'TRUNCATE' THEN
+                IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+                    RETURN NULL;
+                END IF;
+            END IF;
+            UPDATE catalog_version SET version = version + 1, updated_at = now() WHERE id = 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables can't be shared between events, hence one trigger per event
+    op.execute("""
+        CREATE TRIGGER universities_catalog_version_insert AFTER INSERT ON universities
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+    op.execute("""
+        CREATE TRIGGER universities_catalog_version_update AFTER UPDATE ON universities
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+    op.execute("""
+        CREATE TRIGGER universities_catalog_version_delete AFTER DELETE ON universities
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+    op.execute("""
+        CREATE TRIGGER universities_catalog_version_truncate AFTER TRUNCATE ON universities
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER universities_catalog_version_{event} ON universities")
+    op.execute("DROP FUNCTION bump_catalog_version()")
+    op.drop_table('catalog_version')
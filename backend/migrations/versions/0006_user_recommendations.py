@@ -0,0 +1,49 @@
+"""user recommendations
+
+Per-user table of precomputed best-fitting programs, read best first through a
+(user_id, score) index, and the catalog version each profile was last ranked
+against so background refreshes only touch stale users.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_recommendations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('category', sa.String(), nullable=False),
+    sa.Column('acceptance_chance', sa.String(), nullable=False),
+    sa.Column('why_fits', sa.String(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'university_id', name='uq_user_recommendations_user_university')
+    )
+    op.create_index('ix_user_recommendations_user_id_score', 'user_recommendations', ['user_id', sa.text('score DESC'), 'university_id'], unique=False)
+    op.add_column('onboarding', sa.Column('recommendations_version', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('onboarding', 'recommendations_version')
+    op.drop_index('ix_user_recommendations_user_id_score', table_name='user_recommendations')
+    op.drop_table('user_recommendations')
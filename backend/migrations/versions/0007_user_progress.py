@@ -0,0 +1,116 @@
+"""user progress
+
+Denormalized application stage and shortlist/lock counts on users, so a stage
+read is the user row itself. Triggers keep them current in the same transaction
+as every change to onboarding, shortlisted_universities and locked_universities,
+whichever code path makes it. Counts move by deltas, which stay correct when two
+transactions change the same user's lists concurrently (the second UPDATE re-reads
+the row after the first commits). A BEFORE UPDATE trigger derives the stage from
+the counts: 0 = no onboarding yet, 2 = discovering, 3 = finalizing (something
+shortlisted), 4 = preparing applications (something locked).
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Each user's progress as derived from their rows (user_progress.py checks against the same)
+EXPECTED_PROGRESS = """
+    SELECT u.id AS user_id,
+           coalesce(s.n, 0) AS shortlisted_count,
+           coalesce(l.n, 0) AS locked_count,
+           CASE WHEN o.user_id IS NULL THEN 0 WHEN l.n > 0 THEN 4 WHEN s.n > 0 THEN 3 ELSE 2 END AS stage
+    FROM users u
+    LEFT JOIN (SELECT user_id, count(*) AS n FROM shortlisted_universities GROUP BY user_id) s ON s.user_id = u.id
+    LEFT JOIN (SELECT user_id, count(*) AS n FROM locked_universities GROUP BY user_id) l ON l.user_id = u.id
+    LEFT JOIN onboarding o ON o.user_id = u.id
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('stage', sa.SmallInteger(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('shortlisted_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('locked_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+        CREATE FUNCTION derive_user_stage() RETURNS trigger AS $$
+        BEGIN
+            -- Stage 0 (not onboarded) only changes through the onboarding trigger
+            IF NEW.stage <> 0 THEN
+                NEW.stage := CASE WHEN NEW.locked_count > 0 THEN 4 WHEN NEW.shortlisted_count > 0 THEN 3 ELSE 2 END;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER users_derive_stage BEFORE UPDATE OF stage, shortlisted_count, locked_count ON users
+        FOR EACH ROW EXECUTE FUNCTION derive_user_stage()
+    """)
+    op.execute("""
+        CREATE FUNCTION count_user_picks() RETURNS trigger AS $$
+        DECLARE
+            delta integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+        BEGIN
+            UPDATE users u SET
+                shortlisted_count = u.shortlisted_count + CASE WHEN TG_TABLE_NAME = 'shortlisted_universities' THEN c.n ELSE 0 END,
+                locked_count = u.locked_count + CASE WHEN TG_TABLE_NAME = 'locked_universities' THEN c.n ELSE 0 END
+            FROM (SELECT user_id, count(*) * delta AS n FROM changed_rows GROUP BY user_id) c
+            WHERE u.id = c.user_id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION track_user_onboarding() RETURNS trigger AS $$
+        BEGIN
+            -- Any non-zero stage; derive_user_stage settles which
+            UPDATE users SET stage = CASE TG_OP WHEN 'INSERT' THEN 2 ELSE 0 END
+            WHERE id IN (SELECT user_id FROM changed_rows);
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables can't be shared between events, hence one trigger per event
+    for table, function in (("shortlisted_universities", "count_user_picks"), ("locked_universities", "count_user_picks"), ("onboarding", "track_user_onboarding")):
+        op.execute(f"""
+            CREATE TRIGGER {table}_user_progress_insert AFTER INSERT ON {table}
+            REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+        op.execute(f"""
+            CREATE TRIGGER {table}_user_progress_delete AFTER DELETE ON {table}
+            REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+
+    # Backfill existing users
+    op.execute(f"""
+        UPDATE users u SET shortlisted_count = p.shortlisted_count, locked_count = p.locked_count, stage = p.stage
+        FROM ({EXPECTED_PROGRESS}) p WHERE p.user_id = u.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ("shortlisted_universities", "locked_universities", "onboarding"):
+        for event in ("insert", "delete"):
+            op.execute(f"DROP TRIGGER {table}_user_progress_{event} ON {table}")
+    op.execute("DROP TRIGGER users_derive_stage ON users")
+    op.execute("DROP FUNCTION track_user_onboarding()")
+    op.execute("DROP FUNCTION count_user_picks()")
+    op.execute("DROP FUNCTION derive_user_stage()")
+    op.drop_column('users', 'locked_count')
+    op.drop_column('users', 'shortlisted_count')
+    op.drop_column('users', 'stage')
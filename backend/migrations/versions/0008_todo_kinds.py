@@ -0,0 +1,66 @@
+"""todo kinds
+
+Typed tasks: todos.kind says what a system-recognised task is (SOP, test scores,
+shortlist, ...) and todos.source_ref what created it (e.g. "lock:<university id>"),
+so auto-completion is an indexed UPDATE on (user_id, kind, completed) instead of
+ILIKE scans over titles. Existing todos are tagged from their titles once, here.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 14:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Titles generate_application_todos has always used
+GENERATED_TITLES = {
+    "Prepare Statement of Purpose (SOP)": "sop",
+    "Complete application form": "application_form",
+    "Submit transcripts": "transcripts",
+    "Get recommendation letters": "recommendation_letters",
+    "Submit test scores": "test_scores",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('todos', sa.Column('kind', sa.String(length=32), nullable=True))
+    op.add_column('todos', sa.Column('source_ref', sa.String(length=64), nullable=True))
+    # Partial: free-form tasks are never auto-completed, and the plain listing keeps ix_todos_user_id_created_at
+    op.create_index('ix_todos_user_id_kind_completed', 'todos', ['user_id', 'kind', 'completed'], unique=False, postgresql_where=sa.text('kind IS NOT NULL'))
+
+    generated = " ".join(f"WHEN '{title}' THEN '{kind}'" for title, kind in GENERATED_TITLES.items())
+    op.execute(f"""
+        UPDATE todos SET
+            kind = CASE title {generated} END,
+            source_ref = 'lock:' || university_id
+        WHERE university_id IS NOT NULL AND title IN ({", ".join(f"'{t}'" for t in GENERATED_TITLES)})
+    """)
+    # completed was only ever set from Python; make "open" mean completed = false
+    op.execute("UPDATE todos SET completed = false WHERE completed IS NULL")
+    # The same rules the title scans applied, for tasks written by users or the AI counsellor
+    op.execute("""
+        UPDATE todos SET kind = CASE
+            WHEN title ILIKE '%test score%' THEN 'test_scores'
+            WHEN title ILIKE '%SOP%' THEN 'sop'
+            WHEN title ILIKE '%shortlist%' THEN 'shortlist'
+        END
+        WHERE kind IS NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_todos_user_id_kind_completed', table_name='todos')
+    op.drop_column('todos', 'source_ref')
+    op.drop_column('todos', 'kind')
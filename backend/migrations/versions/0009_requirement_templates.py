@@ -0,0 +1,72 @@
+"""requirement templates
+
+A unique index on (user_id, source_ref, kind) for todos created from a locked
+university's requirements, so materializing them is an idempotent
+INSERT ... ON CONFLICT DO NOTHING. Re-locking used to add a second set; those
+duplicates are collapsed first, keeping a completed copy where there is one.
+Locks made before documents were materialized at lock time get their documents
+here, by the country rules the documents endpoint used to apply on first read.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 15:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COMMON_DOCUMENTS = ["Statement of Purpose (SOP)", "Academic Transcripts", "Resume/CV"]
+COUNTRY_DOCUMENTS = {
+    "USA": ["GRE/GMAT Scores", "Letters of Recommendation (3)", "Financial Proof (I-20)"],
+    "UK": ["IELTS/TOEFL Scores", "Letters of Recommendation (2)", "CAS Letter Request"],
+    None: ["Language Proficiency Score", "Letters of Recommendation (2)"],
+}
+TEXT_ARRAY = postgresql.ARRAY(sa.String)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        DELETE FROM todos WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY user_id, source_ref, kind ORDER BY completed DESC, id) AS n
+                FROM todos WHERE source_ref LIKE 'lock:%'
+            ) ranked WHERE n > 1
+        )
+    """)
+    op.create_index('uq_todos_user_source_ref_kind', 'todos', ['user_id', 'source_ref', 'kind'], unique=True, postgresql_where=sa.text("source_ref LIKE 'lock:%'"))
+
+    # Names and countries are bound, not spliced into the SQL, so quotes in them are safe
+    others = [c for c in COUNTRY_DOCUMENTS if c]
+    for country, extra in COUNTRY_DOCUMENTS.items():
+        condition = "u.country = :country" if country else "u.country IS NULL OR u.country <> ALL(:countries)"
+        statement = sa.text(f"""
+            INSERT INTO application_documents (user_id, university_id, name, is_completed, created_at, updated_at)
+            SELECT l.user_id, l.university_id, d.name, false, now(), now()
+            FROM locked_universities l
+            JOIN universities u ON u.id = l.university_id
+            CROSS JOIN unnest(:names) AS d(name)
+            WHERE ({condition})
+              AND NOT EXISTS (SELECT 1 FROM application_documents a WHERE a.user_id = l.user_id AND a.university_id = l.university_id)
+            ON CONFLICT DO NOTHING
+        """).bindparams(sa.bindparam("names", COMMON_DOCUMENTS + extra, type_=TEXT_ARRAY))
+        if country:
+            statement = statement.bindparams(country=country)
+        else:
+            statement = statement.bindparams(sa.bindparam("countries", others, type_=TEXT_ARRAY))
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_todos_user_source_ref_kind', table_name='todos', postgresql_where=sa.text("source_ref LIKE 'lock:%'"))
@@ -0,0 +1,44 @@
+"""external university cache
+
+Shared tier of the Hipolabs registry cache: results per normalized (country, name)
+query with their freshness and stale-while-revalidate deadlines.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 16:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('external_university_cache',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('country', sa.String(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('results', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.String(length=8), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.Column('fresh_until', sa.DateTime(), nullable=False),
+    sa.Column('stale_until', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_external_university_cache_stale_until'), 'external_university_cache', ['stale_until'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_external_university_cache_stale_until'), table_name='external_university_cache')
+    op.drop_table('external_university_cache')
@@ -0,0 +1,61 @@
+"""external universities
+
+Local mirror of the Hipolabs university registry, with normalized names, countries
+and domains, and the state of the last sync from each source (registry_sync.py),
+so listings can search the registry without a network call.
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 16:45:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('external_universities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('normalized_name', sa.String(), nullable=False),
+    sa.Column('country', sa.String(), nullable=True),
+    sa.Column('normalized_country', sa.String(), nullable=False),
+    sa.Column('alpha_two_code', sa.String(length=2), nullable=True),
+    sa.Column('state_province', sa.String(), nullable=True),
+    sa.Column('domains', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('web_pages', postgresql.ARRAY(sa.String()), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('normalized_country', 'normalized_name', name='uq_external_universities_country_name')
+    )
+    op.create_index('ix_external_universities_normalized_name_trgm', 'external_universities', ['normalized_name'], unique=False, postgresql_using='gin', postgresql_ops={'normalized_name': 'gin_trgm_ops'})
+    op.create_index('ix_external_universities_domains', 'external_universities', ['domains'], unique=False, postgresql_using='gin')
+    op.create_table('registry_sync',
+    sa.Column('source', sa.String(), nullable=False),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('source')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('registry_sync')
+    op.drop_index('ix_external_universities_domains', table_name='external_universities')
+    op.drop_index('ix_external_universities_normalized_name_trgm', table_name='external_universities')
+    op.drop_table('external_universities')
@@ -0,0 +1,77 @@
+"""external university ids
+
+Identity map for "ext:<name>" ids: one row per normalized name, pointing at the
+local university created on first use, so every spelling of a name resolves to
+the same row. Placeholder universities created from ext: ids before this are
+mapped here (the oldest wins where spellings collide), and those still marked
+'Unknown' take their country from the registry mirror.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 17:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, Sequence[str], None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# external_universities.normalize_text in SQL, frozen: NFKD, accents dropped, lowercased,
+# runs of whitespace and punctuation collapsed to one space. The separators are listed
+# rather than matched as [^[:alnum:]], which drops non-Latin letters under a C ctype.
+NORMALIZED_NAME = r"""
+    btrim(regexp_replace(
+        regexp_replace(lower(normalize(name, NFKD)), '[\u0300-\u036f]', '', 'g'),
+        '[\s!-/:-@\[-`{-~\u00a0-\u00bf\u00d7\u00f7\u2000-\u206f\u3000-\u303f]+', ' ', 'g'
+    ))
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('external_university_ids',
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['university_id'], ['universities.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_index(op.f('ix_external_university_ids_university_id'), 'external_university_ids', ['university_id'], unique=False)
+    op.create_index('ix_external_universities_normalized_name', 'external_universities', ['normalized_name'], unique=False)
+
+    # One statement, so offline mode (--sql) can emit it; the oldest wins where spellings collide
+    op.execute(f"""
+        INSERT INTO external_university_ids (key, name, university_id, created_at)
+        SELECT DISTINCT ON (key) key, name, id, now() AT TIME ZONE 'utc'
+        FROM (
+            SELECT id, name, {NORMALIZED_NAME} AS key FROM universities
+            WHERE description = 'Automated entry for ' || name
+        ) placeholders
+        WHERE key <> ''
+        ORDER BY key, id
+    """)
+    op.execute("""
+        UPDATE universities u SET country = e.country
+        FROM external_university_ids i
+        JOIN LATERAL (
+            SELECT country FROM external_universities
+            WHERE normalized_name = i.key AND country IS NOT NULL ORDER BY id LIMIT 1
+        ) e ON true
+        WHERE i.university_id = u.id AND u.country = 'Unknown'
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_external_universities_normalized_name', table_name='external_universities')
+    op.drop_index(op.f('ix_external_university_ids_university_id'), table_name='external_university_ids')
+    op.drop_table('external_university_ids')
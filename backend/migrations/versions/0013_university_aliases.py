@@ -0,0 +1,114 @@
+"""university aliases
+
+Other names of universities (acronyms, short forms, native spellings), keyed by
+university_names.name_key, so listings can merge a university's local and
+registry entries. Seeded with well-known aliases of the catalog's universities.
+Changes bump catalog_version like changes to universities do, since the catalog
+snapshot holds the aliases.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 18:15:00.000000
+
+"""
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0013'
+down_revision: Union[str, Sequence[str], None] = '0012'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of university_names.STOPWORDS
+STOPWORDS = {
+    "a", "an", "and", "at", "for", "in", "of", "on", "the",
+    "de", "del", "della", "der", "des", "di", "du", "et", "la", "le", "les", "und", "y",
+}
+
+ALIASES = [
+    ("MIT", "Massachusetts Institute of Technology"),
+    ("Caltech", "California Institute of Technology"),
+    ("CMU", "Carnegie Mellon University"),
+    ("Georgia Tech", "Georgia Institute of Technology"),
+    ("UC Berkeley", "University of California, Berkeley"),
+    ("UCLA", "University of California, Los Angeles"),
+    ("UIUC", "University of Illinois Urbana-Champaign"),
+    ("NYU", "New York University"),
+    ("UBC", "University of British Columbia"),
+    ("UofT", "University of Toronto"),
+    ("UCL", "University College London"),
+    ("LSE", "London School of Economics and Political Science"),
+    ("Imperial College", "Imperial College London"),
+    ("KCL", "King's College London"),
+    ("UCD", "University College Dublin"),
+    ("TCD", "Trinity College Dublin"),
+    ("TUM", "Technical University of Munich"),
+    ("TU Munich", "Technical University of Munich"),
+    ("Technische Universität München", "Technical University of Munich"),
+    ("LMU", "Ludwig Maximilian University of Munich"),
+    ("LMU Munich", "Ludwig Maximilian University of Munich"),
+    ("Ludwig-Maximilians-Universität München", "Ludwig Maximilian University of Munich"),
+    ("Universität Heidelberg", "Heidelberg University"),
+    ("Ruprecht-Karls-Universität Heidelberg", "Heidelberg University"),
+    ("RWTH Aachen", "RWTH Aachen University"),
+    ("TU Delft", "Delft University of Technology"),
+    ("Technische Universiteit Delft", "Delft University of Technology"),
+    ("UvA", "University of Amsterdam"),
+    ("Universiteit van Amsterdam", "University of Amsterdam"),
+    ("ETH", "ETH Zurich"),
+    ("Swiss Federal Institute of Technology Zurich", "ETH Zurich"),
+    ("Ecole Polytechnique Fédérale de Lausanne", "EPFL"),
+    ("Swiss Federal Institute of Technology Lausanne", "EPFL"),
+    ("Sorbonne Université", "Sorbonne University"),
+    ("NUS", "National University of Singapore"),
+    ("NTU", "Nanyang Technological University"),
+    ("ANU", "Australian National University"),
+    ("UNSW", "University of New South Wales"),
+    ("UNSW Sydney", "University of New South Wales"),
+]
+
+
+def name_key(name):
+    # Frozen copy of university_names.name_key
+    value = unicodedata.normalize("NFKD", name or "")
+    value = "".join(c if c.isalnum() else " " for c in value if not unicodedata.combining(c))
+    words = value.casefold().split()
+    return " ".join(w for w in words if w not in STOPWORDS) or " ".join(words)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    table = op.create_table('university_aliases',
+    sa.Column('alias_key', sa.String(), nullable=False),
+    sa.Column('alias', sa.String(), nullable=False),
+    sa.Column('canonical_key', sa.String(), nullable=False),
+    sa.Column('canonical_name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('alias_key')
+    )
+    op.bulk_insert(table, [
+        {"alias_key": name_key(alias), "alias": alias, "canonical_key": name_key(name), "canonical_name": name}
+        for alias, name in ALIASES
+    ])
+    # Same function as the universities triggers (0005), one trigger per event
+    for event, transition in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+        op.execute(f"""
+            CREATE TRIGGER university_aliases_catalog_version_{event} AFTER {event.upper()} ON university_aliases
+            REFERENCING {transition} TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
+    op.execute("""
+        CREATE TRIGGER university_aliases_catalog_version_truncate AFTER TRUNCATE ON university_aliases
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+    op.execute("UPDATE catalog_version SET version = version + 1, updated_at = now() WHERE id = 1")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER university_aliases_catalog_version_{event} ON university_aliases")
+    op.drop_table('university_aliases')
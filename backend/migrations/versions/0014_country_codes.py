@@ -0,0 +1,426 @@
+"""country codes
+
+Country reference data: ISO 3166-1 alpha-2 codes with their names, and aliases
+(names, codes and common spellings such as "USA" and "UK") keyed by the
+country_key() SQL function. Triggers set universities.country_code and
+onboarding.preferred_country_codes from the aliases whenever those rows are
+written, and existing rows are coded here, so country filters compare indexed
+codes. The registry mirror gets a (code, name) index for the same filters.
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0014'
+down_revision: Union[str, Sequence[str], None] = '0013'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNTRIES = """
+AD Andorra
+AE United Arab Emirates
+AF Afghanistan
+AG Antigua and Barbuda
+AI Anguilla
+AL Albania
+AM Armenia
+AO Angola
+AQ Antarctica
+AR Argentina
+AS American Samoa
+AT Austria
+AU Australia
+AW Aruba
+AX Aland Islands
+AZ Azerbaijan
+BA Bosnia and Herzegovina
+BB Barbados
+BD Bangladesh
+BE Belgium
+BF Burkina Faso
+BG Bulgaria
+BH Bahrain
+BI Burundi
+BJ Benin
+BL Saint Barthelemy
+BM Bermuda
+BN Brunei Darussalam
+BO Bolivia
+BQ Bonaire, Sint Eustatius and Saba
+BR Brazil
+BS Bahamas
+BT Bhutan
+BV Bouvet Island
+BW Botswana
+BY Belarus
+BZ Belize
+CA Canada
+CC Cocos (Keeling) Islands
+CD Congo, the Democratic Republic of the
+CF Central African Republic
+CG Congo
+CH Switzerland
+CI Cote d'Ivoire
+CK Cook Islands
+CL Chile
+CM Cameroon
+CN China
+CO Colombia
+CR Costa Rica
+CU Cuba
+CV Cape Verde
+CW Curacao
+CX Christmas Island
+CY Cyprus
+CZ Czech Republic
+DE Germany
+DJ Djibouti
+DK Denmark
+DM Dominica
+DO Dominican Republic
+DZ Algeria
+EC Ecuador
+EE Estonia
+EG Egypt
+EH Western Sahara
+ER Eritrea
+ES Spain
+ET Ethiopia
+FI Finland
+FJ Fiji
+FK Falkland Islands
+FM Micronesia
+FO Faroe Islands
+FR France
+GA Gabon
+GB United Kingdom
+GD Grenada
+GE Georgia
+GF French Guiana
+GG Guernsey
+GH Ghana
+GI Gibraltar
+GL Greenland
+GM Gambia
+GN Guinea
+GP Guadeloupe
+GQ Equatorial Guinea
+GR Greece
+GS South Georgia and the South Sandwich Islands
+GT Guatemala
+GU Guam
+GW Guinea-Bissau
+GY Guyana
+HK Hong Kong
+HM Heard Island and McDonald Islands
+HN Honduras
+HR Croatia
+HT Haiti
+HU Hungary
+ID Indonesia
+IE Ireland
+IL Israel
+IM Isle of Man
+IN India
+IO British Indian Ocean Territory
+IQ Iraq
+IR Iran
+IS Iceland
+IT Italy
+JE Jersey
+JM Jamaica
+JO Jordan
+JP Japan
+KE Kenya
+KG Kyrgyzstan
+KH Cambodia
+KI Kiribati
+KM Comoros
+KN Saint Kitts and Nevis
+KP North Korea
+KR South Korea
+KW Kuwait
+KY Cayman Islands
+KZ Kazakhstan
+LA Laos
+LB Lebanon
+LC Saint Lucia
+LI Liechtenstein
+LK Sri Lanka
+LR Liberia
+LS Lesotho
+LT Lithuania
+LU Luxembourg
+LV Latvia
+LY Libya
+MA Morocco
+MC Monaco
+MD Moldova
+ME Montenegro
+MF Saint Martin
+MG Madagascar
+MH Marshall Islands
+MK North Macedonia
+ML Mali
+MM Myanmar
+MN Mongolia
+MO Macao
+MP Northern Mariana Islands
+MQ Martinique
+MR Mauritania
+MS Montserrat
+MT Malta
+MU Mauritius
+MV Maldives
+MW Malawi
+MX Mexico
+MY Malaysia
+MZ Mozambique
+NA Namibia
+NC New Caledonia
+NE Niger
+NF Norfolk Island
+NG Nigeria
+NI Nicaragua
+NL Netherlands
+NO Norway
+NP Nepal
+NR Nauru
+NU Niue
+NZ New Zealand
+OM Oman
+PA Panama
+PE Peru
+PF French Polynesia
+PG Papua New Guinea
+PH Philippines
+PK Pakistan
+PL Poland
+PM Saint Pierre and Miquelon
+PN Pitcairn
+PR Puerto Rico
+PS Palestine
+PT Portugal
+PW Palau
+PY Paraguay
+QA Qatar
+RE Reunion
+RO Romania
+RS Serbia
+RU Russian Federation
+RW Rwanda
+SA Saudi Arabia
+SB Solomon Islands
+SC Seychelles
+SD Sudan
+SE Sweden
+SG Singapore
+SH Saint Helena, Ascension and Tristan da Cunha
+SI Slovenia
+SJ Svalbard and Jan Mayen
+SK Slovakia
+SL Sierra Leone
+SM San Marino
+SN Senegal
+SO Somalia
+SR Suriname
+SS South Sudan
+ST Sao Tome and Principe
+SV El Salvador
+SX Sint Maarten
+SY Syria
+SZ Eswatini
+TC Turks and Caicos Islands
+TD Chad
+TF French Southern Territories
+TG Togo
+TH Thailand
+TJ Tajikistan
+TK Tokelau
+TL Timor-Leste
+TM Turkmenistan
+TN Tunisia
+TO Tonga
+TR Turkey
+TT Trinidad and Tobago
+TV Tuvalu
+TW Taiwan
+TZ Tanzania
+UA Ukraine
+UG Uganda
+UM United States Minor Outlying Islands
+US United States
+UY Uruguay
+UZ Uzbekistan
+VA Holy See (Vatican City State)
+VC Saint Vincent and the Grenadines
+VE Venezuela
+VG Virgin Islands, British
+VI Virgin Islands, U.S.
+VN Vietnam
+VU Vanuatu
+WF Wallis and Futuna
+WS Samoa
+XK Kosovo
+YE Yemen
+YT Mayotte
+ZA South Africa
+ZM Zambia
+ZW Zimbabwe
+"""
+
+# Spellings besides each country's name and code
+ALIASES = {
+    "US": ["USA", "U.S.", "U.S.A.", "United States of America", "America"],
+    "GB": ["UK", "U.K.", "Great Britain", "Britain", "England", "Scotland", "Wales", "Northern Ireland"],
+    "AE": ["UAE"],
+    "BO": ["Bolivia, Plurinational State of"],
+    "BN": ["Brunei"],
+    "CD": ["DR Congo", "Democratic Republic of the Congo"],
+    "CG": ["Republic of the Congo"],
+    "CI": ["Ivory Coast"],
+    "CV": ["Cabo Verde"],
+    "CZ": ["Czechia"],
+    "DE": ["Deutschland"],
+    "FM": ["Micronesia, Federated States of"],
+    "IR": ["Iran, Islamic Republic of"],
+    "KP": ["Korea, Democratic People's Republic of"],
+    "KR": ["Korea", "Korea, Republic of", "Republic of Korea"],
+    "LA": ["Lao People's Democratic Republic"],
+    "MD": ["Moldova, Republic of"],
+    "MK": ["Macedonia", "Macedonia, the Former Yugoslav Republic of"],
+    "MM": ["Burma"],
+    "MO": ["Macau"],
+    "NL": ["Holland", "The Netherlands"],
+    "PS": ["Palestine, State of", "Palestinian Territory, Occupied"],
+    "RU": ["Russia"],
+    "SY": ["Syrian Arab Republic"],
+    "SZ": ["Swaziland"],
+    "TR": ["Turkiye", "Türkiye"],
+    "TW": ["Taiwan, Province of China"],
+    "TZ": ["Tanzania, United Republic of"],
+    "VA": ["Vatican City"],
+    "VE": ["Venezuela, Bolivarian Republic of"],
+    "VN": ["Viet Nam"],
+}
+
+COUNTRY_KEY = r"""
+    CREATE FUNCTION country_key(value text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT btrim(regexp_replace(
+            regexp_replace(lower(normalize(coalesce(value, ''), NFKD)), '[\u0300-\u036f]', '', 'g'),
+            '[^a-z0-9]+', ' ', 'g'
+        ))
+    $$
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    countries = op.create_table('countries',
+    sa.Column('code', sa.String(length=2), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.PrimaryKeyConstraint('code'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('country_aliases',
+    sa.Column('alias_key', sa.String(), nullable=False),
+    sa.Column('alias', sa.String(), nullable=False),
+    sa.Column('code', sa.String(length=2), nullable=False),
+    sa.ForeignKeyConstraint(['code'], ['countries.code'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('alias_key')
+    )
+    rows = [line.split(" ", 1) for line in COUNTRIES.strip().splitlines()]
+    op.bulk_insert(countries, [{"code": code, "name": name} for code, name in rows])
+    op.execute(COUNTRY_KEY)
+    aliases = [(code, spelling) for code, name in rows for spelling in (name, code)]
+    aliases += [(code, spelling) for code, spellings in ALIASES.items() for spelling in spellings]
+    # One statement, so offline mode (--sql) can emit it; the first spelling of a key wins
+    op.execute(sa.text("""
+        INSERT INTO country_aliases (alias_key, alias, code)
+        SELECT DISTINCT ON (country_key(alias)) country_key(alias), alias, code
+        FROM unnest(:aliases, :codes) WITH ORDINALITY AS a(alias, code, n)
+        ORDER BY country_key(alias), n
+    """).bindparams(
+        sa.bindparam("aliases", [alias for _, alias in aliases], type_=postgresql.ARRAY(sa.String)),
+        sa.bindparam("codes", [code for code, _ in aliases], type_=postgresql.ARRAY(sa.String)),
+    ))
+
+    op.add_column('universities', sa.Column('country_code', sa.String(length=2), nullable=True))
+    op.create_foreign_key('fk_universities_country_code', 'universities', 'countries', ['country_code'], ['code'])
+    op.create_index(op.f('ix_universities_country_code'), 'universities', ['country_code'], unique=False)
+    op.add_column('onboarding', sa.Column('preferred_country_codes', postgresql.ARRAY(sa.String(length=2)), nullable=True))
+    op.create_index('ix_external_universities_code_name', 'external_universities', ['alpha_two_code', 'normalized_name'], unique=False)
+
+    op.execute("""
+        CREATE FUNCTION set_university_country_code() RETURNS trigger AS $$
+        BEGIN
+            NEW.country_code := (SELECT code FROM country_aliases WHERE alias_key = country_key(NEW.country));
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER universities_country_code BEFORE INSERT OR UPDATE OF country ON universities
+        FOR EACH ROW EXECUTE FUNCTION set_university_country_code()
+    """)
+    op.execute("""
+        CREATE FUNCTION set_preferred_country_codes() RETURNS trigger AS $$
+        BEGIN
+            -- Recognised countries in the order the user listed them, once each
+            NEW.preferred_country_codes := ARRAY(
+                SELECT a.code
+                FROM unnest(string_to_array(NEW.preferred_countries, ',')) WITH ORDINALITY AS p(value, position)
+                JOIN country_aliases a ON a.alias_key = country_key(p.value)
+                GROUP BY a.code
+                ORDER BY min(p.position)
+            );
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER onboarding_preferred_country_codes BEFORE INSERT OR UPDATE OF preferred_countries ON onboarding
+        FOR EACH ROW EXECUTE FUNCTION set_preferred_country_codes()
+    """)
+    # Same function as the universities triggers (0005): the catalog snapshot holds the aliases
+    for event, transition in (("insert", "NEW"), ("update", "NEW"), ("delete", "OLD")):
+        op.execute(f"""
+            CREATE TRIGGER country_aliases_catalog_version_{event} AFTER {event.upper()} ON country_aliases
+            REFERENCING {transition} TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
+    op.execute("""
+        CREATE TRIGGER country_aliases_catalog_version_truncate AFTER TRUNCATE ON country_aliases
+        FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+    """)
+
+    # Code the existing rows through the triggers (the universities update also bumps catalog_version)
+    op.execute("UPDATE universities SET country = country")
+    op.execute("UPDATE onboarding SET preferred_countries = preferred_countries WHERE preferred_countries IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for event in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER country_aliases_catalog_version_{event} ON country_aliases")
+    op.execute("DROP TRIGGER onboarding_preferred_country_codes ON onboarding")
+    op.execute("DROP FUNCTION set_preferred_country_codes()")
+    op.execute("DROP TRIGGER universities_country_code ON universities")
+    op.execute("DROP FUNCTION set_university_country_code()")
+    op.drop_index('ix_external_universities_code_name', table_name='external_universities')
+    op.drop_column('onboarding', 'preferred_country_codes')
+    op.drop_index(op.f('ix_universities_country_code'), table_name='universities')
+    op.drop_constraint('fk_universities_country_code', 'universities', type_='foreignkey')
+    op.drop_column('universities', 'country_code')
+    op.execute("DROP FUNCTION country_key(text)")
+    op.drop_table('country_aliases')
+    op.drop_table('countries')
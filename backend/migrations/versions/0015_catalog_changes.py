@@ -0,0 +1,90 @@
+"""catalog changes
+
+Log of the universities each catalog version changed, so precomputed
+recommendations can re-score just those rows instead of the whole catalog. The
+universities triggers from 0005 now also record the ids a statement inserted or
+deleted, and the ids an update changed in a scored field (country, code, degree,
+tuition, acceptance rate, ranking). catalog_version.changes_from marks where the
+log is complete: a TRUNCATE, which has no ids to log, moves it to the new
+version, and recommendations.py prunes the log up to the oldest user's version.
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0015'
+down_revision: Union[str, Sequence[str], None] = '0014'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCORED_COLUMNS = ("country", "country_code", "degree_type", "tuition_fee", "acceptance_rate", "ranking")
+
+def _universities_triggers(function: str, update_transitions: str):
+    for event, transitions in (("insert", "NEW TABLE AS changed_rows"), ("update", update_transitions), ("delete", "OLD TABLE AS changed_rows")):
+        op.execute(f"DROP TRIGGER universities_catalog_version_{event} ON universities")
+        op.execute(f"""
+            CREATE TRIGGER universities_catalog_version_{event} AFTER {event.upper()} ON universities
+            REFERENCING {transitions} FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+        """)
+    op.execute("DROP TRIGGER universities_catalog_version_truncate ON universities")
+    op.execute(f"""
+        CREATE TRIGGER universities_catalog_version_truncate AFTER TRUNCATE ON universities
+        FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+    """)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_changes',
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('university_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('version', 'university_id')
+    )
+    op.add_column('catalog_version', sa.Column('changes_from', sa.BigInteger(), server_default='0', nullable=False))
+    # Nothing is logged before this version
+    op.execute("UPDATE catalog_version SET changes_from = version WHERE id = 1")
+    scored = " OR ".join(f"o.{c} IS DISTINCT FROM n.{c}" for c in SCORED_COLUMNS)
+    op.execute(f"""
+        CREATE FUNCTION log_catalog_changes() RETURNS trigger AS $$
+        DECLARE
+            new_version BIGINT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE catalog_version SET version = version + 1, changes_from = version + 1, updated_at = now() WHERE id = 1;
+                RETURN NULL;
+            END IF;
+            IF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+                RETURN NULL;
+            END IF;
+            UPDATE catalog_version SET version = version + 1, updated_at = now() WHERE id = 1
+            RETURNING version INTO new_version;
+            IF TG_OP = 'UPDATE' THEN
+                INSERT INTO catalog_changes (version, university_id)
+                SELECT new_version, n.id FROM changed_rows n LEFT JOIN old_rows o ON o.id = n.id
+                WHERE o.id IS NULL OR {scored}
+                UNION
+                SELECT new_version, o.id FROM old_rows o WHERE NOT EXISTS (SELECT 1 FROM changed_rows n WHERE n.id = o.id);
+            ELSE
+                INSERT INTO catalog_changes (version, university_id) SELECT new_version, id FROM changed_rows;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    _universities_triggers("log_catalog_changes", "OLD TABLE AS old_rows NEW TABLE AS changed_rows")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _universities_triggers("bump_catalog_version", "NEW TABLE AS changed_rows")
+    op.execute("DROP FUNCTION log_catalog_changes()")
+    op.drop_column('catalog_version', 'changes_from')
+    op.drop_table('catalog_changes')
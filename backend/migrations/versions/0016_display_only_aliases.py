@@ -0,0 +1,42 @@
+"""display-only aliases
+
+Short forms that several universities share, like "NTU" (Nanyang Technological
+or National Taiwan University) and "UCD" (University College Dublin or UC
+Davis), must not merge listings by key. university_aliases.display_only keeps
+such aliases as names without using them as merge keys. The seeded NTU, UCD,
+UCL and ETH aliases become display-only.
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19 20:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0016'
+down_revision: Union[str, Sequence[str], None] = '0015'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Keys (university_names.name_key) of the ambiguous acronyms seeded by 0013
+AMBIGUOUS = ["ntu", "ucd", "ucl", "eth"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('university_aliases', sa.Column('display_only', sa.Boolean(), server_default=sa.false(), nullable=False))
+    # Bumps catalog_version through the 0013 triggers, so snapshots drop the merge keys
+    op.execute(sa.text("UPDATE university_aliases SET display_only = true WHERE alias_key = ANY(:keys)").bindparams(
+        sa.bindparam("keys", AMBIGUOUS, type_=postgresql.ARRAY(sa.String))
+    ))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('university_aliases', 'display_only')
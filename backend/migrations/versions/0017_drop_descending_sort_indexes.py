@@ -0,0 +1,35 @@
+"""drop descending sort indexes
+
+The (column DESC NULLS LAST, id DESC) indexes from 0004 never matched the
+listing's descending sorts, which order by column DESC, id DESC (NULLS FIRST) and
+are served by backward scans of the ascending (column, id) indexes. They only
+added write cost to every import and sync.
+
+Revision ID: 0017
+Revises: 0016
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0017'
+down_revision: Union[str, Sequence[str], None] = '0016'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_universities_acceptance_rate_desc_id', table_name='universities')
+    op.drop_index('ix_universities_tuition_fee_desc_id', table_name='universities')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_universities_tuition_fee_desc_id', 'universities', [sa.text('tuition_fee DESC NULLS LAST'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_universities_acceptance_rate_desc_id', 'universities', [sa.text('acceptance_rate DESC NULLS LAST'), sa.text('id DESC')], unique=False)
@@ -0,0 +1,82 @@
+"""placeholder universities
+
+universities.placeholder marks the rows university_identity.py creates when a
+user first picks a registry university. They only give the pick an id, so
+inserting one no longer bumps catalog_version: a first-time external pick used
+to make every worker reload its snapshot, re-sync similarity and refresh
+recommendations. Snapshots leave placeholders out. Updates and deletes still
+count, and an update that clears the flag is logged as a change. Existing
+placeholders are found by their mapping and generated description.
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-19 21:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0018'
+down_revision: Union[str, Sequence[str], None] = '0017'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCORED_COLUMNS = ("country", "country_code", "degree_type", "tuition_fee", "acceptance_rate", "ranking")
+
+def _log_catalog_changes(inserted: str, scored_columns: Sequence[str]) -> str:
+    # log_catalog_changes() from 0015; `inserted` filters the rows an INSERT counts
+    scored = " OR ".join(f"o.{c} IS DISTINCT FROM n.{c}" for c in scored_columns)
+    return f"""
+        CREATE OR REPLACE FUNCTION log_catalog_changes() RETURNS trigger AS $$
+        DECLARE
+            new_version BIGINT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                UPDATE catalog_version SET version = version + 1, changes_from = version + 1, updated_at = now() WHERE id = 1;
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                IF NOT EXISTS (SELECT 1 FROM changed_rows WHERE {inserted}) THEN
+                    RETURN NULL;
+                END IF;
+            ELSIF NOT EXISTS (SELECT 1 FROM changed_rows) THEN
+                RETURN NULL;
+            END IF;
+            UPDATE catalog_version SET version = version + 1, updated_at = now() WHERE id = 1
+            RETURNING version INTO new_version;
+            IF TG_OP = 'UPDATE' THEN
+                INSERT INTO catalog_changes (version, university_id)
+                SELECT new_version, n.id FROM changed_rows n LEFT JOIN old_rows o ON o.id = n.id
+                WHERE o.id IS NULL OR {scored}
+                UNION
+                SELECT new_version, o.id FROM old_rows o WHERE NOT EXISTS (SELECT 1 FROM changed_rows n WHERE n.id = o.id);
+            ELSIF TG_OP = 'INSERT' THEN
+                INSERT INTO catalog_changes (version, university_id) SELECT new_version, id FROM changed_rows WHERE {inserted};
+            ELSE
+                INSERT INTO catalog_changes (version, university_id) SELECT new_version, id FROM changed_rows;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('universities', sa.Column('placeholder', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.execute("""
+        UPDATE universities u SET placeholder = true
+        FROM external_university_ids e
+        WHERE e.university_id = u.id AND u.description = 'Automated entry for ' || u.name
+    """)
+    op.execute(_log_catalog_changes("NOT placeholder", SCORED_COLUMNS + ("placeholder",)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(_log_catalog_changes("true", SCORED_COLUMNS))
+    op.drop_column('universities', 'placeholder')
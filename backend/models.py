@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Computed, Integer, SmallInteger, String, Float, Boolean, DateTime, ForeignKey, Text, Index, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from datetime import datetime
 from database import Base
 
@@ -12,6 +13,10 @@ class User(Base):
     hashed_password = Column(String, nullable=True)
     google_id = Column(String, unique=True, index=True, nullable=True)
     profile_complete = Column(Boolean, default=False)
+    # Maintained by database triggers on onboarding and the shortlisted/locked tables (migration 0007)
+    stage = Column(SmallInteger, nullable=False, server_default="0")
+    shortlisted_count = Column(Integer, nullable=False, server_default="0")
+    locked_count = Column(Integer, nullable=False, server_default="0")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -38,6 +43,8 @@ class Onboarding(Base):
     field_of_study = Column(String)
     target_intake_year = Column(Integer)
     preferred_countries = Column(String)  # Comma-separated
+    # ISO codes of the recognised preferred countries, set by a trigger (countries.py)
+    preferred_country_codes = Column(ARRAY(String(2)))
     
     # Budget
     budget_per_year = Column(Float)
@@ -50,23 +57,49 @@ class Onboarding(Base):
     gre_gmat_score = Column(Float, nullable=True)
     sop_status = Column(String)  # Not started, Draft, Ready
     
+    # Catalog version the user's recommendations were ranked against; NULL when stale
+    recommendations_version = Column(BigInteger, nullable=True)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     user = relationship("User", back_populates="onboarding")
 
+# Weighted full-text document for catalog search: name outranks field, field outranks description
+UNIVERSITY_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(field_of_study, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
 class University(Base):
     __tablename__ = "universities"
+    __table_args__ = (
+        Index("ix_universities_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_universities_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        # Keyset pagination for the catalog listing's sorts, scanned backward for descending ones
+        Index("ix_universities_ranking_id", "ranking", "id"),
+        Index("ix_universities_tuition_fee_id", "tuition_fee", "id"),
+        Index("ix_universities_acceptance_rate_id", "acceptance_rate", "id"),
+        Index("ix_universities_field_of_study_trgm", "field_of_study", postgresql_using="gin", postgresql_ops={"field_of_study": "gin_trgm_ops"}),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False, index=True)
+    name = Column(String, nullable=False, unique=True, index=True)
     country = Column(String, nullable=False, index=True)
-    degree_type = Column(String)  # Bachelor's, Master's, MBA, PhD
+    # ISO code of `country`, set by a trigger from country_aliases (countries.py); NULL when unrecognised
+    country_code = Column(String(2), ForeignKey("countries.code"), index=True)
+    degree_type = Column(String, index=True)  # Bachelor's, Master's, MBA, PhD
     field_of_study = Column(String)
     tuition_fee = Column(Float)
     acceptance_rate = Column(Float)
     ranking = Column(Integer)
     description = Column(Text)
+    # Created for a user's pick of a registry university (university_identity.py); carries
+    # placeholder data, so it is neither a catalog change nor part of the catalog snapshot
+    placeholder = Column(Boolean, nullable=False, default=False)
+    # Maintained by Postgres; deferred so ordinary loads don't fetch it
+    search_vector = deferred(Column(TSVECTOR, Computed(UNIVERSITY_SEARCH_VECTOR, persisted=True)))
     
     shortlisted_by = relationship("ShortlistedUniversity", back_populates="university")
     locked_by = relationship("LockedUniversity", back_populates="university")
@@ -74,6 +107,9 @@ class University(Base):
 
 class ShortlistedUniversity(Base):
     __tablename__ = "shortlisted_universities"
+    __table_args__ = (
+        UniqueConstraint("user_id", "university_id", name="uq_shortlisted_universities_user_university"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -85,6 +121,9 @@ class ShortlistedUniversity(Base):
 
 class LockedUniversity(Base):
     __tablename__ = "locked_universities"
+    __table_args__ = (
+        UniqueConstraint("user_id", "university_id", name="uq_locked_universities_user_university"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -96,10 +135,22 @@ class LockedUniversity(Base):
 
 class Todo(Base):
     __tablename__ = "todos"
+    __table_args__ = (
+        # Serves the per-user listing ordered by created_at desc (scanned backwards)
+        Index("ix_todos_user_id_created_at", "user_id", "created_at"),
+        # Auto-completion: a user's open tasks of one kind
+        Index("ix_todos_user_id_kind_completed", "user_id", "kind", "completed", postgresql_where=text("kind IS NOT NULL")),
+        # One todo per requirement of a locked university; the ON CONFLICT target of materialize_requirements
+        Index("uq_todos_user_source_ref_kind", "user_id", "source_ref", "kind", unique=True, postgresql_where=text("source_ref LIKE 'lock:%'")),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     university_id = Column(Integer, ForeignKey("universities.id"), nullable=True)
+    # services.py kinds (sop, test_scores, ...); None for free-form tasks
+    kind = Column(String(32), nullable=True)
+    # What created the task, e.g. "lock:<university id>" or "ai_counsellor"
+    source_ref = Column(String(64), nullable=True)
     title = Column(String, nullable=False)
     description = Column(Text)
     completed = Column(Boolean, default=False)
@@ -111,6 +162,9 @@ class Todo(Base):
 
 class ApplicationDocument(Base):
     __tablename__ = "application_documents"
+    __table_args__ = (
+        UniqueConstraint("user_id", "university_id", "name", name="uq_application_documents_user_university_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -122,3 +176,128 @@ class ApplicationDocument(Base):
 
     user = relationship("User", back_populates="application_documents")
     university = relationship("University")
+
+class CatalogVersion(Base):
+    """Single row (id=1) bumped by triggers on every change to universities (migration 0005, logged since 0015), university_aliases (0013) or country_aliases (0014)"""
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # catalog_changes holds every university change with a version above this (migration 0015)
+    changes_from = Column(BigInteger, nullable=False, default=0)
+
+class CatalogChange(Base):
+    """A university whose scored fields changed (or which was added or removed) in a catalog version"""
+    __tablename__ = "catalog_changes"
+
+    version = Column(BigInteger, primary_key=True)
+    university_id = Column(Integer, primary_key=True)
+
+class Country(Base):
+    """ISO 3166-1 country (migration 0014)"""
+    __tablename__ = "countries"
+
+    code = Column(String(2), primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+class CountryAlias(Base):
+    """A spelling of a country, keyed by countries.country_key"""
+    __tablename__ = "country_aliases"
+
+    alias_key = Column(String, primary_key=True)
+    alias = Column(String, nullable=False)
+    code = Column(String(2), ForeignKey("countries.code", ondelete="CASCADE"), nullable=False)
+
+class UniversityAlias(Base):
+    """Another name for a university, e.g. "UC Berkeley", keyed as in university_names.py"""
+    __tablename__ = "university_aliases"
+
+    alias_key = Column(String, primary_key=True)
+    alias = Column(String, nullable=False)
+    # Key and spelling of the name it stands for
+    canonical_key = Column(String, nullable=False)
+    canonical_name = Column(String, nullable=False)
+    # Ambiguous short forms (e.g. "NTU") name the university without merging anything by key
+    display_only = Column(Boolean, nullable=False, default=False)
+
+class ExternalUniversityCache(Base):
+    """Cached Hipolabs registry results per normalized (country, name) query (external_universities.py)"""
+    __tablename__ = "external_university_cache"
+
+    key = Column(String, primary_key=True)
+    country = Column(String, nullable=True)
+    name = Column(String, nullable=True)
+    results = Column(JSONB, nullable=False)
+    # ok, empty or error
+    status = Column(String(8), nullable=False)
+    fetched_at = Column(DateTime, nullable=False)
+    fresh_until = Column(DateTime, nullable=False)
+    stale_until = Column(DateTime, nullable=False, index=True)
+
+class ExternalUniversity(Base):
+    """Local mirror of the Hipolabs university registry, kept in sync by registry_sync.py"""
+    __tablename__ = "external_universities"
+    __table_args__ = (
+        # The registry's natural key; also serves country equality filters
+        UniqueConstraint("normalized_country", "normalized_name", name="uq_external_universities_country_name"),
+        # Substring name search
+        Index("ix_external_universities_normalized_name_trgm", "normalized_name", postgresql_using="gin", postgresql_ops={"normalized_name": "gin_trgm_ops"}),
+        Index("ix_external_universities_domains", "domains", postgresql_using="gin"),
+        # Country code equality filters, already in name order
+        Index("ix_external_universities_code_name", "alpha_two_code", "normalized_name"),
+        # Country of an external university picked by name alone
+        Index("ix_external_universities_normalized_name", "normalized_name"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    normalized_name = Column(String, nullable=False)
+    country = Column(String, nullable=True)
+    normalized_country = Column(String, nullable=False)
+    alpha_two_code = Column(String(2), nullable=True)
+    state_province = Column(String, nullable=True)
+    domains = Column(ARRAY(String), nullable=False)
+    web_pages = Column(ARRAY(String), nullable=False)
+    synced_at = Column(DateTime, nullable=False)
+
+class ExternalUniversityId(Base):
+    """The local university an "ext:<name>" id stands for, keyed by its normalized name (university_identity.py)"""
+    __tablename__ = "external_university_ids"
+
+    key = Column(String, primary_key=True)
+    # As first seen
+    name = Column(String, nullable=False)
+    university_id = Column(Integer, ForeignKey("universities.id", ondelete="CASCADE"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class RegistrySync(Base):
+    """Last sync of the registry mirror from each source, for conditional downloads"""
+    __tablename__ = "registry_sync"
+
+    source = Column(String, primary_key=True)
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True)
+    sha256 = Column(String(64), nullable=False)
+    row_count = Column(Integer, nullable=False)
+    synced_at = Column(DateTime, nullable=False)
+    checked_at = Column(DateTime, nullable=False)
+
+class UserRecommendation(Base):
+    """A user's precomputed best-fitting programs, refreshed by recommendations.py"""
+    __tablename__ = "user_recommendations"
+    __table_args__ = (
+        UniqueConstraint("user_id", "university_id", name="uq_user_recommendations_user_university"),
+        # One user's ranking, best first
+        Index("ix_user_recommendations_user_id_score", "user_id", text("score DESC"), "university_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # Cascades in the database, so deleting a user or program never loads these rows
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    university_id = Column(Integer, ForeignKey("universities.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)
+    category = Column(String, nullable=False)  # Dream, Target, Safe
+    acceptance_chance = Column(String, nullable=False)  # Low, Medium, High
+    why_fits = Column(String)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,192 @@
+"""
+Shared outbound HTTP for the registry API, the LLM providers and Google sign-in.
+
+Each upstream host gets one httpx.AsyncClient for the life of the process, so
+calls reuse keep-alive connections from that host's own pool, over HTTP/2 when
+the optional h2 package is installed. Per host there is also:
+- a retry budget: failed calls are retried with full-jitter exponential backoff,
+  but retries can be at most HTTP_RETRY_BUDGET_RATIO of recent calls, so they
+  never multiply the load on a host that is already struggling
+- a circuit breaker: after HTTP_BREAKER_FAILURES consecutive failures, calls fail
+  at once with CircuitOpenError for HTTP_BREAKER_RESET_SECONDS, then one trial
+  call decides whether the host is back
+- request, error and latency metrics, served by GET /api/health/http
+"""
+import asyncio
+import bisect
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401 (httpx negotiates HTTP/2 only when it is installed)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP_RETRY_BUDGET_RATIO = float(os.getenv("HTTP_RETRY_BUDGET_RATIO", "0.2"))
+HTTP_BREAKER_FAILURES = int(os.getenv("HTTP_BREAKER_FAILURES", "5"))
+HTTP_BREAKER_RESET_SECONDS = float(os.getenv("HTTP_BREAKER_RESET_SECONDS", "30"))
+# Backoff before retry n is uniform in [0, min(cap, base * 2^n)]
+RETRY_BACKOFF_BASE_SECONDS = 0.1
+RETRY_BACKOFF_CAP_SECONDS = 2.0
+# Retries a host can bank while idle, so a quiet host still gets a few
+RETRY_BUDGET_MAX_TOKENS = 10.0
+# Upstream answers that mean "try again", and that count against the breaker
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """The host's circuit breaker is open; no request was sent"""
+
+class HostState:
+    """Connection pool, retry budget, circuit breaker and metrics of one upstream host"""
+
+    # Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+    BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self, host: str):
+        self.host = host
+        self.client: Optional[httpx.AsyncClient] = None
+        self.loop = None
+        self.retry_tokens = RETRY_BUDGET_MAX_TOKENS
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.retries_denied = 0
+        self.short_circuited = 0
+        self.latency_ms_sum = 0.0
+        self.latency_ms_max = 0.0
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def get_client(self) -> httpx.AsyncClient:
+        # A client is tied to the event loop it was first used on (scripts may run several)
+        loop = asyncio.get_running_loop()
+        if self.client is None or self.loop is not loop:
+            self.client = httpx.AsyncClient(
+                http2=HTTP2,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+                    keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+                ),
+                headers={"User-Agent": "AI-Counsellor-App/1.0"},
+            )
+            self.loop = loop
+        return self.client
+
+    @property
+    def state(self) -> str:
+        if self.open_until == 0.0:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half_open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in half-open state only one trial at a time"""
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            self.short_circuited += 1
+            return False
+        if state == "half_open":
+            self.trial_in_flight = True
+        return True
+
+    def record(self, elapsed_ms: float, failed: bool):
+        self.requests += 1
+        self.latency_ms_sum += elapsed_ms
+        self.latency_ms_max = max(self.latency_ms_max, elapsed_ms)
+        self.bucket_counts[bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+        self.retry_tokens = min(RETRY_BUDGET_MAX_TOKENS, self.retry_tokens + HTTP_RETRY_BUDGET_RATIO)
+        self.trial_in_flight = False
+        if not failed:
+            self.consecutive_failures = 0
+            self.open_until = 0.0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        # A failed trial re-opens at once; otherwise open after enough failures in a row
+        if self.open_until or self.consecutive_failures >= HTTP_BREAKER_FAILURES:
+            self.open_until = time.monotonic() + HTTP_BREAKER_RESET_SECONDS
+            print(f"Circuit open for {self.host} after {self.consecutive_failures} failures")
+
+    def take_retry(self) -> bool:
+        if self.retry_tokens < 1:
+            self.retries_denied += 1
+            return False
+        self.retry_tokens -= 1
+        self.retries += 1
+        return True
+
+    def snapshot(self) -> dict:
+        histogram = {f"le_{bound}ms": count for bound, count in zip(self.BUCKETS_MS, self.bucket_counts)}
+        histogram["le_inf"] = self.bucket_counts[-1]
+        return {
+            "circuit": self.state,
+            "requests": self.requests,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "retries": self.retries,
+            "retries_denied": self.retries_denied,
+            "short_circuited": self.short_circuited,
+            "latency_ms_avg": round(self.latency_ms_sum / self.requests, 3) if self.requests else 0.0,
+            "latency_ms_max": round(self.latency_ms_max, 3),
+            "latency_ms_histogram": histogram,
+        }
+
+_hosts: Dict[str, HostState] = {}
+
+def host_state(url: str) -> HostState:
+    host = httpx.URL(url).netloc.decode("ascii")
+    if host not in _hosts:
+        _hosts[host] = HostState(host)
+    return _hosts[host]
+
+async def request(method: str, url: str, *, retries: int = 0, timeout: float = 10.0, stream: bool = False, **kwargs) -> httpx.Response:
+    """Send a request through the host's shared client.
+
+    Up to `retries` extra attempts on connection errors, timeouts and 429/502/503/504,
+    as the host's retry budget allows; only pass retries for calls that are safe to
+    repeat. Returns the last response, whatever its status. Raises CircuitOpenError
+    when the host's breaker is open, or the last httpx error.
+
+    With `stream`, the response is returned once its headers arrive and the caller
+    reads the body and must aclose() it; latency is then measured to the headers.
+    """
+    host = host_state(url)
+    attempt = 0
+    while True:
+        if not host.allow():
+            raise CircuitOpenError(f"{host.host} is unavailable (circuit open)")
+        started = time.perf_counter()
+        try:
+            client = host.get_client()
+            response = await client.send(client.build_request(method, url, timeout=timeout, **kwargs), stream=stream)
+            error = None
+        except httpx.HTTPError as e:
+            response, error = None, e
+        except BaseException:
+            # Cancelled: no verdict on the host, but the next call may be the trial
+            host.trial_in_flight = False
+            raise
+        failed = error is not None or response.status_code in RETRYABLE_STATUSES or response.status_code >= 500
+        host.record((time.perf_counter() - started) * 1000, failed)
+        retryable = isinstance(error, httpx.TransportError) or (response is not None and response.status_code in RETRYABLE_STATUSES)
+        if not retryable or attempt >= retries or not host.take_retry():
+            if error is not None:
+                raise error
+            return response
+        if stream and response is not None:
+            await response.aclose()
+        await asyncio.sleep(random.uniform(0, min(RETRY_BACKOFF_CAP_SECONDS, RETRY_BACKOFF_BASE_SECONDS * 2 ** attempt)))
+        attempt += 1
+
+def http_status() -> dict:
+    """Outbound HTTP telemetry per upstream host for this worker"""
+    return {"http2": HTTP2, "hosts": {host: state.snapshot() for host, state in _hosts.items()}}
@@ -0,0 +1,78 @@
+import bisect
+import threading
+import time
+
+class PoolMetrics:
+    """Checkout telemetry for one connection pool: live waiters and a latency histogram"""
+
+    # Upper bounds (ms) of the checkout latency histogram buckets; the last bucket is open-ended
+    BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self.waiters = 0
+        self.checkouts = 0
+        self.checkout_ms_sum = 0.0
+        self.checkout_ms_max = 0.0
+        self.failures = 0
+        self.bucket_counts = [0] * (len(self.BUCKETS_MS) + 1)
+
+    def start_wait(self):
+        with self._lock:
+            self.waiters += 1
+
+    def end_wait(self, elapsed_ms: float, failed: bool = False):
+        with self._lock:
+            self.waiters -= 1
+            if failed:
+                # Pool timeout or connect error: nothing was handed out
+                self.failures += 1
+                return
+            self.checkouts += 1
+            self.checkout_ms_sum += elapsed_ms
+            self.checkout_ms_max = max(self.checkout_ms_max, elapsed_ms)
+            self.bucket_counts[bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            histogram = {f"le_{bound}ms": count for bound, count in zip(self.BUCKETS_MS, self.bucket_counts)}
+            histogram["le_inf"] = self.bucket_counts[-1]
+            return {
+                "pool": type(pool).__name__ if pool is not None else None,
+                "size": pool.size() if hasattr(pool, "size") else 0,
+                "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else 0,
+                "overflow": pool.overflow() if hasattr(pool, "overflow") else 0,
+                "waiters": self.waiters,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.failures,
+                "checkout_ms_avg": round(self.checkout_ms_sum / self.checkouts, 3) if self.checkouts else 0.0,
+                "checkout_ms_max": round(self.checkout_ms_max, 3),
+                "checkout_ms_histogram": histogram,
+            }
+
+class _TimedCheckoutMixin:
+    """Times every checkout, including the time spent queued behind an exhausted pool"""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        self.metrics.pool = self
+        self.metrics.start_wait()
+        start = time.perf_counter()
+        failed = True
+        try:
+            connection = super()._do_get()
+            failed = False
+            return connection
+        finally:
+            self.metrics.end_wait((time.perf_counter() - start) * 1000, failed)
+
+def instrumented_pool_class(base, metrics: PoolMetrics):
+    """Subclass a SQLAlchemy pool class so its checkouts report into `metrics`.
+
+    The metrics live on the class, so they survive pool.recreate() (engine.dispose()).
+    """
+    return type(f"Instrumented{base.__name__}", (_TimedCheckoutMixin, base), {"metrics": metrics})
@@ -0,0 +1,79 @@
+"""
+Per-request SQL statement budgets.
+
+Every statement run on the app's engines is counted against the request that
+issued it. Endpoints declare how many statements one request may run with
+@query_budget(n). A request over budget is logged, or fails with a 500 listing its
+statements when QUERY_BUDGET_STRICT=true (development and the tests),
+so a per-row query loop creeping into an endpoint shows up the first time it runs.
+Per-worker cache fills (the catalog snapshot) and background work a request starts
+run uncounted. tests/test_query_budgets.py checks every endpoint in strict mode.
+"""
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+
+from database import async_engine, engine, read_engine
+
+QUERY_BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "false").lower() == "true"
+
+class QueryCounter:
+    __slots__ = ("count", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.statements: List[str] = []
+
+_current: ContextVar[Optional[QueryCounter]] = ContextVar("query_counter", default=None)
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = _current.get()
+    if counter is not None:
+        counter.count += 1
+        if QUERY_BUDGET_STRICT:
+            counter.statements.append(" ".join(statement.split())[:200])
+
+for _engine in (engine, async_engine, read_engine):
+    if _engine is not None:
+        event.listen(getattr(_engine, "sync_engine", _engine), "before_cursor_execute", _count_statement)
+
+@contextmanager
+def uncounted():
+    """Leave statements run inside (and tasks created inside) out of the current request's count"""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def query_budget(limit: int):
+    """Declare the most SQL statements one request to the decorated endpoint may run"""
+    def declare(endpoint):
+        endpoint.query_budget = limit
+        return endpoint
+    return declare
+
+async def enforce_query_budgets(request: Request, call_next):
+    """HTTP middleware: count the request's statements and check the endpoint's budget"""
+    counter = QueryCounter()
+    token = _current.set(counter)
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+
+    # The router records the matched endpoint in the (shared) scope
+    budget = getattr(request.scope.get("endpoint"), "query_budget", None)
+    if budget is not None and counter.count > budget:
+        message = f"{request.method} {request.url.path} ran {counter.count} SQL statements, over its budget of {budget}"
+        if QUERY_BUDGET_STRICT:
+            return JSONResponse(status_code=500, content={"detail": message, "statements": counter.statements})
+        print(f"WARNING: {message}")
+    if QUERY_BUDGET_STRICT:
+        response.headers["X-Query-Count"] = str(counter.count)
+    return response
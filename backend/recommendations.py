@@ -0,0 +1,210 @@
+"""
+Precomputed per-user recommendations.
+
+Each onboarded user's best-fitting programs (fit_scoring over the whole catalog)
+are stored in user_recommendations, so listings and the AI counsellor read a
+ranking with one indexed query instead of re-scoring on every visit.
+
+A user's rows are ranked in full in the background when they save their profile.
+When the catalog changes, one worker at a time (an advisory lock) brings every
+user up to date incrementally: the universities changed since a user's version
+(catalog_changes, migration 0015) are scored against their profile and merged
+into the stored top k. Users no changed row could affect are fast-forwarded in
+one statement, and a full re-rank happens only when a stored row dropped out and
+the next best is unknown. Stale users are claimed with SKIP LOCKED, and only rows
+whose score or labels actually changed are written.
+"""
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog_snapshot import CatalogSnapshot, get_catalog, on_catalog_change
+from database import background_session
+from fit_scoring import CatalogFeatures, catalog_features, fit_labels, score_catalog, top_k
+from models import CatalogChange, CatalogVersion, Onboarding, UserRecommendation
+
+RECOMMENDATIONS_PER_USER = int(os.getenv("RECOMMENDATIONS_PER_USER", "100"))
+# Users ranked per transaction
+REFRESH_BATCH_SIZE = 50
+# Past this share of the catalog changed, ranking from scratch costs no more than merging
+INCREMENTAL_MAX_SHARE = 0.25
+# Any constant shared by every worker; keeps the catalog-wide refresh in one worker at a time
+REFRESH_LOCK_KEY = 74202
+
+Stored = Dict[int, tuple]  # university_id -> (score, category, acceptance_chance, why_fits)
+
+def _ranked(features: CatalogFeatures, scores, positions) -> List[dict]:
+    return [
+        {"university_id": int(features.ids[p]), "score": round(float(scores.score[p]), 6), **fit_labels(features, scores, p)}
+        for p in positions
+    ]
+
+def rank_for_profile(catalog: CatalogSnapshot, profile: Onboarding, k: int = RECOMMENDATIONS_PER_USER, mask=None) -> List[dict]:
+    """The k best-fitting programs for `profile`, best first"""
+    features = catalog_features(catalog)
+    scores = score_catalog(features, profile)
+    return _ranked(features, scores, top_k(scores, k, mask))
+
+def merge_changes(catalog: CatalogSnapshot, profile: Onboarding, stored: Stored, changed: Set[int], k: int = RECOMMENDATIONS_PER_USER) -> Optional[List[dict]]:
+    """The stored top k with the `changed` universities re-scored, best first.
+
+    None when that can't be trusted: a stored row dropped out (or k grew) and the
+    next best, an unchanged row outside the stored top k, is unknown.
+    """
+    features = CatalogFeatures(catalog.by_id[i] for i in changed if i in catalog.by_id)
+    rescored = _ranked(features, score_catalog(features, profile), range(len(features)))
+    kept = [
+        {"university_id": i, "score": score, "category": category, "acceptance_chance": chance, "why_fits": why}
+        for i, (score, category, chance, why) in stored.items() if i not in changed
+    ]
+    rank = lambda row: (-row["score"], row["university_id"])
+    ranked = sorted(kept + rescored, key=rank)[:k]
+    if len(catalog) > len(kept) + len(rescored):
+        # Unseen rows rank below the old last stored row; they stay out only if k rows still rank above it
+        last = max(((-score, i) for i, (score, *_) in stored.items()), default=None)
+        if len(stored) < k or len(ranked) < k or rank(ranked[-1]) > last:
+            return None
+    return ranked
+
+async def _stored(db: AsyncSession, user_ids: List[int]) -> Dict[int, Stored]:
+    stored = {user_id: {} for user_id in user_ids}
+    for row in (await db.execute(
+        select(UserRecommendation.user_id, UserRecommendation.university_id, UserRecommendation.score,
+               UserRecommendation.category, UserRecommendation.acceptance_chance, UserRecommendation.why_fits)
+        .where(UserRecommendation.user_id.in_(user_ids))
+    )).all():
+        stored[row.user_id][row.university_id] = (row.score, row.category, row.acceptance_chance, row.why_fits)
+    return stored
+
+async def _changes(db: AsyncSession, profiles: List[Onboarding], version: int) -> Dict[int, Optional[Set[int]]]:
+    """Universities changed since each user's version; None where the log doesn't reach back that far"""
+    changes_from = await db.scalar(select(CatalogVersion.changes_from).where(CatalogVersion.id == 1)) or 0
+    since = [p.recommendations_version for p in profiles if p.recommendations_version is not None and p.recommendations_version >= changes_from]
+    log = (await db.execute(
+        select(CatalogChange.version, CatalogChange.university_id)
+        .where(CatalogChange.version > min(since), CatalogChange.version <= version)
+    )).all() if since else []
+    return {
+        p.user_id: {university_id for v, university_id in log if v > p.recommendations_version}
+        if p.recommendations_version is not None and p.recommendations_version >= changes_from else None
+        for p in profiles
+    }
+
+def _rank(catalog: CatalogSnapshot, profile: Onboarding, stored: Stored, changed: Optional[Set[int]]) -> List[dict]:
+    if changed is not None and len(changed) <= INCREMENTAL_MAX_SHARE * len(catalog):
+        merged = merge_changes(catalog, profile, stored, changed)
+        if merged is not None:
+            return merged
+    return rank_for_profile(catalog, profile)
+
+async def _fast_forward(db: AsyncSession, version: int) -> int:
+    """Move users no logged change touched since their version straight to `version`"""
+    result = await db.execute(
+        update(Onboarding)
+        .where(
+            Onboarding.recommendations_version < version,
+            Onboarding.recommendations_version >= select(CatalogVersion.changes_from).where(CatalogVersion.id == 1).scalar_subquery(),
+            ~exists().where(CatalogChange.version > Onboarding.recommendations_version, CatalogChange.version <= version),
+        )
+        .values(recommendations_version=version, updated_at=Onboarding.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+async def _prune_changes(db: AsyncSession, version: int):
+    # Every ranked user is at or past the oldest version; nothing up to it is needed again
+    floor = func.coalesce(select(func.min(Onboarding.recommendations_version)).scalar_subquery(), version)
+    await db.execute(delete(CatalogChange).where(CatalogChange.version <= floor))
+    await db.execute(update(CatalogVersion).where(CatalogVersion.id == 1).values(changes_from=func.greatest(CatalogVersion.changes_from, floor)))
+
+async def _store(db: AsyncSession, user_id: int, ranked: List[dict], stored: Stored) -> int:
+    # Diff against what is stored and write only new, changed or dropped rows
+    changed = [
+        {"user_id": user_id, **row} for row in ranked
+        if stored.get(row["university_id"]) != (row["score"], row["category"], row["acceptance_chance"], row["why_fits"])
+    ]
+    gone = set(stored) - {row["university_id"] for row in ranked}
+    if changed:
+        statement = pg_insert(UserRecommendation)
+        await db.execute(statement.on_conflict_do_update(
+            index_elements=["user_id", "university_id"],
+            set_={c: statement.excluded[c] for c in ("score", "category", "acceptance_chance", "why_fits", "updated_at")},
+        ), changed)
+    if gone:
+        await db.execute(delete(UserRecommendation).where(
+            UserRecommendation.user_id == user_id, UserRecommendation.university_id.in_(gone)
+        ))
+    return len(changed) + len(gone)
+
+async def refresh_recommendations(user_id: Optional[int] = None) -> int:
+    """Re-rank stale users (or just `user_id`) in batches; returns how many were refreshed.
+
+    The catalog-wide run (no `user_id`) skips out when another worker holds the lock.
+    """
+    refreshed = written = skipped = 0
+    fast_forwarded_to = None
+    started = time.perf_counter()
+    try:
+        while True:
+            async with background_session() as db:
+                if user_id is None and not await db.scalar(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_KEY))):
+                    break
+                catalog = await get_catalog(db)
+                if user_id is None and fast_forwarded_to != catalog.version:
+                    skipped += await _fast_forward(db, catalog.version)
+                    fast_forwarded_to = catalog.version
+                query = (
+                    select(Onboarding)
+                    .where(or_(Onboarding.recommendations_version.is_(None), Onboarding.recommendations_version < catalog.version))
+                    .order_by(Onboarding.user_id)
+                    .limit(REFRESH_BATCH_SIZE)
+                    .with_for_update(skip_locked=True)
+                )
+                if user_id is not None:
+                    # A saved profile is ranked from scratch
+                    query = query.where(Onboarding.user_id == user_id)
+                profiles = (await db.scalars(query)).all()
+                if not profiles:
+                    if user_id is None:
+                        await _prune_changes(db, catalog.version)
+                        await db.commit()
+                    break
+                stored = await _stored(db, [p.user_id for p in profiles])
+                changes = await _changes(db, profiles, catalog.version) if user_id is None else {}
+                # Scoring is NumPy work; run it off the event loop
+                rankings = await asyncio.to_thread(lambda: [
+                    _rank(catalog, p, stored[p.user_id], changes.get(p.user_id)) for p in profiles
+                ])
+                for profile, ranked in zip(profiles, rankings):
+                    written += await _store(db, profile.user_id, ranked, stored[profile.user_id])
+                await db.execute(
+                    update(Onboarding)
+                    .where(Onboarding.user_id.in_([p.user_id for p in profiles]))
+                    # Keep updated_at meaning "the user edited their profile"
+                    .values(recommendations_version=catalog.version, updated_at=Onboarding.updated_at)
+                )
+                await db.commit()
+                refreshed += len(profiles)
+    except Exception as e:
+        print(f"Recommendation refresh failed after {refreshed} users: {e}")
+    if refreshed or skipped:
+        unaffected = f", {skipped} unaffected users fast-forwarded" if skipped else ""
+        print(f"Refreshed recommendations for {refreshed} users ({written} rows written{unaffected}) in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return refreshed
+
+async def stored_recommendations(db: AsyncSession, user_id: int, limit: int) -> List[UserRecommendation]:
+    """The user's precomputed ranking, best first (one index range scan)"""
+    return list((await db.scalars(
+        select(UserRecommendation)
+        .where(UserRecommendation.user_id == user_id)
+        .order_by(UserRecommendation.score.desc(), UserRecommendation.university_id)
+        .limit(limit)
+    )).all())
+
+# Every worker notices catalog changes; the advisory lock lets one of them run the refresh
+on_catalog_change(refresh_recommendations)
@@ -0,0 +1,206 @@
+"""
+Sync of the local external_universities mirror with the Hipolabs registry dataset.
+
+Downloads the registry's full JSON dataset (REGISTRY_DATASET_URL, or a local file
+or stand-in server given with --source), normalizes every entry's name, country and
+domains, and applies only the differences: new entries are inserted, changed ones
+updated and removed ones deleted, in one transaction that opens only once the
+download is parsed. An unchanged download (HTTP 304, or the same SHA-256 as last
+time) costs no writes at all:
+    python manage.py sync-registry
+    python manage.py sync-registry --source ./world_universities_and_domains.json
+    python manage.py sync-registry --every 86400   # scheduled: sync now, then daily
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from countries import recode
+from database import engine
+from external_universities import normalize_domain, normalize_text
+from models import RegistrySync
+
+REGISTRY_DATASET_URL = os.getenv(
+    "REGISTRY_DATASET_URL",
+    "https://raw.githubusercontent.com/Hipo/university-domains-list/master/world_universities_and_domains.json",
+)
+DOWNLOAD_TIMEOUT_SECONDS = 60
+# Any constant shared by every process that syncs; keeps two syncs from interleaving
+SYNC_LOCK_KEY = 74201
+# A download with fewer rows than this share of the last sync is taken as truncated and not applied
+REGISTRY_MIN_ROW_RATIO = float(os.getenv("REGISTRY_MIN_ROW_RATIO", "0.5"))
+
+COLUMNS = ["name", "normalized_name", "country", "normalized_country", "alpha_two_code", "state_province", "domains", "web_pages"]
+
+def _is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+def download(source: str, previous: Optional[RegistrySync]) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+    """(body, etag, last_modified) of the dataset; no body when the server says it is unchanged"""
+    if not _is_url(source):
+        with open(source, "rb") as f:
+            return f.read(), None, None
+    headers = {"User-Agent": "AI-Counsellor-App/1.0"}
+    if previous and previous.etag:
+        headers["If-None-Match"] = previous.etag
+    if previous and previous.last_modified:
+        headers["If-Modified-Since"] = previous.last_modified
+    response = httpx.get(source, headers=headers, timeout=DOWNLOAD_TIMEOUT_SECONDS, follow_redirects=True)
+    if response.status_code == 304:
+        return None, previous.etag, previous.last_modified
+    response.raise_for_status()
+    return response.content, response.headers.get("etag"), response.headers.get("last-modified")
+
+def _unique(values) -> List[str]:
+    return list(dict.fromkeys(v for v in values if v))
+
+def registry_rows(entries: List[dict]) -> List[dict]:
+    """Normalized mirror rows, one per (country, name); duplicate entries are merged"""
+    rows: Dict[Tuple[str, str], dict] = {}
+    for entry in entries:
+        name = " ".join((entry.get("name") or "").split())
+        normalized_name = normalize_text(name)
+        if not normalized_name:
+            continue
+        country = entry.get("country") or None
+        key = (normalize_text(country), normalized_name)
+        domains = [normalize_domain(d) for d in entry.get("domains") or []]
+        web_pages = [w.strip() for w in entry.get("web_pages") or []]
+        if key in rows:
+            rows[key]["domains"] = _unique(rows[key]["domains"] + domains)
+            rows[key]["web_pages"] = _unique(rows[key]["web_pages"] + web_pages)
+            continue
+        rows[key] = {
+            "name": name,
+            "normalized_name": normalized_name,
+            "country": country,
+            "normalized_country": key[0],
+            "alpha_two_code": (entry.get("alpha_two_code") or "").upper()[:2] or None,
+            "state_province": entry.get("state-province") or None,
+            "domains": _unique(domains),
+            "web_pages": _unique(web_pages),
+        }
+    return list(rows.values())
+
+def _pg_array(values: List[str]) -> str:
+    # Array literal for COPY: every element quoted, so commas and braces are safe
+    return "{" + ",".join('"' + v.replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values) + "}"
+
+def apply_rows(conn, rows: List[dict]) -> Dict[str, int]:
+    """Make external_universities match `rows`; returns how many were inserted, updated and deleted"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            _pg_array(row[c]) if c in ("domains", "web_pages") else ("\\N" if row[c] is None else row[c])
+            for c in COLUMNS
+        ])
+    buffer.seek(0)
+
+    column_list = ", ".join(COLUMNS)
+    changed = " OR ".join(f"e.{c} IS DISTINCT FROM EXCLUDED.{c}" for c in COLUMNS)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in COLUMNS + ["synced_at"])
+    # psycopg2's COPY support, as in catalog_import
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE registry_staging ON COMMIT DROP "
+            f"AS SELECT {column_list} FROM external_universities WITH NO DATA"
+        )
+        cursor.copy_expert(f"COPY registry_staging ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        # Unchanged rows are skipped by the WHERE, so they are neither rewritten nor returned
+        cursor.execute(
+            f"INSERT INTO external_universities AS e ({column_list}, synced_at) "
+            f"SELECT {column_list}, now() AT TIME ZONE 'utc' FROM registry_staging "
+            f"ON CONFLICT (normalized_country, normalized_name) DO UPDATE SET {updates} WHERE {changed} "
+            f"RETURNING xmax = 0"
+        )
+        written = [inserted for (inserted,) in cursor.fetchall()]
+        cursor.execute(
+            "DELETE FROM external_universities e WHERE NOT EXISTS ("
+            "SELECT 1 FROM registry_staging s "
+            "WHERE s.normalized_country = e.normalized_country AND s.normalized_name = e.normalized_name)"
+        )
+        deleted = cursor.rowcount
+        # The registry's spellings of the countries it codes consistently become aliases of those codes
+        cursor.execute(
+            "INSERT INTO country_aliases (alias_key, alias, code) "
+            "SELECT country_key(country), min(country), min(alpha_two_code) FROM registry_staging "
+            "WHERE country IS NOT NULL AND alpha_two_code IN (SELECT code FROM countries) "
+            "GROUP BY country_key(country) HAVING count(DISTINCT alpha_two_code) = 1 "
+            "ON CONFLICT (alias_key) DO NOTHING RETURNING alias_key"
+        )
+        aliases = [alias_key for (alias_key,) in cursor.fetchall()]
+    finally:
+        cursor.close()
+    recode(conn, aliases)
+    inserted = sum(written)
+    return {"inserted": inserted, "updated": len(written) - inserted, "deleted": deleted, "country_aliases": len(aliases)}
+
+def sync_registry(source: Optional[str] = None, force: bool = False) -> Optional[Dict[str, int]]:
+    """Bring the mirror up to date with `source`; returns the changes, or None when it was skipped.
+
+    Applying a download deletes the rows it lacks, so an empty one is refused, and
+    so is one that shrank below REGISTRY_MIN_ROW_RATIO of the last sync unless `force`.
+    """
+    source = source or REGISTRY_DATASET_URL
+    started = time.perf_counter()
+    latest = select(RegistrySync).order_by(RegistrySync.synced_at.desc()).limit(1)
+    # Download and parse with no transaction open: a slow download holds no lock or connection
+    with engine.connect() as conn:
+        previous = conn.execute(latest).first()
+    # Validators only apply to a request for the same source
+    body, etag, last_modified = download(source, previous if previous and previous.source == source else None)
+    now = datetime.utcnow()
+    digest = hashlib.sha256(body).hexdigest() if body is not None else previous.sha256
+    state = {"source": source, "etag": etag, "last_modified": last_modified, "checked_at": now}
+    rows = registry_rows(json.loads(body)) if previous is None or digest != previous.sha256 else None
+
+    with engine.begin() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SYNC_LOCK_KEY}).scalar():
+            print("Registry sync already running elsewhere, skipping")
+            return None
+        # What the mirror holds now, in case another sync ran during the download
+        previous = conn.execute(latest).first()
+        if previous and digest == previous.sha256:
+            conn.execute(pg_insert(RegistrySync).values(**state, sha256=digest, row_count=previous.row_count, synced_at=previous.synced_at)
+                         .on_conflict_do_update(index_elements=["source"], set_=state))
+            print(f"Registry unchanged since {previous.synced_at:%Y-%m-%d %H:%M} ({previous.row_count} universities)")
+            return None
+        if rows is None:
+            print("Registry mirror changed by another sync during the download, skipping")
+            return None
+        if not rows or (previous and not force and len(rows) < REGISTRY_MIN_ROW_RATIO * previous.row_count):
+            print(
+                f"Registry download from {source} has {len(rows)} universities against {previous.row_count if previous else 0} "
+                f"last time; not applying it (looks empty or truncated, use --force if the shrink is real)"
+            )
+            return None
+        changes = apply_rows(conn, rows)
+        state.update(sha256=digest, row_count=len(rows), synced_at=now)
+        conn.execute(pg_insert(RegistrySync).values(**state).on_conflict_do_update(index_elements=["source"], set_=state))
+    elapsed = time.perf_counter() - started
+    print(
+        f"Synced {len(rows)} registry universities in {elapsed:.1f}s: "
+        f"{changes['inserted']} inserted, {changes['updated']} updated, {changes['deleted']} deleted, "
+        f"{changes['country_aliases']} new country spellings"
+    )
+    return changes
+
+def sync_registry_every(seconds: int, source: Optional[str] = None):
+    """Sync now and then every `seconds`, surviving failed runs (a scheduler process)"""
+    while True:
+        try:
+            sync_registry(source)
+        except Exception as e:
+            print(f"Registry sync failed: {e}")
+        time.sleep(seconds)
@@ -0,0 +1,112 @@
+"""
+Application requirements by country and degree type.
+
+Locking a university materializes its requirements for the user: the tasks become
+todos (tagged with their kind and source_ref "lock:<university id>") and the
+documents become the application checklist. Both are written in one statement
+inside the lock transaction, and ON CONFLICT makes it idempotent, so re-locking
+a university never duplicates anything and the documents endpoint only reads.
+"""
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import String, column, false, func, literal, select, text, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog_snapshot import find_university
+from models import ApplicationDocument, Todo
+from services import APPLICATION_FORM, RECOMMENDATION_LETTERS, SOP, TEST_SCORES, TRANSCRIPTS
+
+class TaskTemplate(NamedTuple):
+    kind: str
+    title: str
+    description: str
+
+class RequirementSet(NamedTuple):
+    tasks: Tuple[TaskTemplate, ...] = ()
+    documents: Tuple[str, ...] = ()
+
+    def __add__(self, other: "RequirementSet") -> "RequirementSet":
+        return RequirementSet(self.tasks + other.tasks, self.documents + other.documents)
+
+# Every application
+COMMON = RequirementSet(
+    tasks=(
+        TaskTemplate(SOP, "Prepare Statement of Purpose (SOP)", "Write a compelling SOP tailored to this university"),
+        TaskTemplate(APPLICATION_FORM, "Complete application form", "Fill out the university's online application form"),
+        TaskTemplate(TRANSCRIPTS, "Submit transcripts", "Request and submit official transcripts"),
+        TaskTemplate(RECOMMENDATION_LETTERS, "Get recommendation letters", "Request recommendation letters from professors/employers"),
+        TaskTemplate(TEST_SCORES, "Submit test scores", "Send official IELTS/TOEFL and GRE/GMAT scores"),
+    ),
+    documents=("Statement of Purpose (SOP)", "Academic Transcripts", "Resume/CV"),
+)
+
+# Keyed by University.country_code; None covers every other country
+BY_COUNTRY: Dict[Optional[str], RequirementSet] = {
+    "US": RequirementSet(documents=("GRE/GMAT Scores", "Letters of Recommendation (3)", "Financial Proof (I-20)")),
+    "GB": RequirementSet(documents=("IELTS/TOEFL Scores", "Letters of Recommendation (2)", "CAS Letter Request")),
+    None: RequirementSet(documents=("Language Proficiency Score", "Letters of Recommendation (2)")),
+}
+
+# Keyed by University.degree_type; other degrees add nothing
+BY_DEGREE_TYPE: Dict[str, RequirementSet] = {
+    "MBA": RequirementSet(
+        tasks=(TaskTemplate("work_experience", "Collect work experience letters", "Ask employers to confirm your roles and dates"),),
+        documents=("Work Experience Letters",),
+    ),
+    "PhD": RequirementSet(
+        tasks=(TaskTemplate("research_proposal", "Draft research proposal", "Outline your research questions and potential supervisors"),),
+        documents=("Research Proposal",),
+    ),
+}
+
+@lru_cache(maxsize=256)
+def requirements_for(country_code: Optional[str], degree_type: Optional[str]) -> RequirementSet:
+    """Everything an application to a program in the country `country_code` for `degree_type` needs"""
+    return COMMON + BY_COUNTRY.get(country_code, BY_COUNTRY[None]) + BY_DEGREE_TYPE.get(degree_type, RequirementSet())
+
+async def materialize_requirements(db: AsyncSession, user_id: int, university_id: int) -> Tuple[int, int]:
+    """Create the user's missing todos and documents for a locked university; returns (todos, documents) created.
+
+    One round trip: both inserts are data-modifying CTEs of a single statement. The
+    caller commits, so they land in the same transaction as the lock.
+    """
+    university = await find_university(db, university_id)
+    requirements = requirements_for(university.country_code if university else None, university.degree_type if university else None)
+    source_ref = f"lock:{university_id}"
+
+    now = datetime.utcnow()
+    # INSERT ... SELECT FROM (VALUES ...): multi-row .values() can't be compiled inside a CTE
+    task_rows = values(
+        column("kind", String), column("title", String), column("description", String), name="tasks"
+    ).data([tuple(task) for task in requirements.tasks])
+    todos = (
+        pg_insert(Todo)
+        .from_select(
+            ["user_id", "university_id", "kind", "source_ref", "title", "description", "completed", "created_at"],
+            select(literal(user_id), literal(university_id), task_rows.c.kind, literal(source_ref),
+                   task_rows.c.title, task_rows.c.description, false(), literal(now)),
+        )
+        # The predicate must be literal SQL for Postgres to match it to the partial unique index
+        .on_conflict_do_nothing(index_elements=["user_id", "source_ref", "kind"], index_where=text("source_ref LIKE 'lock:%'"))
+        .returning(Todo.id)
+        .cte("created_todos")
+    )
+    document_rows = values(column("name", String), name="documents").data([(name,) for name in requirements.documents])
+    documents = (
+        pg_insert(ApplicationDocument)
+        .from_select(
+            ["user_id", "university_id", "name", "is_completed", "created_at", "updated_at"],
+            select(literal(user_id), literal(university_id), document_rows.c.name, false(), literal(now), literal(now)),
+        )
+        .on_conflict_do_nothing(index_elements=["user_id", "university_id", "name"])
+        .returning(ApplicationDocument.id)
+        .cte("created_documents")
+    )
+    created = (await db.execute(select(
+        select(func.count()).select_from(todos).scalar_subquery(),
+        select(func.count()).select_from(documents).scalar_subquery(),
+    ))).one()
+    return created[0], created[1]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -53,6 +53,7 @@ class OnboardingResponse(BaseModel):
     field_of_study: Optional[str]
     target_intake_year: Optional[int]
     preferred_countries: Optional[str]
+    preferred_country_codes: Optional[List[str]] = None
     budget_per_year: Optional[float]
     funding_plan: Optional[str]
     ielts_toefl_status: Optional[str]
@@ -86,6 +87,20 @@ class UniversityResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UniversityImport(BaseModel):
+    """One catalog row as accepted by the bulk importer"""
+    name: str = Field(min_length=1)
+    country: str = Field(min_length=1)
+    degree_type: Optional[str] = None
+    field_of_study: Optional[str] = None
+    tuition_fee: Optional[float] = Field(default=None, ge=0)
+    acceptance_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    ranking: Optional[int] = Field(default=None, ge=1)
+    description: Optional[str] = None
+
+    class Config:
+        str_strip_whitespace = True
+
 class UniversityRequirement(BaseModel):
     name: str
     status: str  # met, partial, pending
@@ -143,6 +158,7 @@ class TodoResponse(BaseModel):
     id: int
     user_id: int
     university_id: Optional[int]
+    kind: Optional[str] = None
     title: str
     description: Optional[str]
     completed: bool
@@ -155,6 +171,16 @@ class TodoResponse(BaseModel):
 class TodoUpdate(BaseModel):
     completed: bool
 
+# Dashboard schemas
+class DashboardResponse(BaseModel):
+    user: UserResponse
+    stage: int
+    stage_name: str
+    onboarding: Optional[OnboardingResponse] = None
+    shortlisted: list[UniversityResponse]
+    locked: list[UniversityResponse]
+    todos: list[TodoResponse]
+
 # AI Counsellor schemas
 class AICounsellorMessage(BaseModel):
     message: str
@@ -1,15 +1,12 @@
 """
 Script to seed the database with sample university data
-Run this after setting up the database.
-Now supports incremental updates (checks if name exists before adding).
+Run this after applying migrations (python manage.py migrate).
+Now supports incremental updates (existing names are skipped in one bulk insert).
 """
-from database import SessionLocal, engine, Base
-from models import University
+from database import SessionLocal
+from catalog_import import upsert_universities
 import sys
 
-# Ensure tables exist
-Base.metadata.create_all(bind=engine)
-
 # Expanded university data
 universities_data = [
      # --- USA ---
@@ -467,25 +464,11 @@ universities_data = [
 def seed_universities():
     db = SessionLocal()
     try:
-        count_added = 0
-        count_skipped = 0
-        
         print(f"Checking {len(universities_data)} universities...")
         
-        for uni_data in universities_data:
-            # Check if university already exists by name
-            existing = db.query(University).filter(University.name == uni_data["name"]).first()
-            
-            if existing:
-                count_skipped += 1
-                # Optional: Update existing record?
-                # existing.ranking = uni_data["ranking"]
-                # existing.tuition_fee = uni_data["tuition_fee"]
-                continue
-                
-            university = University(**uni_data)
-            db.add(university)
-            count_added += 1
+        # Single bulk insert; existing names are skipped by the unique constraint
+        count_added = upsert_universities(db.connection(), universities_data, update=False)
+        count_skipped = len(universities_data) - count_added
         
         db.commit()
         print(f"Finished Seeding: Added {count_added}, Skipped {count_skipped} (already existed).")
@@ -1,7 +1,5 @@
-from sqlalchemy.orm import Session
-from database import SessionLocal, engine
-from models import University
-import random
+from database import SessionLocal
+from catalog_import import upsert_universities
 
 def seed_universities():
     db = SessionLocal()
@@ -41,26 +39,14 @@ def seed_universities():
             {"name": "Sorbonne University", "country": "France", "degree_type": "Master's", "field_of_study": "Humanities", "tuition_fee": 400, "acceptance_rate": 0.30, "ranking": 80},
         ]
 
-        for u_data in universities:
-            # Check if university already exists
-            existing = db.query(University).filter(University.name == u_data["name"]).first()
-            if existing:
-                continue
-
-            uni = University(
-                name=u_data["name"],
-                country=u_data["country"],
-                degree_type=u_data["degree_type"],
-                field_of_study=u_data["field_of_study"],
-                tuition_fee=u_data["tuition_fee"],
-                acceptance_rate=u_data["acceptance_rate"],
-                ranking=u_data["ranking"],
-                description=f"Premier institution located in {u_data['country']}, known for excellence in {u_data['field_of_study']}."
-            )
-            db.add(uni)
-        
+        rows = [
+            {**u_data, "description": f"Premier institution located in {u_data['country']}, known for excellence in {u_data['field_of_study']}."}
+            for u_data in universities
+        ]
+        # One bulk insert for the whole list; names that already exist are left alone
+        added = upsert_universities(db.connection(), rows, update=False)
         db.commit()
-        print(f"Successfully seeded {len(universities)} universities.")
+        print(f"Successfully seeded {added} new universities ({len(universities) - added} already existed).")
     except Exception as e:
         print(f"Error seeding database: {e}")
         db.rollback()
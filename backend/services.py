@@ -1,23 +1,34 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Todo
 
-def generate_application_todos(user_id: int, university_id: int, db: Session):
-    """Auto-generate to-dos when a university is locked"""
-    todos = [
-        {"title": "Prepare Statement of Purpose (SOP)", "description": "Write a compelling SOP tailored to this university"},
-        {"title": "Complete application form", "description": "Fill out the university's online application form"},
-        {"title": "Submit transcripts", "description": "Request and submit official transcripts"},
-        {"title": "Get recommendation letters", "description": "Request recommendation letters from professors/employers"},
-        {"title": "Submit test scores", "description": "Send official IELTS/TOEFL and GRE/GMAT scores"},
-    ]
-    
-    for todo_data in todos:
-        todo = Todo(
-            user_id=user_id,
-            title=todo_data["title"],
-            description=todo_data["description"],
-            university_id=university_id
-        )
-        db.add(todo)
-    
-    db.commit()
+# Todo.kind values; free-form tasks have no kind
+SOP = "sop"
+TEST_SCORES = "test_scores"
+SHORTLIST = "shortlist"
+APPLICATION_FORM = "application_form"
+TRANSCRIPTS = "transcripts"
+RECOMMENDATION_LETTERS = "recommendation_letters"
+
+# Title keywords that make a user- or AI-written task one the app completes automatically
+TITLE_KINDS = (("test score", TEST_SCORES), ("sop", SOP), ("shortlist", SHORTLIST))
+
+def task_kind(title: str) -> Optional[str]:
+    """Kind of a task written by the user or the AI counsellor, from its title (once, at creation)"""
+    title = title.lower()
+    return next((kind for keyword, kind in TITLE_KINDS if keyword in title), None)
+
+def task_completion(user_id: int, *kinds: str):
+    """UPDATE completing the user's open tasks of these kinds, served by ix_todos_user_id_kind_completed"""
+    return (
+        update(Todo)
+        .where(Todo.user_id == user_id, Todo.kind.in_(kinds), Todo.completed.is_(False))
+        .values(completed=True, completed_at=datetime.utcnow())
+    )
+
+async def complete_tasks(db: AsyncSession, user_id: int, *kinds: str):
+    """Mark the user's open tasks of these kinds completed (one indexed UPDATE; caller commits)"""
+    await db.execute(task_completion(user_id, *kinds))
@@ -0,0 +1,109 @@
+"""
+Shared fixtures. The tests need PostgreSQL: each module gets a scratch database
+next to TEST_DATABASE_URL (or DATABASE_URL), migrated to head and dropped at the
+end, and everything is skipped when neither is set or the server is unreachable.
+The app itself is pointed at the "<name>_test" database before it is imported.
+"""
+import os
+from contextlib import contextmanager
+
+import pytest
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError
+
+load_dotenv()
+
+SERVER_URL = os.getenv("TEST_DATABASE_URL") or os.getenv("DATABASE_URL")
+if SERVER_URL and SERVER_URL.startswith("postgres://"):
+    SERVER_URL = SERVER_URL.replace("postgres://", "postgresql://", 1)
+
+def scratch_url(suffix: str) -> str:
+    url = make_url(SERVER_URL)
+    return url.set(database=f"{url.database}_{suffix}").render_as_string(hide_password=False)
+
+# database.py builds its engines from the environment at import time
+if SERVER_URL:
+    os.environ["DATABASE_URL"] = scratch_url("test")
+    os.environ.pop("DATABASE_READ_URL", None)
+
+@contextmanager
+def scratch_database(suffix: str):
+    """Create <name>_<suffix>, migrate it to head and yield its URL; dropped afterwards"""
+    if not SERVER_URL:
+        pytest.skip("no TEST_DATABASE_URL or DATABASE_URL configured")
+    url = scratch_url(suffix)
+    database = make_url(url).database
+    admin = create_engine(make_url(SERVER_URL).set(database="postgres"), isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)'))
+            conn.execute(text(f'CREATE DATABASE "{database}"'))
+    except OperationalError as e:
+        admin.dispose()
+        pytest.skip(f"database server unavailable: {e.orig}")
+    try:
+        from alembic import command
+        from alembic.config import Config
+        from manage import ALEMBIC_INI
+
+        config = Config(ALEMBIC_INI)
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+        command.upgrade(config, "head")
+        yield url
+    finally:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{database}" WITH (FORCE)'))
+        admin.dispose()
+
+@pytest.fixture(scope="session")
+def app_database():
+    with scratch_database("test") as url:
+        yield url
+
+@pytest.fixture(scope="session")
+def client(app_database):
+    """The app in-process, on the "<name>_test" database"""
+    import asyncio
+    from fastapi.testclient import TestClient
+    import main
+    from database import async_engine, engine
+
+    with TestClient(main.app) as client:
+        yield client
+    engine.dispose()
+    if async_engine is not None:
+        asyncio.run(async_engine.dispose())
+
+def _declared_budget(app, method: str, path: str):
+    from starlette.routing import Match
+    scope = {"type": "http", "method": method, "path": path.split("?")[0]}
+    for route in app.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return getattr(route.endpoint, "query_budget", None)
+    return None
+
+@pytest.fixture
+def within_budget(client, monkeypatch):
+    """within_budget(method, path, **request_kwargs) -> (response, statement count).
+
+    Runs the request with QUERY_BUDGET_STRICT on, so query_budget.py counts the
+    statements it issues (before_cursor_execute on the app's engines), and fails
+    the test when the endpoint declares no @query_budget or the request overran it.
+    """
+    import query_budget
+    from main import app
+
+    monkeypatch.setattr(query_budget, "QUERY_BUDGET_STRICT", True)
+
+    def request(method: str, path: str, **kwargs):
+        budget = _declared_budget(app, method, path)
+        assert budget is not None, f"{method} {path} has no @query_budget"
+        response = client.request(method, path, **kwargs)
+        if response.status_code == 500:
+            body = response.json()
+            pytest.fail("\n    ".join([f"{method} {path}: {body.get('detail')}", *body.get("statements", [])]))
+        return response, int(response.headers["X-Query-Count"])
+
+    return request
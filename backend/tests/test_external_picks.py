@@ -0,0 +1,61 @@
+"""
+A user's first pick of a registry university creates a placeholder row, which is
+not a catalog change: catalog_version stays put, so no worker reloads its
+snapshot for it. An import of the same name turns it into a catalog row.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+NAME = "Placeholder Check University"
+
+@pytest.fixture(scope="module")
+def database(app_database):
+    engine = create_engine(app_database)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO external_universities (name, normalized_name, country, normalized_country, alpha_two_code, domains, web_pages, synced_at)
+            VALUES (:name, lower(:name), 'Canada', 'canada', 'CA', ARRAY['placeholder.ca'], ARRAY['https://placeholder.ca'], now())
+        """), {"name": NAME})
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="module")
+def headers(client, database):
+    client.post("/api/auth/signup", json={"email": "external@example.com", "full_name": "External Pick", "password": "external-pick"})
+    token = client.post("/api/auth/login", data={"username": "external@example.com", "password": "external-pick"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+def _catalog_version(conn) -> int:
+    return conn.execute(text("SELECT version FROM catalog_version WHERE id = 1")).scalar()
+
+def test_first_pick_is_not_a_catalog_change(client, database, headers):
+    with database.connect() as conn:
+        before = _catalog_version(conn)
+    response = client.post("/api/universities/shortlist", headers=headers, json={"university_id": f"ext:{NAME}"})
+    assert response.status_code == 200, response.text
+    with database.connect() as conn:
+        row = conn.execute(text("SELECT country, placeholder FROM universities WHERE name = :name"), {"name": NAME}).one()
+        assert _catalog_version(conn) == before
+    assert (row.country, row.placeholder) == ("Canada", True)
+    # Read on demand, outside the snapshot
+    listed = client.get("/api/universities/shortlisted", headers=headers).json()
+    assert [uni["name"] for uni in listed] == [NAME]
+    dashboard = client.get("/api/dashboard", headers=headers).json()
+    assert [uni["name"] for uni in dashboard["shortlisted"]] == [NAME]
+
+def test_import_replaces_placeholder(database):
+    from catalog_import import upsert_universities
+
+    with database.begin() as conn:
+        before = _catalog_version(conn)
+        upsert_universities(conn, [{"name": NAME, "country": "Canada", "degree_type": "Master's", "field_of_study": "Law",
+                                    "tuition_fee": 21000, "acceptance_rate": 0.4, "ranking": 80, "description": "Imported"}])
+    with database.connect() as conn:
+        placeholder = conn.execute(text("SELECT placeholder FROM universities WHERE name = :name"), {"name": NAME}).scalar()
+        changed = conn.execute(text("""
+            SELECT count(*) FROM catalog_changes c JOIN universities u ON u.id = c.university_id
+            WHERE u.name = :name AND c.version > :before
+        """), {"name": NAME, "before": before}).scalar()
+        assert _catalog_version(conn) > before
+    assert placeholder is False
+    assert changed == 1
@@ -0,0 +1,90 @@
+"""
+Every endpoint within its @query_budget, for a user with one shortlisted and
+locked university and for one with ITEMS, over a synthetic catalog. A statement
+count that grows with the lists (an N+1 query) fails even when under budget.
+Run both session modes: pytest, then DATABASE_ASYNC=false pytest.
+"""
+import pytest
+from sqlalchemy import create_engine, text
+
+UNIVERSITIES = 200
+ITEMS = 25
+
+# (method, path, json body), in order: reads come after the writes that fill the lists
+REQUESTS = [
+    ("GET", "/api/auth/me", None),
+    ("POST", "/api/onboarding", {"gpa": 3.6, "budget_per_year": 40000, "field_of_study": "Computer Science", "preferred_countries": "USA, UK", "ielts_toefl_status": "Completed"}),
+    ("GET", "/api/onboarding", None),
+    ("GET", "/api/dashboard/stage", None),
+    ("GET", "/api/dashboard", None),
+    ("GET", "/api/universities", None),
+    ("GET", "/api/universities?search=computer", None),
+    ("GET", "/api/universities?country=Germany", None),
+    ("GET", "/api/universities/facets", None),
+    ("GET", "/api/universities/recommended", None),
+    ("GET", "/api/universities/matches", None),
+    ("GET", "/api/universities/shortlisted", None),
+    ("GET", "/api/universities/locked", None),
+    ("GET", "/api/universities/{first}/similar", None),
+    ("GET", "/api/todos", None),
+    ("POST", "/api/todos", {"title": "Budget check", "university_id": "{first}"}),
+    ("PATCH", "/api/todos/{todo_id}", {"completed": True}),
+    ("GET", "/api/applications/{first}/documents", None),
+    ("POST", "/api/universities/shortlist", {"university_id": "{next}"}),
+    ("POST", "/api/universities/lock", {"university_id": "{next}"}),
+    ("DELETE", "/api/universities/lock/{first}", None),
+]
+
+@pytest.fixture(scope="module")
+def catalog(app_database):
+    """Ids of a synthetic catalog, plus a synced registry mirror so country listings never call the registry's API"""
+    engine = create_engine(app_database)
+    with engine.begin() as conn:
+        ids = conn.execute(text("""
+            INSERT INTO universities (name, country, degree_type, field_of_study, tuition_fee, acceptance_rate, ranking, description)
+            SELECT 'University ' || g, (ARRAY['USA', 'UK', 'Canada', 'Germany'])[1 + g % 4], 'Master''s',
+                   (ARRAY['Computer Science', 'Business', 'Medicine', 'Law'])[1 + g % 4],
+                   (g * 370) % 60000, (g % 100) / 100.0, g, 'Synthetic program ' || g
+            FROM generate_series(1, :n) g
+            RETURNING id
+        """), {"n": UNIVERSITIES}).scalars().all()
+        conn.execute(text("""
+            INSERT INTO external_universities (name, normalized_name, country, normalized_country, alpha_two_code, domains, web_pages, synced_at)
+            SELECT 'Registry University ' || g, 'registry university ' || g, 'Germany', 'germany', 'DE', ARRAY['u' || g || '.de'], ARRAY['https://u' || g || '.de'], now()
+            FROM generate_series(1, :n) g
+        """), {"n": UNIVERSITIES})
+        conn.execute(text("""
+            INSERT INTO registry_sync (source, sha256, row_count, synced_at, checked_at)
+            VALUES ('budget-check', repeat('0', 64), :n, now(), now())
+        """), {"n": UNIVERSITIES})
+    engine.dispose()
+    return sorted(ids)
+
+@pytest.fixture(scope="module")
+def users(client, catalog):
+    """List length -> (auth headers, values for the request templates)"""
+    users = {}
+    for size in (1, ITEMS):
+        email = f"budget{size}@example.com"
+        client.post("/api/auth/signup", json={"email": email, "full_name": "Budget Check", "password": "budget-check"})
+        token = client.post("/api/auth/login", data={"username": email, "password": "budget-check"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        # Fill the lists through the API: each lock also creates the application todos
+        for university_id in catalog[:size]:
+            client.post("/api/universities/shortlist", headers=headers, json={"university_id": university_id})
+            client.post("/api/universities/lock", headers=headers, json={"university_id": university_id})
+        todo_id = client.get("/api/todos", headers=headers).json()[0]["id"]
+        users[size] = (headers, {"first": catalog[0], "next": catalog[size], "todo_id": todo_id})
+    return users
+
+def _fill(value, values: dict):
+    if isinstance(value, dict):
+        return {k: _fill(v, values) for k, v in value.items()}
+    return value.format(**values) if isinstance(value, str) else value
+
+@pytest.mark.parametrize("method, path, body", REQUESTS, ids=[f"{m} {p}" for m, p, _ in REQUESTS])
+def test_within_budget(within_budget, users, method, path, body):
+    counts = {}
+    for size, (headers, values) in users.items():
+        _, counts[size] = within_budget(method, _fill(path, values), headers=headers, json=_fill(body, values))
+    assert len(set(counts.values())) == 1, f"{method} {path}: statement count grows with list size {counts}"
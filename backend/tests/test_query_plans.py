@@ -0,0 +1,127 @@
+"""
+The hot queries are served by the migration-delivered indexes. Loads a synthetic
+dataset (QUERY_PLAN_ROWS per hot table, 20000 by default) into its own scratch
+database and EXPLAINs the statements the app's own builders produce, so a query
+that changes shape is checked as it is now. A Seq Scan, or a missing index, fails.
+"""
+import json
+import os
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from catalog_browse import PAGE_SIZE, _values_query, all_filters, catalog_filters
+from catalog_snapshot import record_query
+from models import LockedUniversity, ShortlistedUniversity
+from services import SHORTLIST, SOP, TEST_SCORES, task_completion
+from user_queries import add_pick, find_pick, locked_documents, picked_ids, picked_universities, remove_pick, user_picks, user_todos
+
+from conftest import scratch_database
+
+ROWS = int(os.getenv("QUERY_PLAN_ROWS", "20000"))
+PER_USER = 10
+UNIVERSITIES = 20000
+
+SHORTLIST_INDEX = "uq_shortlisted_universities_user_university"
+LOCK_INDEX = "uq_locked_universities_user_university"
+
+def _browse(sort: str, **filters):
+    return _values_query(all_filters(catalog_filters(**filters)), sort, None).limit(PAGE_SIZE + 1)
+
+# (description, statement for the dataset's ids, indexes of which one must serve it)
+HOT_QUERIES = [
+    ("shortlist toggle off", lambda ids: remove_pick(ShortlistedUniversity, ids["user_id"], ids["university_id"]), {SHORTLIST_INDEX}),
+    ("shortlist upsert", lambda ids: add_pick(ShortlistedUniversity, ids["user_id"], ids["university_id"]), {SHORTLIST_INDEX}),
+    ("shortlisted before lock", lambda ids: find_pick(ShortlistedUniversity, ids["user_id"], ids["university_id"]), {SHORTLIST_INDEX}),
+    ("shortlisted listing", lambda ids: picked_universities(ShortlistedUniversity, ids["user_id"]), {SHORTLIST_INDEX}),
+    ("shortlisted ids", lambda ids: picked_ids(ShortlistedUniversity, ids["user_id"]), {SHORTLIST_INDEX}),
+    ("lock upsert", lambda ids: add_pick(LockedUniversity, ids["user_id"], ids["university_id"]), {LOCK_INDEX}),
+    ("unlock", lambda ids: remove_pick(LockedUniversity, ids["user_id"], ids["university_id"]), {LOCK_INDEX}),
+    ("locked listing", lambda ids: picked_universities(LockedUniversity, ids["user_id"]), {LOCK_INDEX}),
+    ("dashboard picks", lambda ids: user_picks(ids["user_id"]), {SHORTLIST_INDEX}),
+    ("dashboard picks, locked", lambda ids: user_picks(ids["user_id"]), {LOCK_INDEX}),
+    ("application documents", lambda ids: locked_documents(ids["user_id"], ids["university_id"]),
+     {"uq_application_documents_user_university_name"}),
+    ("application documents, lock", lambda ids: locked_documents(ids["user_id"], ids["university_id"]), {LOCK_INDEX}),
+    ("todo listing", lambda ids: user_todos(ids["user_id"]), {"ix_todos_user_id_created_at"}),
+    ("task auto-completion", lambda ids: task_completion(ids["user_id"], SOP, TEST_SCORES, SHORTLIST), {"ix_todos_user_id_kind_completed"}),
+    ("university by name", lambda ids: record_query(name=ids["name"]), {"ix_universities_name"}),
+    ("catalog by ranking", lambda ids: _browse("ranking"), {"ix_universities_ranking_id"}),
+    ("catalog by tuition, descending", lambda ids: _browse("-tuition"), {"ix_universities_tuition_fee_id"}),
+    ("catalog by acceptance, descending", lambda ids: _browse("-acceptance"), {"ix_universities_acceptance_rate_id"}),
+    ("catalog by name", lambda ids: _browse("name"), {"ix_universities_name"}),
+    ("catalog in a country, any spelling", lambda ids: _browse("ranking", country="U.S.A."),
+     {"ix_universities_country_code", "ix_universities_ranking_id"}),
+    ("catalog by field", lambda ids: _browse("ranking", field="Engineering"),
+     {"ix_universities_field_of_study_trgm", "ix_universities_ranking_id"}),
+]
+
+@pytest.fixture(scope="module")
+def dataset():
+    """A connection to the loaded scratch database and the ids the statements use"""
+    with scratch_database("plan_test") as url:
+        engine = create_engine(url)
+        users = max(ROWS // PER_USER, 1)
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO users (email, full_name, profile_complete)
+                SELECT 'user' || g || '@example.com', 'User ' || g, true FROM generate_series(1, :users) g
+            """), {"users": users})
+            conn.execute(text("""
+                INSERT INTO universities (name, country, degree_type, field_of_study, tuition_fee, acceptance_rate, ranking)
+                SELECT 'University ' || g, (SELECT array_agg(name ORDER BY code) FROM countries)[1 + g % 200], 'Master''s',
+                       (ARRAY['Computer Science', 'Business', 'Civil Engineering', 'Law'])[1 + g % 4],
+                       (g * 370) % 60000, (g % 100) / 100.0, g
+                FROM generate_series(1, :n) g
+            """), {"n": UNIVERSITIES})
+            # 13 * k is distinct modulo UNIVERSITIES for k <= PER_USER, so pairs stay unique
+            pairs = f"""
+                SELECT u, ((u * 7 + k * 13) % {UNIVERSITIES}) + 1 AS uni, k
+                FROM generate_series(1, :users) u, generate_series(1, {PER_USER}) k
+            """
+            for table in ("shortlisted_universities", "locked_universities"):
+                conn.execute(text(f"INSERT INTO {table} (user_id, university_id, created_at) SELECT u, uni, now() FROM ({pairs}) p"), {"users": users})
+            conn.execute(text(f"""
+                INSERT INTO todos (user_id, university_id, kind, title, completed, created_at)
+                SELECT u, uni, (ARRAY['sop', 'test_scores', 'shortlist', 'transcripts', NULL])[1 + k % 5], 'Task ' || k, k % 2 = 0,
+                       now() - k * interval '1 day'
+                FROM ({pairs}) p
+            """), {"users": users})
+            conn.execute(text(f"""
+                INSERT INTO application_documents (user_id, university_id, name, is_completed, created_at)
+                SELECT u, ((u * 7 + 13) % {UNIVERSITIES}) + 1, 'Document ' || k, false, now() FROM ({pairs}) p
+            """), {"users": users})
+            conn.execute(text("ANALYZE"))
+        user_id = users // 2
+        ids = {
+            "user_id": user_id,
+            "university_id": ((user_id * 7 + 13) % UNIVERSITIES) + 1,
+            "name": f"University {UNIVERSITIES // 2}",
+        }
+        with engine.connect() as conn:
+            yield conn, ids
+        engine.dispose()
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+def _explain(conn, statement) -> list:
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(_plan_nodes(plan[0]["Plan"]))
+
+@pytest.mark.parametrize("build, indexes", [(build, indexes) for _, build, indexes in HOT_QUERIES],
+                         ids=[description for description, _, _ in HOT_QUERIES])
+def test_served_by_index(dataset, build, indexes):
+    conn, ids = dataset
+    nodes = _explain(conn, build(ids))
+    # An upsert's index is its conflict arbiter rather than a scan
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    used.update(name for node in nodes for name in node.get("Conflict Arbiter Indexes", []))
+    scanned = sorted(node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan")
+    assert not scanned, f"sequential scan of {', '.join(scanned)}"
+    assert used & indexes, f"uses {', '.join(sorted(used)) or 'no index'}, expected {' or '.join(sorted(indexes))}"
@@ -0,0 +1,122 @@
+"""
+Resolution of university ids from the API to local university ids.
+
+Ids are either numeric or "ext:<name>" for a registry university the user picked
+from a search. An ext: id is resolved by its normalized name (external_universities.
+normalize_text) through the external_university_ids map, so "ext:Université Laval"
+and "ext:universite laval" name the same row. On first use (with create) the local
+university is created and mapped in one statement, taking its country from the
+registry mirror; a concurrent first use of another spelling loses cleanly and gets
+the winner's id. The row is a placeholder (models.University.placeholder), so
+creating it is not a catalog change. Resolved ids are cached per worker until the
+catalog changes.
+"""
+from collections import OrderedDict
+from typing import Optional, Union
+
+from sqlalchemy import String, cast, delete, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from catalog_snapshot import on_catalog_change
+from external_universities import normalize_text
+from models import ExternalUniversity, ExternalUniversityId, University
+
+EXTERNAL_PREFIX = "ext:"
+# Normalized names whose id this worker remembers
+RESOLVED_CACHE_SIZE = 10000
+
+_resolved: "OrderedDict[str, int]" = OrderedDict()
+
+def parse_university_id(university_id: Union[int, str]) -> Union[int, str]:
+    """Numeric ids can arrive as strings; asyncpg needs real ints for integer columns"""
+    if isinstance(university_id, str) and university_id.isdigit():
+        return int(university_id)
+    return university_id
+
+def _remember(key: str, university_id: int) -> int:
+    _resolved[key] = university_id
+    _resolved.move_to_end(key)
+    if len(_resolved) > RESOLVED_CACHE_SIZE:
+        _resolved.popitem(last=False)
+    return university_id
+
+async def _lookup(db: AsyncSession, key: str, name: str) -> Optional[int]:
+    # The mapped id, else a local university of exactly that name (seeded or created by hand)
+    return await db.scalar(select(func.coalesce(
+        select(ExternalUniversityId.university_id).where(ExternalUniversityId.key == key).scalar_subquery(),
+        select(University.id).where(University.name == name).scalar_subquery(),
+    )))
+
+async def _create(db: AsyncSession, key: str, name: str) -> Optional[int]:
+    """Create and map the placeholder university; None when another spelling got there first"""
+    country = (
+        select(ExternalUniversity.country)
+        .where(ExternalUniversity.normalized_name == key, ExternalUniversity.country.is_not(None))
+        .order_by(ExternalUniversity.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    created = (
+        pg_insert(University)
+        .from_select(
+            ["name", "country", "degree_type", "field_of_study", "tuition_fee", "acceptance_rate", "ranking", "description", "placeholder"],
+            select(
+                cast(literal(name), String),
+                func.coalesce(country, "Unknown"),
+                literal("Master's"), # Default
+                literal("General"), # Default
+                literal(30000), # Placeholder
+                literal(0.5), # Placeholder
+                literal(100), # Placeholder
+                literal(f"Automated entry for {name}"),
+                literal(True),
+            ),
+        )
+        .on_conflict_do_nothing(index_elements=["name"])
+        .returning(University.id)
+        .cte("created")
+    )
+    mapped = (
+        pg_insert(ExternalUniversityId)
+        .from_select(
+            ["key", "name", "university_id", "created_at"],
+            select(literal(key), literal(name), created.c.id, func.timezone("utc", func.now())),
+        )
+        .on_conflict_do_nothing(index_elements=["key"])
+        .returning(ExternalUniversityId.university_id)
+        .cte("mapped")
+    )
+    created_id, mapped_id = (await db.execute(select(
+        select(created.c.id).scalar_subquery(),
+        select(mapped.c.university_id).scalar_subquery(),
+    ))).one()
+    if created_id is not None and mapped_id is None:
+        # A concurrent first use of another spelling mapped the key; drop our duplicate
+        await db.execute(delete(University).where(University.id == created_id))
+    await db.commit()
+    return mapped_id
+
+async def resolve_university_id(university_id: Union[int, str, None], db: AsyncSession, create: bool = False) -> Optional[int]:
+    """Numeric id for a numeric or "ext:<name>" id; unknown names give None, or are created when `create`"""
+    university_id = parse_university_id(university_id)
+    if not (isinstance(university_id, str) and university_id.startswith(EXTERNAL_PREFIX)):
+        return university_id
+    name = " ".join(university_id[len(EXTERNAL_PREFIX):].split())
+    key = normalize_text(name)
+    if not key:
+        return None
+    if key in _resolved:
+        _resolved.move_to_end(key)
+        return _resolved[key]
+    resolved = await _lookup(db, key, name)
+    if resolved is None and create:
+        # Lost a race (the name or key was taken meanwhile): the winner's row is there now
+        resolved = await _create(db, key, name) or await _lookup(db, key, name)
+    return _remember(key, resolved) if resolved is not None else None
+
+async def _forget_resolved():
+    # Mapped universities may have been deleted (the mapping goes with them)
+    _resolved.clear()
+
+on_catalog_change(_forget_resolved)
@@ -0,0 +1,74 @@
+"""
+Name keys for recognising the same university under different spellings.
+
+A name's key is its normalized form (external_universities.normalize_text) without
+stopwords, so "University of Illinois at Urbana-Champaign" and "University of
+Illinois Urbana-Champaign" share one. Names the key can't reconcile, like "UC
+Berkeley" and "University of California, Berkeley", are linked by the
+university_aliases table (alias key -> canonical key). A local name ending in an
+acronym in parentheses, like "Massachusetts Institute of Technology (MIT)", also
+makes the acronym an alias of the rest, so plain "MIT" matches it. The acronym
+never decides the identity of the name it's attached to, though: "National
+Taiwan University (NTU)" keys on its base name, whatever "NTU" stands for.
+Acronyms that several universities share (migration 0016) are display-only
+aliases and merge nothing. The catalog snapshot keeps a NameIndex of both, and
+listings merge results by key.
+"""
+import re
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from external_universities import normalize_text
+
+# Words that don't tell two universities apart, in the registry's main languages
+STOPWORDS = frozenset({
+    "a", "an", "and", "at", "for", "in", "of", "on", "the",
+    "de", "del", "della", "der", "des", "di", "du", "et", "la", "le", "les", "und", "y",
+})
+
+# A trailing one-word parenthetical, like "(MIT)"; "(Main Campus)" names a different place
+_PARENTHESIZED = re.compile(r"^(.*?)\s*\(([^()\s]+)\)\s*$")
+
+def name_key(name: Optional[str]) -> str:
+    """Normalized name without stopwords"""
+    words = normalize_text(name).split()
+    return " ".join(w for w in words if w not in STOPWORDS) or " ".join(words)
+
+def split_name(name: str) -> Tuple[str, Optional[str]]:
+    """("Massachusetts Institute of Technology", "MIT") for "Massachusetts Institute of Technology (MIT)\""""
+    match = _PARENTHESIZED.match(name or "")
+    if match and match.group(1):
+        return match.group(1), match.group(2)
+    return name, None
+
+class NameIndex:
+    """Canonical key of any name: its own key, or the one it's an alias of"""
+
+    __slots__ = ("aliases", "_keys")
+
+    def __init__(self, aliases: Iterable[Tuple[str, str, bool]] = (), names: Iterable[str] = ()):
+        names = list(names)
+        self.aliases: Dict[str, str] = {}
+        # Acronyms of catalog names first, so the alias table wins where both define one
+        claimed: Dict[str, Set[str]] = {}
+        for name in names:
+            base, acronym = split_name(name)
+            if acronym and name_key(acronym) != name_key(base):
+                claimed.setdefault(name_key(acronym), set()).add(name_key(base))
+        # An acronym two catalog names claim stands for neither
+        self.aliases.update((acronym, bases.pop()) for acronym, bases in claimed.items() if len(bases) == 1)
+        for alias_key, canonical_key, display_only in aliases:
+            if display_only:
+                self.aliases.pop(alias_key, None)
+            else:
+                self.aliases[alias_key] = canonical_key
+        self._keys: Dict[str, str] = {name: self._canonical(name) for name in names}
+
+    def _canonical(self, name: str) -> str:
+        # A trailing acronym only labels the name; the base name alone decides its key
+        key = name_key(split_name(name)[0])
+        return self.aliases.get(key, key)
+
+    def key(self, name: str) -> str:
+        """Catalog names are precomputed; others (registry results) are keyed on the fly"""
+        key = self._keys.get(name)
+        return key if key is not None else self._canonical(name)
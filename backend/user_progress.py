@@ -0,0 +1,53 @@
+"""
+Consistency check for the denormalized progress on users (stage, shortlisted_count,
+locked_count), which migration 0007's triggers maintain. Compares every user's
+stored values with their onboarding, shortlisted and locked rows and, with --fix,
+rebuilds the ones that drifted (e.g. after a TRUNCATE or a manual edit with
+triggers disabled):
+    python manage.py check-user-progress [--fix]
+"""
+from sqlalchemy import text
+
+from database import engine
+
+# Reported per run; the rest are only counted
+MAX_REPORTED_USERS = 20
+
+EXPECTED_PROGRESS = """
+    SELECT u.id AS user_id,
+           coalesce(s.n, 0) AS shortlisted_count,
+           coalesce(l.n, 0) AS locked_count,
+           CASE WHEN o.user_id IS NULL THEN 0 WHEN l.n > 0 THEN 4 WHEN s.n > 0 THEN 3 ELSE 2 END AS stage
+    FROM users u
+    LEFT JOIN (SELECT user_id, count(*) AS n FROM shortlisted_universities GROUP BY user_id) s ON s.user_id = u.id
+    LEFT JOIN (SELECT user_id, count(*) AS n FROM locked_universities GROUP BY user_id) l ON l.user_id = u.id
+    LEFT JOIN onboarding o ON o.user_id = u.id
+"""
+
+DRIFTED = "(u.stage, u.shortlisted_count, u.locked_count) IS DISTINCT FROM (p.stage, p.shortlisted_count, p.locked_count)"
+
+def check_user_progress(fix: bool = False) -> int:
+    """Report users whose stored progress is wrong, rebuilding it when `fix`; returns how many"""
+    with engine.begin() as conn:
+        drifted = conn.execute(text(f"""
+            SELECT u.id, u.stage, u.shortlisted_count, u.locked_count,
+                   p.stage AS expected_stage, p.shortlisted_count AS expected_shortlisted, p.locked_count AS expected_locked
+            FROM users u JOIN ({EXPECTED_PROGRESS}) p ON p.user_id = u.id
+            WHERE {DRIFTED} ORDER BY u.id
+        """)).all()
+        for row in drifted[:MAX_REPORTED_USERS]:
+            print(
+                f"User {row.id}: stage {row.stage}, {row.shortlisted_count} shortlisted, {row.locked_count} locked; "
+                f"expected stage {row.expected_stage}, {row.expected_shortlisted} shortlisted, {row.expected_locked} locked"
+            )
+        if len(drifted) > MAX_REPORTED_USERS:
+            print(f"... and {len(drifted) - MAX_REPORTED_USERS} more")
+        if drifted and fix:
+            # Re-derived in the UPDATE itself, so changes committed since the check are not overwritten
+            conn.execute(text(f"""
+                UPDATE users u SET stage = p.stage, shortlisted_count = p.shortlisted_count, locked_count = p.locked_count
+                FROM ({EXPECTED_PROGRESS}) p WHERE p.user_id = u.id AND {DRIFTED}
+            """))
+    status = "rebuilt" if fix else "inconsistent"
+    print(f"{len(drifted)} users {status}" if drifted else "User progress is consistent")
+    return len(drifted)
@@ -0,0 +1,60 @@
+"""
+Statements for the per-user hot paths: shortlist and lock toggles, the listings,
+the dashboard's picks, todos and a locked university's documents. Each one must be
+served by a migration-delivered index; tests/test_query_plans.py EXPLAINs these
+same builders against a large dataset, so the check follows the code.
+"""
+from typing import Type, Union
+
+from sqlalchemy import Select, delete, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from models import ApplicationDocument, LockedUniversity, ShortlistedUniversity, Todo, University
+
+# Shortlisted and locked rows share a shape and a unique (user_id, university_id) constraint
+Pick = Union[Type[ShortlistedUniversity], Type[LockedUniversity]]
+
+def find_pick(model: Pick, user_id: int, university_id: int) -> Select:
+    return select(model).where(model.user_id == user_id, model.university_id == university_id)
+
+def add_pick(model: Pick, user_id: int, university_id: int):
+    """Insert unless present (the unique constraint arbitrates); returns the new id or nothing"""
+    return (
+        pg_insert(model)
+        .values(user_id=user_id, university_id=university_id)
+        .on_conflict_do_nothing(index_elements=["user_id", "university_id"])
+        .returning(model.id)
+    )
+
+def remove_pick(model: Pick, user_id: int, university_id: int):
+    """Delete if present; returns the removed id or nothing"""
+    return delete(model).where(model.user_id == user_id, model.university_id == university_id).returning(model.id)
+
+def picked_ids(model: Pick, user_id: int) -> Select:
+    return select(model.university_id).where(model.user_id == user_id)
+
+def picked_universities(model: Pick, user_id: int) -> Select:
+    """The user's universities in the order they were picked, in one joined query"""
+    return select(University).join(model, model.university_id == University.id).where(model.user_id == user_id).order_by(model.id)
+
+def user_picks(user_id: int):
+    """Shortlisted and locked ids in one round trip: (kind, university_id, id) rows"""
+    return union_all(
+        select(literal("shortlisted").label("kind"), ShortlistedUniversity.university_id, ShortlistedUniversity.id)
+        .where(ShortlistedUniversity.user_id == user_id),
+        select(literal("locked"), LockedUniversity.university_id, LockedUniversity.id)
+        .where(LockedUniversity.user_id == user_id),
+    ).order_by("kind", "id")
+
+def user_todos(user_id: int) -> Select:
+    return select(Todo).where(Todo.user_id == user_id).order_by(Todo.created_at.desc())
+
+def locked_documents(user_id: int, university_id: int) -> Select:
+    """The lock and its documents in one statement: (lock id, document or None) rows, none when not locked"""
+    return (
+        select(LockedUniversity.id, ApplicationDocument)
+        .outerjoin(ApplicationDocument, (ApplicationDocument.user_id == LockedUniversity.user_id)
+                   & (ApplicationDocument.university_id == LockedUniversity.university_id))
+        .where(LockedUniversity.user_id == user_id, LockedUniversity.university_id == university_id)
+        .order_by(ApplicationDocument.id)
+    )